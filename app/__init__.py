@@ -36,9 +36,20 @@ def create_app(config_class=Config):
     def inject_now():
         return {'now': datetime.utcnow()}
     
+    # Request timing for /metrics
+    from app import metrics
+    metrics.init_app(app)
+
+    # Sampled and on-demand request profiles
+    from app import profiling
+    profiling.init_app(app)
+
     # Register blueprints
     from app.routes import bp
     app.register_blueprint(bp)
+
+    from app.api import bp as api_bp
+    app.register_blueprint(api_bp)
     
     # Register error handlers
     from app.errors import bp as errors_bp
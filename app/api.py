@@ -0,0 +1,120 @@
+from flask import Blueprint, jsonify, render_template, current_app, request
+from app.routes import analyzer
+from app.fanout import run_stages
+from app.symbols import normalize_symbol, check_symbol, symbol_index
+from app.charts import CHART_PERIODS
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+def _error(message, status):
+    return jsonify({'error': message}), status
+
+def _envelope(ticker, data, fragments=None):
+    """Every endpoint answers {ticker, data, fragments}; `fragments` holds rendered HTML keyed by page slot."""
+    return jsonify({'ticker': ticker, 'data': data, 'fragments': fragments or {}})
+
+def _check_ticker(ticker):
+    """Returns (ticker, None) for a symbol worth looking up, else (None, error response), without any network call."""
+    symbol = normalize_symbol(ticker)
+    if symbol is None:
+        return None, _error('Invalid ticker symbol.', 400)
+    error = check_symbol(symbol)
+    if error:
+        return None, _error(error, 404)
+    return symbol, None
+
+@bp.route('/symbols')
+def symbols():
+    """Ticker autocomplete from the local symbol index: ?q=<prefix>&limit=<n>."""
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    return jsonify({'query': request.args.get('q', ''), 'matches': symbol_index.search(request.args.get('q'), limit)})
+
+@bp.route('/<ticker>/technical')
+def technical(ticker):
+    ticker, error = _check_ticker(ticker)
+    if error:
+        return error
+    ta = analyzer.get_technical_analysis(ticker)
+    if not ta:
+        return _error(f'No analysis data found for {ticker}. Please check the ticker symbol.', 404)
+    analysis = ta.to_dict()
+    return _envelope(ticker, analysis, {
+        'technical': render_template('partials/technical.html', analysis=analysis)
+    })
+
+@bp.route('/<ticker>/sentiment')
+def sentiment(ticker):
+    ticker, error = _check_ticker(ticker)
+    if error:
+        return error
+    sentiment_data = analyzer.get_sentiment_analysis(ticker)
+    # No news is a normal answer, so it still renders (an N/A badge and no news card)
+    return _envelope(ticker, sentiment_data, {
+        'sentiment_badge': render_template('partials/sentiment_badge.html',
+                                           sent=sentiment_data.get('score') if sentiment_data else None),
+        'news': render_template('partials/news.html', sentiment_data=sentiment_data)
+    })
+
+@bp.route('/<ticker>/company')
+def company(ticker):
+    ticker, error = _check_ticker(ticker)
+    if error:
+        return error
+    company_info = analyzer.get_company_info(ticker)
+    if not company_info:
+        return _error(f'No company information found for {ticker}.', 404)
+    return _envelope(ticker, company_info, {
+        'company': render_template('partials/company.html', company_info=company_info)
+    })
+
+@bp.route('/<ticker>/chart')
+def chart(ticker):
+    ticker, error = _check_ticker(ticker)
+    if error:
+        return error
+    period = request.args.get('period', '3mo')
+    if period not in CHART_PERIODS:
+        return _error(f"Unsupported chart period. Use one of: {', '.join(CHART_PERIODS)}.", 400)
+    payload = analyzer.get_chart_payload(ticker, period)
+    if payload is None:
+        return _error(f'No price data found for {ticker}.', 404)
+    # Base64 typed arrays plus a Plotly layout, drawn client-side by renderChart in main.js
+    return _envelope(ticker, payload)
+
+@bp.route('/<ticker>/ideas')
+def ideas(ticker):
+    ticker, error = _check_ticker(ticker)
+    if error:
+        return error
+    trade_ideas = analyzer.generate_trade_ideas(ticker)
+    return _envelope(ticker, trade_ideas, {
+        'ideas': render_template('partials/ideas.html', ideas=trade_ideas, ticker=ticker)
+    })
+
+@bp.route('/<ticker>')
+def overview(ticker):
+    """All dashboard data in one call, under the same deadline the dashboard stages share."""
+    ticker, error = _check_ticker(ticker)
+    if error:
+        return error
+    results, degraded = run_stages({
+        'technical': lambda: analyzer.get_technical_analysis(ticker),
+        'sentiment': lambda: analyzer.get_sentiment_analysis(ticker),
+        'company': lambda: analyzer.get_company_info(ticker),
+        'chart': lambda: analyzer.get_chart_payload(ticker),
+        'ideas': lambda: analyzer.generate_trade_ideas(ticker)
+    }, deadline=current_app.config['DASHBOARD_DEADLINE'], workers=current_app.config['DASHBOARD_WORKERS'])
+    if 'technical' not in degraded and not results.get('technical'):
+        return _error(f'No analysis data found for {ticker}. Please check the ticker symbol.', 404)
+    ta = results.get('technical')
+    return jsonify({
+        'ticker': ticker,
+        'data': {
+            'technical': ta.to_dict() if ta else None,
+            'sentiment': results.get('sentiment'),
+            'company': results.get('company'),
+            'chart': results.get('chart'),
+            'ideas': results.get('ideas')
+        },
+        'degraded': sorted(degraded)
+    })
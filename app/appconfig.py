@@ -0,0 +1,12 @@
+from flask import current_app, has_app_context
+
+def config_value(key, default):
+    """The app config value for `key`, or `default` outside an app context.
+
+    The caches, pools and stores are module-level objects created at import,
+    before any app exists, and some of their work runs in background threads,
+    so they read their settings through this at call time.
+    """
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
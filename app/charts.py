@@ -0,0 +1,122 @@
+"""Compact price chart payloads, drawn client-side by main.js (renderChart).
+
+Series travel as base64-encoded little-endian typed arrays, float32 for prices and
+int32 day numbers for dates, instead of Plotly figure JSON with every float64
+spelled out in decimal. The browser wraps them in typed arrays and builds the
+Plotly traces itself, so the server needs neither Plotly nor per-request
+serialization of a figure.
+"""
+from app.indicators import rolling_mean
+from app.periods import slice_period
+from app.lazy import lazy_import
+import base64
+import numpy as np
+
+pd = lazy_import('pandas')
+
+PAYLOAD_VERSION = 2
+
+# Periods the dashboard chart offers, shortest first
+CHART_PERIODS = ('3mo', '1y', '5y', 'max')
+
+# (trace name, SMA window or None for the closing price, Plotly line style)
+CHART_TRACES = (
+    ('Price', None, {'color': '#1f77b4'}),
+    ('20-day SMA', 20, {'color': 'orange', 'dash': 'dot'}),
+    ('50-day SMA', 50, {'color': 'red', 'dash': 'dot'}),
+)
+
+PERIOD_LABELS = {'1mo': '1 Month', '3mo': '3 Months', '6mo': '6 Months', '1y': '1 Year', '2y': '2 Years',
+                 '5y': '5 Years', '10y': '10 Years', 'max': 'Max'}
+
+def encode_array(values, dtype):
+    """{dtype, bdata}: `values` as little-endian `dtype` ('f4', 'i4') bytes in base64."""
+    data = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(data.tobytes()).decode('ascii')}
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw (x, y) with `threshold` points.
+
+    The first and last points are always kept. The points in between are split into
+    threshold - 2 equal buckets, and each bucket keeps the point that makes the
+    largest triangle with the point kept before it and the mean of the next bucket,
+    which preserves peaks and troughs. Bucket means come from one cumulative sum and
+    each bucket's triangle areas are computed as a NumPy vector, so the only Python
+    loop is one short step per output point.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket b covers [edges[b], edges[b + 1]); the last point is a bucket of its own
+    edges = np.r_[np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64), n]
+    cum_x = np.r_[0.0, np.cumsum(x)]
+    cum_y = np.r_[0.0, np.cumsum(y)]
+    counts = edges[1:] - edges[:-1]
+    mean_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    mean_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for b in range(threshold - 2):
+        start, stop = edges[b], edges[b + 1]
+        # Twice the triangle area between point a, each candidate and the next bucket's mean
+        area = np.abs((x[a] - mean_x[b + 1]) * (y[start:stop] - y[a])
+                      - (x[a] - x[start:stop]) * (mean_y[b + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        kept[b + 1] = a
+    # LTTB usually keeps the overall high and low; pin them so the chart's range is always exact
+    high, low = int(np.argmax(y)), int(np.argmin(y))
+    for extreme in (high, low):
+        slot = int(np.searchsorted(edges, extreme, side='right'))
+        if 0 < extreme < n - 1 and kept[slot] not in (high, low):
+            kept[slot] = extreme
+    return kept
+
+def chart_layout(ticker, period):
+    """Plotly layout, with Python Plotly's 'plotly_white' template spelled out (Plotly.js has no named templates)."""
+    axis = {'gridcolor': '#EBF0F8', 'zerolinecolor': '#EBF0F8', 'linecolor': '#EBF0F8'}
+    return {
+        'title': {'text': f'{ticker} Price Analysis ({PERIOD_LABELS.get(period, period)})'},
+        'xaxis': dict(axis, title={'text': 'Date'}, type='date'),
+        'yaxis': dict(axis, title={'text': 'Price ($)'}),
+        'paper_bgcolor': 'white',
+        'plot_bgcolor': 'white',
+        'font': {'color': '#2a3f5f'},
+        'hovermode': 'x unified',
+        'legend': {'yanchor': 'top', 'y': 0.99, 'xanchor': 'left', 'x': 0.01},
+        'margin': {'l': 40, 'r': 20, 't': 50, 'b': 40}
+    }
+
+def build_chart_payload(ticker, history, period, max_points):
+    """Chart payload for the `period` at the end of `history`, with at most `max_points` per trace.
+
+    `history` may reach further back than `period`: the SMAs are computed over all
+    of it, so the overlays start at the left edge of the chart instead of after a
+    warm-up gap. Long periods are downsampled with LTTB on the closing price, and
+    the SMAs keep the same dates, so every trace lines up.
+    """
+    close = pd.to_numeric(history['Close'], errors='coerce').dropna()
+    if close.empty:
+        return None
+    shown = len(slice_period(close, period))
+    values = close.to_numpy(dtype=np.float64)
+    # Days since 1970-01-01; main.js turns them back into dates
+    days = close.index.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    kept = lttb_indices(days[-shown:], values[-shown:], max_points) + (len(values) - shown)
+
+    traces = []
+    for name, window, line in CHART_TRACES:
+        y = values if window is None else rolling_mean(values, window)
+        traces.append({'name': name, 'y': encode_array(y[kept], 'f4'), 'line': line})
+    return {
+        'version': PAYLOAD_VERSION,
+        'period': period,
+        'last_bar': close.index[-1].strftime('%Y-%m-%d'),
+        'bars': shown,
+        'x': encode_array(days[kept], 'i4'),
+        'traces': traces,
+        'layout': chart_layout(ticker, period)
+    }
@@ -0,0 +1,322 @@
+from collections import OrderedDict
+from flask import has_app_context
+from app.appconfig import config_value
+from app import cache
+from app.periods import superset_periods, slice_period
+from app.sharedcache import shared_cache
+from app.models import AnalysisSnapshot
+from app.metrics import count_cache_event
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class _Stamped:
+    """An L2 value together with the wall-clock time it was first stored."""
+    __slots__ = ('stored_at', 'value')
+
+    def __init__(self, stored_at, value):
+        self.stored_at = stored_at
+        self.value = value
+
+    def __getstate__(self):
+        return (self.stored_at, self.value)
+
+    def __setstate__(self, state):
+        self.stored_at, self.value = state
+
+class TieredCache:
+    """Bounded in-process LRU (L1) in front of the shared Flask-Caching backend (L2).
+
+    When SHARED_CACHE_ENABLED is set, a host-wide memory-mapped tier sits between
+    the two, so workers on one box share entries without needing Redis.
+
+    Timeouts and sizes are read from the app config at call time, since the cache
+    objects are created at import, before any app exists.
+
+    L1 entries outlive their timeout by STALE_WHILE_REVALIDATE seconds. Normal
+    lookups treat them as expired, but get_stale() still returns them, so a caller
+    can serve the old value while it refreshes in the background.
+    """
+
+    def __init__(self, namespace, timeout_key, size_key, default_timeout=300, default_size=256):
+        self.namespace = namespace
+        self.timeout_key = timeout_key
+        self.size_key = size_key
+        self.default_timeout = default_timeout
+        self.default_size = default_size
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._stats = {'l1_hits': 0, 'host_hits': 0, 'l2_hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0,
+                       'evictions': 0}
+        shared_cache.register(namespace + ':', lambda: self.timeout)
+
+    @property
+    def timeout(self):
+        return config_value(self.timeout_key, self.default_timeout)
+
+    @property
+    def maxsize(self):
+        return config_value(self.size_key, self.default_size)
+
+    def _l2_key(self, key):
+        parts = key if isinstance(key, tuple) else (key,)
+        return ':'.join([self.namespace] + [str(p) for p in parts])
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self._stats[stat] += n
+        count_cache_event(self.namespace, stat, n)
+
+    @property
+    def stale_window(self):
+        return config_value('STALE_WHILE_REVALIDATE', 0)
+
+    def _get_local(self, key, allow_stale=False):
+        timeout = self.timeout
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if age > timeout + self.stale_window:
+                del self._entries[key]
+                return None
+            if age > timeout and not allow_stale:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value, age=0.0):
+        """Stores a value in L1 that was first stored `age` seconds ago, so it expires on the original schedule."""
+        maxsize = self.maxsize
+        if maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() - age, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self._stats['evictions'] += evicted
+        if evicted:
+            count_cache_event(self.namespace, 'evictions', evicted)
+
+    def _get_shared(self, keys):
+        """Looks keys up in L2 with a single round-trip. Returns {key: (value, age in seconds)} for hits."""
+        if not has_app_context():
+            return {}
+        try:
+            values = cache.get_many(*[self._l2_key(k) for k in keys])
+        except Exception as e:
+            logger.warning(f"Shared cache lookup failed for {self.namespace}: {e}")
+            return {}
+        now = time.time()
+        # Entries written before values were stamped are ignored; they expire on their own
+        return {k: (v.value, max(now - v.stored_at, 0.0)) for k, v in zip(keys, values) if isinstance(v, _Stamped)}
+
+    def _set_shared(self, key, value):
+        if not has_app_context():
+            return
+        try:
+            cache.set(self._l2_key(key), _Stamped(time.time(), value), timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {self.namespace}: {e}")
+
+    def get_first(self, keys):
+        """Returns (key, value) for the first of `keys` that is cached, or (None, None).
+
+        Each tier is checked for every key before moving on to the next tier, and
+        hits from the host and L2 tiers are promoted into L1 with their original
+        write time, so promotion never extends an entry's lifetime.
+        """
+        keys = list(keys)
+        for key in keys:
+            value = self._get_local(key)
+            if value is not None:
+                self._count('l1_hits')
+                return key, value
+        if shared_cache.enabled:
+            timeout = self.timeout
+            for key in keys:
+                value, age = shared_cache.get_entry(self._l2_key(key), timeout)
+                if value is not None:
+                    self._count('host_hits')
+                    self._set_local(key, value, age)
+                    return key, value
+        shared = self._get_shared(keys)
+        for key in keys:
+            if key in shared:
+                value, age = shared[key]
+                self._count('l2_hits')
+                self._set_local(key, value, age)
+                return key, value
+        self._count('misses')
+        return None, None
+
+    def get(self, key):
+        return self.get_first([key])[1]
+
+    def _get_shared_entry(self, key):
+        """Looks a key up in the host and L2 tiers only, skipping L1.
+
+        Returns (value, age in seconds, tier stat) for a hit, or (None, None, None).
+        """
+        if shared_cache.enabled:
+            value, age = shared_cache.get_entry(self._l2_key(key), self.timeout)
+            if value is not None:
+                return value, age, 'host_hits'
+        value, age = self._get_shared([key]).get(key, (None, None))
+        if value is not None:
+            return value, age, 'l2_hits'
+        return None, None, None
+
+    def get_stale(self, keys):
+        """Like get_first, but only looks at L1 and also returns expired entries still in the stale window."""
+        for key in keys:
+            value = self._get_local(key, allow_stale=True)
+            if value is not None:
+                self._count('stale_hits')
+                return key, value
+        return None, None
+
+    def set(self, key, value):
+        """Stores a value in every tier. None is never cached."""
+        if value is None:
+            return
+        self._count('sets')
+        if shared_cache.enabled:
+            # Keep the memory-mapped copy locally so this worker doesn't hold a second one
+            value = shared_cache.set(self._l2_key(key), value)
+        self._set_local(key, value)
+        self._set_shared(key, value)
+
+    def writer(self, key):
+        """Host-wide lock that lets one worker refresh `key` while the others wait for it."""
+        return shared_cache.writer(self._l2_key(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['l1_hits'] + stats['host_hits'] + stats['l2_hits'] + stats['misses']
+        stats['hit_ratio'] = round((lookups - stats['misses']) / lookups, 4) if lookups else None
+        return stats
+
+class StockDataCache(TieredCache):
+    """OHLCV cache keyed by (ticker, period) that can answer a period from any cached longer one."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats['slice_hits'] = 0
+
+    def get_frame(self, ticker, period, allow_stale=False):
+        keys = [(ticker, period)] + [(ticker, p) for p in superset_periods(period)]
+        key, data = self.get_stale(keys) if allow_stale else self.get_first(keys)
+        if data is None:
+            return None
+        if key[1] != period:
+            self._count('slice_hits')
+            return slice_period(data, period)
+        return data
+
+class AnalysisSnapshotCache(TieredCache):
+    """Per-ticker AnalysisSnapshot store, so a page can reuse what another page just computed.
+
+    Snapshots are stored as versioned dicts, so entries written by an older build
+    are ignored rather than misread. Freshness is judged per section by the reader.
+
+    Other workers add sections to the same entry, so a worker only trusts its L1
+    copy for SNAPSHOT_RECHECK_INTERVAL seconds after it last read or wrote the
+    shared copy; after that it reads the shared copy again.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._update_locks = {}
+        self._update_locks_guard = threading.Lock()
+        self._checked = OrderedDict()  # ticker -> monotonic time L1 last matched the shared copy
+
+    @property
+    def recheck_interval(self):
+        return config_value('SNAPSHOT_RECHECK_INTERVAL', 5)
+
+    def _update_lock(self, ticker):
+        # Created at call time, after gevent has patched threading, so waiting on it yields
+        with self._update_locks_guard:
+            return self._update_locks.setdefault(ticker, threading.Lock())
+
+    def _mark_checked(self, ticker):
+        with self._lock:
+            self._checked[ticker] = time.monotonic()
+            self._checked.move_to_end(ticker)
+            while len(self._checked) > max(self.maxsize, 0):
+                self._checked.popitem(last=False)
+
+    def _recently_checked(self, ticker):
+        with self._lock:
+            checked = self._checked.get(ticker)
+        return checked is not None and time.monotonic() - checked <= self.recheck_interval
+
+    def _get_current(self, ticker):
+        if self._recently_checked(ticker):
+            return self.get(ticker)
+        value, age, stat = self._get_shared_entry(ticker)
+        if value is not None:
+            self._count(stat)
+            self._set_local(ticker, value, age)
+            self._mark_checked(ticker)
+            return value
+        # No shared tier, or its copy expired or was evicted; this worker's copy is the best there is
+        value = self._get_local(ticker)
+        self._count('l1_hits' if value is not None else 'misses')
+        return value
+
+    def get_snapshot(self, ticker):
+        return AnalysisSnapshot.from_dict(self._get_current(ticker))
+
+    def get_section(self, ticker, section):
+        """Returns (value, age in seconds) for a section of the ticker's snapshot, or (None, None)."""
+        snapshot = self.get_snapshot(ticker)
+        if snapshot is None:
+            return None, None
+        return getattr(snapshot, section), snapshot.age(section)
+
+    def update(self, ticker, section, value):
+        """Replaces one section, keeping the others. None results are not stored."""
+        if value is None:
+            return
+        # Updates are read-modify-write, so they are serialised per ticker (in this
+        # worker by a ticker lock, across workers by the host-wide writer lock) to keep
+        # concurrent stages from dropping each other's sections.
+        # The base is read from the shared tiers, since this worker's L1 copy may be
+        # missing sections other workers wrote since; L1 is only used when they have none.
+        with self._update_lock(ticker), self.writer(ticker):
+            current = self._get_shared_entry(ticker)[0]
+            if current is None:
+                current = self._get_local(ticker)
+            snapshot = AnalysisSnapshot.from_dict(current) or AnalysisSnapshot(ticker=ticker)
+            setattr(snapshot, section, value)
+            setattr(snapshot, f'{section}_at', time.time())
+            self.set(ticker, snapshot.to_dict())
+            self._mark_checked(ticker)
+
+stock_data_cache = StockDataCache('stock_data', 'STOCK_DATA_CACHE_TIMEOUT', 'STOCK_DATA_LRU_SIZE',
+                                  default_timeout=60, default_size=128)
+company_info_cache = TieredCache('company_info', 'COMPANY_INFO_CACHE_TIMEOUT', 'COMPANY_INFO_LRU_SIZE',
+                                 default_timeout=86400, default_size=512)
+ai_insights_cache = TieredCache('ai_insights', 'AI_CACHE_TIMEOUT', 'AI_CACHE_LRU_SIZE',
+                                default_timeout=3600, default_size=256)
+analysis_snapshots = AnalysisSnapshotCache('analysis_snapshot', 'SNAPSHOT_CACHE_TIMEOUT', 'SNAPSHOT_LRU_SIZE',
+                                           default_timeout=86400, default_size=256)
+chart_payloads = TieredCache('chart', 'CHART_CACHE_TIMEOUT', 'CHART_LRU_SIZE',
+                             default_timeout=86400, default_size=256)
+unknown_symbols = TieredCache('unknown_symbol', 'NEGATIVE_CACHE_TIMEOUT', 'NEGATIVE_CACHE_LRU_SIZE',
+                              default_timeout=3600, default_size=4096)
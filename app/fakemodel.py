@@ -0,0 +1,40 @@
+import time
+
+# Canned answer, split the way Gemini tends to split a short answer into stream chunks
+CANNED_CHUNKS = (
+    "Listen up, bro. ",
+    "Here's the play based on the data snapshot.\n\n",
+    "**Trend:** The moving averages set the tone here, ",
+    "so keep an eye on whether price holds above the 20-day SMA.\n\n",
+    "**Momentum:** RSI is the thing to watch. ",
+    "Stretched readings tend to cool off before the next leg.\n\n",
+    "**Sentiment:** Recent headlines are part of the picture, ",
+    "but they move fast. DYOR before making any move.",
+)
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeStreamingModel:
+    """Stand-in for genai.GenerativeModel that answers with canned chunks.
+
+    Enabled with AI_FAKE_MODEL=true, so AI insights (and their streaming) can be
+    exercised without an API key or network access. `delay` is the pause before
+    each chunk, in seconds.
+    """
+
+    def __init__(self, chunks=CANNED_CHUNKS, delay=0.2):
+        self.chunks = chunks
+        self.delay = delay
+
+    def _stream(self):
+        for text in self.chunks:
+            time.sleep(self.delay)
+            yield _Chunk(text)
+
+    def generate_content(self, prompt, stream=False):
+        if stream:
+            return self._stream()
+        time.sleep(self.delay * len(self.chunks))
+        return _Chunk(''.join(self.chunks))
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app, g
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(workers):
+    """Process-wide pool for page stages, created on first use.
+
+    Kept apart from the article download pool, because the sentiment stage waits on
+    that pool and must never compete with its own downloads for a slot.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='page-stage')
+        return _executor
+
+def _run_in_app_context(app, memo, name, fn):
+    with app.app_context():
+        # Stages share the request's memo, so data one stage loads is reused by the others
+        if memo is not None:
+            g._financebro_memo = memo
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            logger.info(f"Stage {name} finished in {time.monotonic() - started:.2f}s")
+
+def run_stages(stages, deadline, workers):
+    """Runs independent page stages concurrently under one deadline.
+
+    `stages` maps a name to a zero-argument callable. Returns (results, degraded),
+    where `results` holds the return value of every stage that finished in time and
+    `degraded` is the set of stages that failed or missed the deadline. Late stages
+    keep running in the background and still warm the caches for the next view.
+    """
+    app = current_app._get_current_object()
+    memo = g.setdefault('_financebro_memo', {})
+    executor = _get_executor(workers)
+    started = time.monotonic()
+    futures = {executor.submit(_run_in_app_context, app, memo, name, fn): name for name, fn in stages.items()}
+    done, not_done = wait(futures, timeout=deadline)
+
+    results = {}
+    degraded = set()
+    for future, name in futures.items():
+        if future in not_done:
+            future.cancel()
+            degraded.add(name)
+            logger.warning(f"Stage {name} missed the {deadline}s page deadline. Rendering without it.")
+        elif future.exception() is not None:
+            degraded.add(name)
+            logger.error(f"Stage {name} failed: {future.exception()}")
+        else:
+            results[name] = future.result()
+    logger.info(f"Ran {len(stages)} stages in {time.monotonic() - started:.2f}s ({len(degraded)} degraded)")
+    return results, degraded
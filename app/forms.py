@@ -1,17 +1,33 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField, TextAreaField
-from wtforms.validators import DataRequired, Length
+from wtforms.validators import DataRequired, Length, ValidationError
+from app.symbols import check_symbol
+
+# Pending streamed questions are kept in the session cookie, which browsers cap at
+# 4 KB; three plain-text questions of this length still fit
+QUESTION_MAX_LENGTH = 500
+
+class KnownTicker:
+    """Rejects malformed, unlisted and known-empty tickers without any network call."""
+
+    def __call__(self, form, field):
+        error = check_symbol(field.data)
+        if error:
+            raise ValidationError(error)
 
 class TickerForm(FlaskForm):
-    ticker = StringField('Stock Ticker', 
-                        validators=[DataRequired(), 
-                                  Length(min=1, max=5)])
+    ticker = StringField('Stock Ticker',
+                        validators=[DataRequired(),
+                                  Length(min=1, max=5),
+                                  KnownTicker()])
     submit = SubmitField('Analyze')
 
 class AIQuestionForm(FlaskForm):
     ticker = StringField('Stock Ticker',
                          validators=[DataRequired(),
-                                   Length(min=1, max=5)])
+                                   Length(min=1, max=5),
+                                   KnownTicker()])
     question = TextAreaField('Your Question for the AI',
-                             validators=[DataRequired()])
-    submit = SubmitField('Ask AI')
\ No newline at end of file
+                             validators=[DataRequired(),
+                                         Length(max=QUESTION_MAX_LENGTH)])
+    submit = SubmitField('Ask AI')
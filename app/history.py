@@ -0,0 +1,197 @@
+from app.appconfig import config_value
+from app.periods import ORDERED_PERIODS, slice_period
+from app.indicators import IndicatorState
+from app.lazy import lazy_import
+import json
+import os
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+pd = lazy_import('pandas')
+
+class HistoryStore:
+    """Local Parquet store of daily bars, one file per ticker.
+
+    A ticker's file remembers the longest period ever downloaded for it. Requests
+    for that period or anything shorter are served from disk, and once the stored
+    bars are older than STOCK_DATA_CACHE_TIMEOUT only the bars from the last stored
+    date onwards are fetched and merged in.
+
+    The metadata file also carries the ticker's IndicatorState, which is advanced
+    one bar at a time as new bars arrive, so technical analysis never has to
+    rescan the stored history.
+
+    Stored bars are split- and dividend-adjusted, and Yahoo rescales all past bars
+    after every split or ex-dividend date. Each top-up therefore also re-fetches the
+    last committed bar; if its close moved by more than HISTORY_RESCALE_TOLERANCE,
+    or the history is older than HISTORY_FULL_REFRESH_DAYS (which catches dividends
+    too small to notice), the whole period is downloaded again.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._engine_checked = False
+        self._engine_available = False
+
+    @property
+    def enabled(self):
+        if not config_value('HISTORY_STORE_ENABLED', False):
+            return False
+        if not self._engine_checked:
+            self._engine_checked = True
+            try:
+                import pyarrow  # noqa: F401
+                self._engine_available = True
+            except ImportError:
+                logger.warning("pyarrow is not installed. The OHLCV history store is disabled.")
+        return self._engine_available
+
+    @property
+    def directory(self):
+        return config_value('HISTORY_STORE_DIR', os.path.join('instance', 'history'))
+
+    def supports(self, period):
+        return period in ORDERED_PERIODS
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _paths(self, ticker):
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', ticker)
+        base = os.path.join(self.directory, name)
+        return base + '.parquet', base + '.json'
+
+    def load(self, ticker):
+        """Returns (frame, meta) for a stored ticker, or (None, None)."""
+        data_path, meta_path = self._paths(ticker)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            data = pd.read_parquet(data_path)
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable history for {ticker}: {e}")
+            return None, None
+        return data, meta
+
+    def save(self, ticker, data, meta):
+        """Writes a ticker's bars and metadata, replacing the old files atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, meta_path = self._paths(ticker)
+        tmp_suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        data.to_parquet(data_path + tmp_suffix)
+        os.replace(data_path + tmp_suffix, data_path)
+        with open(meta_path + tmp_suffix, 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + tmp_suffix, meta_path)
+
+    @staticmethod
+    def _merge(old, new):
+        if old is None:
+            return new
+        # Later downloads win, so a partial bar from earlier in the day gets replaced
+        merged = pd.concat([old, new])
+        merged = merged[~merged.index.duplicated(keep='last')]
+        return merged.sort_index()
+
+    def get(self, ticker, period, fetch, force=False):
+        """Returns bars covering `period`, calling `fetch(period=...)` or `fetch(start=...)` as needed.
+
+        `force` tops up the stored bars even if they were refreshed recently.
+        """
+        with self._lock(ticker):
+            data, meta = self.load(ticker)
+            now = time.time()
+            stored_rank = ORDERED_PERIODS.index(meta['period']) if meta else -1
+            requested_rank = ORDERED_PERIODS.index(period)
+
+            if data is None or data.empty or stored_rank < requested_rank:
+                fresh = fetch(period=period)
+                if fresh is None or fresh.empty:
+                    return None
+                data = self._merge(data, fresh)
+                self._save_full(ticker, data, ORDERED_PERIODS[max(stored_rank, requested_rank)], now)
+            elif force or now - meta['refreshed'] > config_value('STOCK_DATA_CACHE_TIMEOUT', 60):
+                full_refresh_due = now - meta.get('downloaded', 0) > config_value('HISTORY_FULL_REFRESH_DAYS', 7) * 86400
+                fresh = None
+                if not full_refresh_due:
+                    # Start from the last committed bar, before the pending one, to check it is unchanged
+                    anchor = data.index[-2] if len(data) > 1 else data.index[-1]
+                    logger.info(f"Topping up history for {ticker} from {anchor.date()}")
+                    fresh = fetch(start=anchor.strftime('%Y-%m-%d'))
+                    if fresh is not None and not fresh.empty and self._rescaled(data, fresh, anchor):
+                        logger.info(f"Adjusted closes for {ticker} changed since they were stored")
+                        full_refresh_due = True
+                if full_refresh_due:
+                    logger.info(f"Re-downloading the {meta['period']} history of {ticker}")
+                    fresh = fetch(period=meta['period'])
+                    if fresh is not None and not fresh.empty:
+                        data = fresh
+                        self._save_full(ticker, data, meta['period'], now)
+                        return slice_period(data, period)
+                    # Never merge bars on two price scales; the next refresh tries again
+                    fresh = None
+                if fresh is not None and not fresh.empty:
+                    new_bars = fresh[fresh.index >= data.index[-1]]
+                    data = self._merge(data, fresh)
+                    meta['indicator_state'] = self._advance_state(meta.get('indicator_state'), data, new_bars)
+                meta['refreshed'] = now
+                self._save_quietly(ticker, data, meta)
+
+            return slice_period(data, period)
+
+    def _save_full(self, ticker, data, period, now):
+        """Saves a fully downloaded history, replaying the whole of it into a new IndicatorState."""
+        meta = {'period': period, 'refreshed': now, 'downloaded': now,
+                'indicator_state': IndicatorState.from_closes(data.index, data['Close']).to_dict()}
+        self._save_quietly(ticker, data, meta)
+
+    @staticmethod
+    def _rescaled(stored, fresh, anchor):
+        """True if the re-fetched close of the stored `anchor` bar no longer matches the stored one."""
+        day = anchor.strftime('%Y-%m-%d')
+        refetched = fresh['Close'][fresh.index.strftime('%Y-%m-%d') == day]
+        if refetched.empty:
+            return False
+        old, new = float(stored['Close'].loc[anchor]), float(refetched.iloc[-1])
+        return abs(new - old) > config_value('HISTORY_RESCALE_TOLERANCE', 0.0005) * abs(old)
+
+    @staticmethod
+    def _advance_state(saved_state, data, fresh):
+        """Feeds only the newly fetched bars into the saved state, rebuilding it if it can't be used."""
+        state = IndicatorState.from_dict(saved_state)
+        if state is not None:
+            for date, close in fresh['Close'].sort_index().items():
+                if not state.update(date, close):
+                    state = None  # an already committed bar changed
+                    break
+        if state is None:
+            state = IndicatorState.from_closes(data.index, data['Close'])
+        return state.to_dict()
+
+    def load_state(self, ticker):
+        """Returns the stored IndicatorState for a ticker, or None."""
+        _, meta_path = self._paths(ticker)
+        try:
+            with open(meta_path) as f:
+                return IndicatorState.from_dict(json.load(f).get('indicator_state'))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable indicator state for {ticker}: {e}")
+            return None
+
+    def _save_quietly(self, ticker, data, meta):
+        try:
+            self.save(ticker, data, meta)
+        except Exception as e:
+            logger.error(f"Failed to write history for {ticker}: {e}")
+
+history_store = HistoryStore()
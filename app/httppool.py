@@ -0,0 +1,158 @@
+from collections import Counter
+from app.appconfig import config_value
+from app.metrics import instrument_session
+import http.cookiejar
+import importlib
+import os
+import sys
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Yahoo answers the default python-requests agent with 429s
+BROWSER_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36')
+
+def _gevent_patched():
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+def _yfinance_speaks_curl():
+    # yfinance 1.x prefers curl_cffi sessions; 0.2.x only speaks requests
+    try:
+        return importlib.import_module('yfinance._http').HAS_CURL_CFFI
+    except ImportError:
+        return False
+
+class PooledSessions:
+    """Keep-alive HTTP sessions shared by every upstream client in this worker process.
+
+    yfinance 0.2.x and newspaper call requests.get, which builds a throwaway
+    Session, and yfinance 1.x makes a new curl_cffi Session per download, so each
+    call paid for its own TCP and TLS handshake to the same few hosts. Here every
+    client goes through one requests.Session per purpose ('yahoo', 'articles'),
+    each holding up to HTTP_POOL_MAXSIZE idle connections for each of the
+    HTTP_POOL_HOSTS most recently used hosts. A request that finds all of its
+    host's connections busy waits for one rather than opening another. Sessions
+    are created on first use in each worker, after the fork and after gevent has
+    patched sockets, so their connections are cooperative and never shared
+    between processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._sessions = {}
+        self._retired = {}
+        self._yf_session = None
+        self._yf_backend = None
+
+    def _reset_if_forked(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._sessions = {}
+            self._retired = {}
+            self._yf_session = None
+            self._yf_backend = None
+
+    def session(self, name):
+        """The pooled requests.Session for `name`, created on first use."""
+        with self._lock:
+            self._reset_if_forked()
+            session = self._sessions.get(name)
+            if session is None:
+                session = self._sessions[name] = self._new_session(name)
+            return session
+
+    def yfinance_session(self):
+        """The session to pass to yf.download and yf.Ticker.
+
+        HTTP_POOL_YF_BACKEND picks what it is:
+        - 'requests': the pooled 'yahoo' session;
+        - 'curl': one shared curl_cffi session, as yfinance 1.x would create;
+        - 'auto' (the default): 'curl' when yfinance supports it and the worker is
+          not gevent-patched. curl_cffi does its I/O in C, where a gevent worker
+          cannot switch greenlets.
+        """
+        backend = config_value('HTTP_POOL_YF_BACKEND', 'auto')
+        if backend == 'auto':
+            backend = 'curl' if _yfinance_speaks_curl() and not _gevent_patched() else 'requests'
+        if backend != 'curl':
+            session = self.session('yahoo')
+            self._yf_backend = 'requests'
+            return session
+        with self._lock:
+            self._reset_if_forked()
+            if self._yf_session is None:
+                self._yf_session = instrument_session(importlib.import_module('yfinance._http').new_session(),
+                                                      'yahoo')
+                self._yf_backend = 'curl_cffi'
+            return self._yf_session
+
+    def _new_session(self, name):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=config_value('HTTP_POOL_HOSTS', 64),
+                              pool_maxsize=config_value('HTTP_POOL_MAXSIZE', 10), pool_block=True)
+        retired = self._retired[name] = Counter()
+
+        def retire(pool):
+            # Keep the counters of host pools pushed out by more recently used hosts
+            retired['requests'] += pool.num_requests
+            retired['connections'] += pool.num_connections
+            pool.close()
+
+        adapter.poolmanager.pools.dispose_func = retire
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if name == 'articles':
+            # newspaper used a fresh cookie jar per download; never collect cookies from every news site
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        else:
+            session.headers['User-Agent'] = BROWSER_USER_AGENT
+        logger.info(f"Created pooled HTTP session '{name}' in worker {os.getpid()}")
+        # News sites are unbounded, so article requests are timed under one host label
+        return instrument_session(session, name, per_host=name != 'articles')
+
+    @staticmethod
+    def _host_stats(pool):
+        queue = getattr(pool.pool, 'queue', ())
+        return {
+            'requests': pool.num_requests,
+            'connections': pool.num_connections,
+            'idle': sum(conn is not None for conn in list(queue)),
+        }
+
+    def stats(self):
+        """Per session and host: requests sent, connections opened (one handshake each) and idle connections."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return {}
+            sessions = dict(self._sessions)
+            retired = {name: Counter(counts) for name, counts in self._retired.items()}
+            yf_backend = self._yf_backend
+        stats = {}
+        for name, session in sessions.items():
+            pools = session.get_adapter('https://').poolmanager.pools
+            hosts = {}
+            for key in pools.keys():
+                try:
+                    pool = pools[key]
+                except KeyError:  # Evicted meanwhile
+                    continue
+                hosts[f'{key.key_host}:{key.key_port}' if key.key_port else key.key_host] = self._host_stats(pool)
+            requests = retired[name]['requests'] + sum(host['requests'] for host in hosts.values())
+            connections = retired[name]['connections'] + sum(host['connections'] for host in hosts.values())
+            stats[name] = {
+                'requests': requests,
+                'connections': connections,
+                'reuse_ratio': round(1 - connections / requests, 3) if requests else None,
+                'hosts': hosts,
+            }
+        stats['yfinance_backend'] = yf_backend
+        return stats
+
+http_pool = PooledSessions()
@@ -0,0 +1,290 @@
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from app.models import TechnicalAnalysis
+import numpy as np
+
+SMA_WINDOWS = (20, 50, 200)
+EMA_FAST = 12
+EMA_SLOW = 26
+MACD_SIGNAL = 9
+RSI_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_STDDEV = 2.0
+
+# Block length for the blocked EMA scan. Each block costs one BLOCK x BLOCK mat-vec,
+# which keeps the decay powers well inside float64 range for any history length.
+_BLOCK = 128
+
+@lru_cache(maxsize=32)
+def _decay_kernel(alpha, size):
+    """Lower-triangular matrix K with K[t, k] = alpha * (1 - alpha) ** (t - k) for k <= t."""
+    lags = np.arange(size)[:, None] - np.arange(size)[None, :]
+    kernel = np.where(lags >= 0, alpha * (1.0 - alpha) ** np.clip(lags, 0, None), 0.0)
+    kernel.flags.writeable = False
+    return kernel
+
+def smooth(values, alpha, seed):
+    """Full series of y[t] = (1 - alpha) * y[t - 1] + alpha * x[t], with y[-1] = seed.
+
+    The recursion is evaluated block by block as a matrix product, so the Python
+    loop runs len(values) / 128 times instead of once per element.
+    """
+    n = values.size
+    out = np.empty(n)
+    if n == 0:
+        return out
+    block = min(_BLOCK, n)
+    kernel = _decay_kernel(alpha, block)
+    carry_weights = (1.0 - alpha) ** np.arange(1, block + 1)
+    carry = seed
+    for start in range(0, n, block):
+        chunk = values[start:start + block]
+        m = chunk.size
+        out[start:start + m] = kernel[:m, :m] @ chunk + carry_weights[:m] * carry
+        carry = out[start + m - 1]
+    return out
+
+def smooth_last(values, alpha, seed):
+    """Last value of `smooth(values, alpha, seed)`, as a single dot product."""
+    n = values.size
+    if n == 0:
+        return seed
+    weights = alpha * (1.0 - alpha) ** np.arange(n - 1, -1, -1)
+    return (1.0 - alpha) ** n * seed + weights @ values
+
+def rolling_mean(values, window):
+    """Full simple moving average series from one cumulative sum, NaN until `window` values are in."""
+    out = np.full(values.size, np.nan)
+    if values.size >= window:
+        sums = np.cumsum(np.r_[0.0, values])
+        out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+def ema(values, span):
+    """Exponential moving average seeded with the first value (pandas ewm(adjust=False))."""
+    return smooth(values, 2.0 / (span + 1.0), values[0])
+
+def wilder_averages(close, period=RSI_PERIOD):
+    """Wilder-smoothed average gain and loss, or (None, None) with too little history."""
+    if close.size <= period:
+        return None, None
+    delta = np.diff(close)
+    gains = np.clip(delta, 0.0, None)
+    losses = np.clip(-delta, 0.0, None)
+    alpha = 1.0 / period
+    avg_gain = smooth_last(gains[period:], alpha, gains[:period].mean())
+    avg_loss = smooth_last(losses[period:], alpha, losses[:period].mean())
+    return avg_gain, avg_loss
+
+def rsi_from_averages(avg_gain, avg_loss):
+    if avg_gain is None or avg_loss is None:
+        return None
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else 50.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+def _round(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+def determine_trend(current_price, sma_20, sma_50):
+    if current_price and sma_20 and sma_50:
+        if current_price > sma_20 > sma_50:
+            return 'Bullish'
+        if current_price < sma_20 < sma_50:
+            return 'Bearish'
+    return 'Neutral'
+
+def compute_technical_analysis(ticker, close):
+    """Computes every TechnicalAnalysis field from an array of closing prices.
+
+    Works on one contiguous float64 array. Only the latest value of each indicator is
+    kept, except the two EMAs, which the MACD signal line needs in full.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    close = close[~np.isnan(close)]
+    if close.size == 0:
+        return None
+
+    current_price = _round(close[-1])
+    smas = {n: _round(close[-n:].mean()) if close.size >= n else None for n in SMA_WINDOWS}
+
+    ema_fast = ema(close, EMA_FAST)
+    ema_slow = ema(close, EMA_SLOW)
+    macd_line = ema_fast - ema_slow
+    macd_signal = smooth_last(macd_line[1:], 2.0 / (MACD_SIGNAL + 1.0), macd_line[0])
+    macd = macd_line[-1]
+
+    bollinger_upper = bollinger_middle = bollinger_lower = None
+    if close.size >= BOLLINGER_WINDOW:
+        window = close[-BOLLINGER_WINDOW:]
+        middle = window.mean()
+        band = BOLLINGER_STDDEV * window.std()
+        bollinger_upper, bollinger_middle, bollinger_lower = _round(middle + band), _round(middle), _round(middle - band)
+
+    return TechnicalAnalysis(
+        ticker=ticker,
+        current_price=current_price,
+        sma_20=smas[20],
+        sma_50=smas[50],
+        sma_200=smas[200],
+        ema_12=_round(ema_fast[-1]),
+        ema_26=_round(ema_slow[-1]),
+        rsi=_round(rsi_from_averages(*wilder_averages(close))),
+        macd=_round(macd, 4),
+        macd_signal=_round(macd_signal, 4),
+        macd_hist=_round(macd - macd_signal, 4),
+        bollinger_upper=bollinger_upper,
+        bollinger_middle=bollinger_middle,
+        bollinger_lower=bollinger_lower,
+        trend=determine_trend(current_price, smas[20], smas[50]),
+        last_updated=datetime.utcnow()
+    )
+
+class IndicatorState:
+    """Running indicator accumulators for one ticker, updated in O(1) per bar.
+
+    Bars are committed once a newer bar arrives. The newest bar stays pending, so
+    repeated updates for the same day (live prices, or a partial bar being
+    re-fetched) replace it instead of being counted twice. Starting from the first
+    bar, the accumulators follow the same recursions as compute_technical_analysis.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        self.count = 0  # committed bars
+        self.window = deque(maxlen=max(SMA_WINDOWS))
+        self.ema_fast = None
+        self.ema_slow = None
+        self.macd_signal = None
+        self.prev_close = None
+        self.seed_gain = 0.0
+        self.seed_loss = 0.0
+        self.seed_count = 0
+        self.avg_gain = None
+        self.avg_loss = None
+        self.pending_date = None
+        self.pending_close = None
+
+    @classmethod
+    def from_closes(cls, dates, closes):
+        """Builds a state by replaying a history of (date, close) pairs."""
+        state = cls()
+        for date, close in zip(dates, closes):
+            state.update(date, close)
+        return state
+
+    def update(self, date, close):
+        """Applies a bar. Returns False if it is older than the pending bar and was ignored."""
+        date = str(date)[:10]
+        close = float(close)
+        if np.isnan(close):
+            return False
+        if self.pending_date is not None:
+            if date < self.pending_date:
+                return False
+            if date > self.pending_date:
+                self._commit(self.pending_close)
+        self.pending_date = date
+        self.pending_close = close
+        return True
+
+    def _commit(self, close):
+        fast_alpha = 2.0 / (EMA_FAST + 1.0)
+        slow_alpha = 2.0 / (EMA_SLOW + 1.0)
+        signal_alpha = 2.0 / (MACD_SIGNAL + 1.0)
+        if self.ema_fast is None:
+            self.ema_fast = self.ema_slow = close
+            self.macd_signal = 0.0
+        else:
+            self.ema_fast += fast_alpha * (close - self.ema_fast)
+            self.ema_slow += slow_alpha * (close - self.ema_slow)
+            self.macd_signal += signal_alpha * ((self.ema_fast - self.ema_slow) - self.macd_signal)
+
+        if self.prev_close is not None:
+            delta = close - self.prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.avg_gain is None:
+                self.seed_gain += gain
+                self.seed_loss += loss
+                self.seed_count += 1
+                if self.seed_count == RSI_PERIOD:
+                    self.avg_gain = self.seed_gain / RSI_PERIOD
+                    self.avg_loss = self.seed_loss / RSI_PERIOD
+            else:
+                self.avg_gain += (gain - self.avg_gain) / RSI_PERIOD
+                self.avg_loss += (loss - self.avg_loss) / RSI_PERIOD
+
+        self.prev_close = close
+        self.window.append(close)
+        self.count += 1
+
+    def snapshot(self, ticker):
+        """TechnicalAnalysis as of the pending bar. Leaves the state untouched."""
+        if self.pending_date is None:
+            return None
+        state = self.from_dict(self.to_dict())
+        state._commit(self.pending_close)
+
+        closes = np.fromiter(state.window, dtype=np.float64, count=len(state.window))
+        current_price = _round(state.pending_close)
+        smas = {n: _round(closes[-n:].mean()) if closes.size >= n else None for n in SMA_WINDOWS}
+
+        bollinger_upper = bollinger_middle = bollinger_lower = None
+        if closes.size >= BOLLINGER_WINDOW:
+            window = closes[-BOLLINGER_WINDOW:]
+            middle = window.mean()
+            band = BOLLINGER_STDDEV * window.std()
+            bollinger_upper, bollinger_middle, bollinger_lower = _round(middle + band), _round(middle), _round(middle - band)
+
+        macd = state.ema_fast - state.ema_slow
+        return TechnicalAnalysis(
+            ticker=ticker,
+            current_price=current_price,
+            sma_20=smas[20],
+            sma_50=smas[50],
+            sma_200=smas[200],
+            ema_12=_round(state.ema_fast),
+            ema_26=_round(state.ema_slow),
+            rsi=_round(rsi_from_averages(state.avg_gain, state.avg_loss)),
+            macd=_round(macd, 4),
+            macd_signal=_round(state.macd_signal, 4),
+            macd_hist=_round(macd - state.macd_signal, 4),
+            bollinger_upper=bollinger_upper,
+            bollinger_middle=bollinger_middle,
+            bollinger_lower=bollinger_lower,
+            trend=determine_trend(current_price, smas[20], smas[50]),
+            last_updated=datetime.utcnow()
+        )
+
+    def to_dict(self):
+        return {
+            'version': self.VERSION,
+            'count': self.count,
+            'window': list(self.window),
+            'ema_fast': self.ema_fast,
+            'ema_slow': self.ema_slow,
+            'macd_signal': self.macd_signal,
+            'prev_close': self.prev_close,
+            'seed_gain': self.seed_gain,
+            'seed_loss': self.seed_loss,
+            'seed_count': self.seed_count,
+            'avg_gain': self.avg_gain,
+            'avg_loss': self.avg_loss,
+            'pending_date': self.pending_date,
+            'pending_close': self.pending_close
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restores a state saved by to_dict(). Returns None for an incompatible version."""
+        if not data or data.get('version') != cls.VERSION:
+            return None
+        state = cls()
+        for key, value in data.items():
+            if key == 'window':
+                state.window.extend(value)
+            elif key != 'version':
+                setattr(state, key, value)
+        return state
@@ -0,0 +1,41 @@
+"""Deferred imports for heavy dependencies.
+
+    pd = lazy_import('pandas')
+
+binds `pd` to a stand-in that imports pandas on first attribute access, so a
+process that never touches pandas (the flask CLI, a worker only serving AI
+pages, a test that never downloads prices) never pays for importing it.
+"""
+import importlib
+import sys
+import threading
+
+class LazyModule:
+    """Module proxy that imports `name` the first time one of its attributes is used."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        """Whether the module has been imported (by anyone), without importing it."""
+        return self._module is not None or self._name in sys.modules
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,134 @@
+"""Prometheus metrics for the request path, served at /metrics.
+
+Under gunicorn each worker writes its samples to files in PROMETHEUS_MULTIPROC_DIR
+(set up and cleaned by gunicorn_config.py), and /metrics merges the files of all
+live workers, so whichever worker answers a scrape reports totals for the whole
+server. Without that variable (flask run, the dev server) the metrics are the
+ones of this process.
+
+Counters and histograms of workers that exited are kept in the totals; the
+in-flight gauges only sum live workers.
+"""
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from flask import g, request
+from prometheus_client import Counter, Gauge, Histogram
+import functools
+import os
+import time
+
+# Seconds; from cache hits (well under a millisecond) to slow upstreams and AI answers
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram('financebro_stage_seconds', 'Time spent in a FinanceAnalyzer stage',
+                          ['stage'], buckets=LATENCY_BUCKETS)
+STAGE_ERRORS = Counter('financebro_stage_errors', 'FinanceAnalyzer stages that raised', ['stage'])
+STAGE_IN_FLIGHT = Gauge('financebro_stage_in_flight', 'FinanceAnalyzer stages running now',
+                        ['stage'], multiprocess_mode='livesum')
+
+UPSTREAM_SECONDS = Histogram('financebro_upstream_request_seconds',
+                             'Upstream HTTP request time by client, host and status class',
+                             ['client', 'host', 'outcome'], buckets=LATENCY_BUCKETS)
+UPSTREAM_IN_FLIGHT = Gauge('financebro_upstream_requests_in_flight', 'Upstream HTTP requests waiting for an answer',
+                           ['client'], multiprocess_mode='livesum')
+UPSTREAM_CALLS = Counter('financebro_upstream_calls', 'Upstream calls started (leader) or joined (follower)',
+                         ['kind', 'role'])
+
+CACHE_EVENTS = Counter('financebro_cache_events', 'Cache lookups and writes by cache and result',
+                       ['cache', 'event'])
+
+HTTP_SECONDS = Histogram('financebro_http_request_seconds', 'Time to build a response, by endpoint',
+                         ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = Gauge('financebro_http_requests_in_flight', 'Requests being served now',
+                       multiprocess_mode='livesum')
+
+@contextmanager
+def stage(name):
+    """Times the enclosed block as FinanceAnalyzer stage `name`."""
+    in_flight = STAGE_IN_FLIGHT.labels(name)
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        in_flight.dec()
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+def timed_stage(name):
+    """Decorator form of stage()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count_cache_event(cache, event, n=1):
+    CACHE_EVENTS.labels(cache, event).inc(n)
+
+def count_upstream_call(kind, leader):
+    UPSTREAM_CALLS.labels(kind, 'leader' if leader else 'follower').inc()
+
+def instrument_session(session, client, per_host=True):
+    """Times every request sent through `session` (requests or curl_cffi).
+
+    Without `per_host` all requests share the host label '*', which keeps
+    clients that talk to arbitrary hosts (news sites) to one time series.
+    The class method is looked up per call, so patches applied to the session
+    class later still take effect.
+    """
+    def request_(method, url, *args, **kwargs):
+        host = (urlsplit(str(url)).hostname or '?') if per_host else '*'
+        in_flight = UPSTREAM_IN_FLIGHT.labels(client)
+        in_flight.inc()
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = type(session).request(session, method, url, *args, **kwargs)
+            outcome = f'{response.status_code // 100}xx'
+            return response
+        finally:
+            in_flight.dec()
+            UPSTREAM_SECONDS.labels(client, host, outcome).observe(time.perf_counter() - started)
+
+    session.request = request_
+    return session
+
+def init_app(app):
+    """Times every request by endpoint, except static files."""
+
+    @app.before_request
+    def _start_timer():
+        if request.endpoint != 'static':
+            HTTP_IN_FLIGHT.inc()
+            g.metrics_started = time.perf_counter()
+
+    @app.teardown_request
+    def _stop_timer(error=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        HTTP_IN_FLIGHT.dec()
+        status = getattr(g, 'metrics_status', 500)
+        HTTP_SECONDS.labels(request.endpoint or 'unmatched', request.method,
+                            f'{status // 100}xx').observe(time.perf_counter() - started)
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+def render_metrics():
+    """Returns (body, content type) in the Prometheus text format."""
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,6 +1,7 @@
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union, Any
+from typing import ClassVar, Dict, List, Optional, Union, Any
+import time
 import json
 
 @dataclass
@@ -204,3 +205,49 @@ class CompanyInfo:
         if 'last_updated' in data and isinstance(data['last_updated'], str):
             data['last_updated'] = datetime.fromisoformat(data['last_updated'])
         return cls(**data)
+
+@dataclass
+class AnalysisSnapshot:
+    """Class for the per-ticker analysis results shared by every page.
+
+    Each section carries the epoch time it was computed (None if it never was),
+    so readers can decide per section whether it is fresh enough.
+    """
+    VERSION: ClassVar[int] = 1
+    SECTIONS: ClassVar[tuple] = ('technical', 'sentiment', 'company_info')
+
+    ticker: str
+    technical: Optional[TechnicalAnalysis] = None
+    technical_at: Optional[float] = None
+    sentiment: Optional[Dict[str, Any]] = None
+    sentiment_at: Optional[float] = None
+    company_info: Optional[Dict[str, Any]] = None
+    company_info_at: Optional[float] = None
+
+    def age(self, section: str) -> Optional[float]:
+        """Seconds since a section was computed, or None if it is missing"""
+        computed_at = getattr(self, f'{section}_at')
+        return None if computed_at is None else time.time() - computed_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the snapshot to a dictionary"""
+        return {
+            'version': self.VERSION,
+            'ticker': self.ticker,
+            'technical': self.technical.to_dict() if self.technical else None,
+            'technical_at': self.technical_at,
+            'sentiment': self.sentiment,
+            'sentiment_at': self.sentiment_at,
+            'company_info': self.company_info,
+            'company_info_at': self.company_info_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional['AnalysisSnapshot']:
+        """Create a snapshot from a dictionary. Returns None for a dictionary from another version"""
+        if not data or data.get('version') != cls.VERSION:
+            return None
+        data = {k: v for k, v in data.items() if k != 'version'}
+        if data.get('technical'):
+            data['technical'] = TechnicalAnalysis.from_dict(dict(data['technical']))
+        return cls(**data)
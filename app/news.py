@@ -0,0 +1,184 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from app.appconfig import config_value
+from app.httppool import http_pool
+from app.metrics import count_cache_event
+from app.lazy import lazy_import
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# newspaper pulls in lxml, nltk and friends; only article downloads need it
+newspaper = lazy_import('newspaper')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(workers):
+    """Process-wide pool for article downloads, created on first use.
+
+    Under gunicorn's gevent worker threading is monkey-patched, so the pool's
+    threads are greenlets and a blocked download only parks its own greenlet.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='article-fetch')
+        return _executor
+
+def fetch_article_html(link, config, session):
+    """Downloads an article page over the pooled `session`, decoded the way newspaper decodes it."""
+    response = session.get(link, headers=config.headers or {'User-Agent': config.browser_user_agent},
+                           timeout=config.request_timeout, proxies=config.proxies, allow_redirects=True)
+    response.raise_for_status()
+    return newspaper.network.get_html_2XX_only(link, config, response=response)
+
+def download_article_text(link, timeout, session):
+    """Downloads and parses one article, returning its text."""
+    config = newspaper.Config()
+    config.request_timeout = timeout
+    config.fetch_images = False
+    config.memoize_articles = False
+    article = newspaper.Article(link, config=config)
+    article.download(input_html=fetch_article_html(link, config, session))
+    article.parse()
+    return article.text
+
+def fetch_article_texts(links, budget, timeout, workers):
+    """Downloads articles concurrently under an overall time budget.
+
+    Returns {link: text}, with None for every article that failed or was still
+    running when the budget ran out. Stragglers keep running in the background
+    until their own `timeout` but are never waited on.
+    """
+    if not links:
+        return {}
+    executor = _get_executor(workers)
+    # Looked up here, where the app config is available, and shared by the download threads
+    session = http_pool.session('articles')
+    started = time.monotonic()
+    futures = {executor.submit(download_article_text, link, timeout, session): link for link in links}
+    done, not_done = wait(futures, timeout=budget)
+
+    texts = {}
+    for future, link in futures.items():
+        texts[link] = None
+        if future in not_done:
+            future.cancel()
+            logger.warning(f"Article {link} missed the {budget}s news budget. Falling back to title.")
+        elif future.exception() is not None:
+            logger.warning(f"Could not process article {link}: {future.exception()}. Falling back to title.")
+        else:
+            texts[link] = future.result()
+    fetched = sum(text is not None for text in texts.values())
+    logger.info(f"Fetched {fetched}/{len(links)} articles in {time.monotonic() - started:.2f}s")
+    return texts
+
+# Query parameters that only track where a click came from
+_TRACKING_PARAMS = ('utm_', 'guccounter', 'guce_', 'ncid', 'soc_src', 'soc_trk', 'yptr', '.tsrc')
+
+def normalize_url(url):
+    """Canonical form of an article URL, so the same story shared with different tracking params hits one entry."""
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith(_TRACKING_PARAMS))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+class ArticleCache:
+    """Persistent SQLite cache of scraped articles keyed by normalized URL.
+
+    Each row keeps the extracted text, the summary snippet shown on the dashboard
+    and the sentiment polarity, so a repeat view of the same news does no downloads
+    and no NLP. Rows expire after ARTICLE_CACHE_TTL seconds, and the least recently
+    used rows are evicted beyond ARTICLE_CACHE_MAX_ENTRIES. SQLite's WAL mode lets
+    every gunicorn worker share the file.
+    """
+
+    # Longest article text kept, in characters
+    MAX_TEXT_LENGTH = 20000
+
+    def __init__(self):
+        self._initialized_paths = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return config_value('ARTICLE_CACHE_ENABLED', False)
+
+    def _connect(self):
+        path = config_value('ARTICLE_CACHE_PATH', os.path.join('instance', 'articles.sqlite'))
+        if path not in self._initialized_paths:
+            # sqlite creates the file, but not its directory
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5)
+        with self._lock:
+            if path not in self._initialized_paths:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute("""CREATE TABLE IF NOT EXISTS articles (
+                                    url TEXT PRIMARY KEY,
+                                    text TEXT,
+                                    summary TEXT,
+                                    polarity REAL NOT NULL,
+                                    fetched_at REAL NOT NULL,
+                                    accessed_at REAL NOT NULL)""")
+                conn.execute('CREATE INDEX IF NOT EXISTS articles_accessed_at ON articles (accessed_at)')
+                conn.commit()
+                self._initialized_paths.add(path)
+        return conn
+
+    def get_many(self, urls):
+        """Returns {url: {'text', 'summary', 'polarity'}} for the fresh entries among `urls`."""
+        if not self.enabled or not urls:
+            return {}
+        keys = {normalize_url(url): url for url in urls}
+        now = time.time()
+        min_fetched_at = now - config_value('ARTICLE_CACHE_TTL', 7 * 86400)
+        try:
+            conn = self._connect()
+            try:
+                placeholders = ','.join('?' * len(keys))
+                rows = conn.execute(f'SELECT url, text, summary, polarity FROM articles '
+                                    f'WHERE url IN ({placeholders}) AND fetched_at >= ?',
+                                    [*keys, min_fetched_at]).fetchall()
+                if rows:
+                    conn.execute(f'UPDATE articles SET accessed_at = ? WHERE url IN ({",".join("?" * len(rows))})',
+                                 [now, *[row[0] for row in rows]])
+                    conn.commit()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Article cache lookup failed: {e}")
+            return {}
+        count_cache_event('articles', 'hits', len(rows))
+        count_cache_event('articles', 'misses', len(keys) - len(rows))
+        return {keys[url]: {'text': text, 'summary': summary, 'polarity': polarity}
+                for url, text, summary, polarity in rows}
+
+    def put_many(self, entries):
+        """Stores {url: {'text', 'summary', 'polarity'}} and applies TTL and size eviction."""
+        if not self.enabled or not entries:
+            return
+        now = time.time()
+        rows = [(normalize_url(url), (entry['text'] or '')[:self.MAX_TEXT_LENGTH], entry['summary'],
+                 entry['polarity'], now, now) for url, entry in entries.items()]
+        try:
+            conn = self._connect()
+            try:
+                conn.executemany('INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?)', rows)
+                conn.execute('DELETE FROM articles WHERE fetched_at < ?',
+                             (now - config_value('ARTICLE_CACHE_TTL', 7 * 86400),))
+                conn.execute('DELETE FROM articles WHERE url IN '
+                             '(SELECT url FROM articles ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                             (config_value('ARTICLE_CACHE_MAX_ENTRIES', 5000),))
+                conn.commit()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Article cache write failed: {e}")
+
+article_cache = ArticleCache()
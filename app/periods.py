@@ -0,0 +1,35 @@
+from app.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# yfinance periods ordered from shortest to longest. Calendar periods are measured back
+# from the last bar (as pd.DateOffset keyword arguments); '1d' and '5d' are trading-day
+# counts. 'ytd' is left out on purpose because it doesn't nest cleanly inside the other periods.
+PERIOD_OFFSETS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': {'months': 1},
+    '3mo': {'months': 3},
+    '6mo': {'months': 6},
+    '1y': {'years': 1},
+    '2y': {'years': 2},
+    '5y': {'years': 5},
+    '10y': {'years': 10},
+    'max': None,
+}
+ORDERED_PERIODS = list(PERIOD_OFFSETS)
+
+def superset_periods(period):
+    """Returns the periods whose data also covers `period`, shortest first."""
+    if period not in PERIOD_OFFSETS:
+        return []
+    return ORDERED_PERIODS[ORDERED_PERIODS.index(period) + 1:]
+
+def slice_period(data, period):
+    """Trims a frame covering a longer period down to `period`."""
+    offset = PERIOD_OFFSETS[period]
+    if data is None or data.empty or offset is None:
+        return data
+    if isinstance(offset, int):
+        return data.iloc[-offset:]
+    return data.loc[data.index > data.index[-1] - pd.DateOffset(**offset)]
@@ -0,0 +1,211 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.appconfig import config_value
+from app.sharedcache import shared_cache
+import json
+import os
+import threading
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; every worker then prewarms on its own
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class BackgroundRefresher:
+    """Runs cache refreshes off the request path, at most one per key at a time."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'failed': 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = current_app.config.get('PREWARM_WORKERS', 4)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-refresh')
+            return self._executor
+
+    def submit(self, key, fn, *args):
+        """Schedules fn(*args) in an app context. Returns False if `key` is already being refreshed."""
+        app = current_app._get_current_object()
+        with self._lock:
+            if key in self._in_flight:
+                self._stats['deduplicated'] += 1
+                return False
+            self._in_flight.add(key)
+            self._stats['submitted'] += 1
+        self._get_executor().submit(self._run, app, key, fn, args)
+        return True
+
+    def _run(self, app, key, fn, args):
+        try:
+            with app.app_context():
+                fn(*args)
+        except Exception as e:
+            with self._lock:
+                self._stats['failed'] += 1
+            logger.error(f"Background refresh of {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+        return stats
+
+class Prewarmer:
+    """Keeps the most requested tickers warm, with one refresher per host.
+
+    Every worker counts the tickers it serves and writes its (decaying) counts to
+    the shared cache directory each PREWARM_INTERVAL. The worker holding the
+    host-wide prewarm lock adds up all the counts and refreshes the top
+    PREWARM_TOP_N tickers before their data expires. If that worker exits, its
+    lock is released and another worker takes over on its next tick.
+
+    The loop starts lazily on a worker's first request, so nothing runs in the
+    gunicorn master before the fork.
+    """
+
+    # Counts are halved every tick, so popularity follows recent traffic
+    DECAY = 0.5
+    # Counts files not updated for this many seconds belong to workers that are gone
+    STALE_COUNTS_AFTER = 600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._started = False
+        self._leader_fd = None
+        self._last_run = {'at': None, 'tickers': [], 'refreshed': 0}
+
+    @property
+    def enabled(self):
+        return config_value('PREWARM_ENABLED', False)
+
+    def record(self, ticker):
+        """Counts a request for `ticker`."""
+        if ticker:
+            with self._lock:
+                self._hits[ticker.upper()] += 1
+
+    def ensure_started(self, app, refresh):
+        """Starts this worker's loop once. `refresh(ticker)` refreshes whatever is about to expire."""
+        if self._started or not self.enabled:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        thread = threading.Thread(target=self._loop, args=(app, refresh), name='prewarm', daemon=True)
+        thread.start()
+        logger.info(f"Prewarm loop started in worker {os.getpid()}")
+
+    def _loop(self, app, refresh):
+        while True:
+            with app.app_context():
+                interval = config_value('PREWARM_INTERVAL', 15)
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    self.tick(refresh)
+            except Exception as e:
+                logger.error(f"Prewarm tick failed: {e}", exc_info=True)
+
+    def tick(self, refresh):
+        self._flush_counts()
+        if not self._is_leader():
+            return
+        tickers = self.hot_tickers()
+        refreshed = 0
+        for ticker in tickers:
+            try:
+                # A fresh app context per ticker, so nothing is memoized across tickers
+                with current_app.app_context():
+                    refreshed += bool(refresh(ticker))
+            except Exception as e:
+                logger.error(f"Prewarming {ticker} failed: {e}")
+        self._last_run = {'at': time.time(), 'tickers': tickers, 'refreshed': refreshed}
+        if refreshed:
+            logger.info(f"Prewarmed {refreshed} of {len(tickers)} hot tickers")
+
+    def _counts_dir(self):
+        """The directory workers share their counts in, or None if the shared cache directory isn't private."""
+        directory = shared_cache.private_directory()
+        return None if directory is None else os.path.join(directory, 'prewarm')
+
+    def _flush_counts(self):
+        with self._lock:
+            counts = {ticker: round(n, 3) for ticker, n in self._hits.items() if n >= 0.01}
+            self._hits = Counter({ticker: n * self.DECAY for ticker, n in counts.items()})
+        directory = self._counts_dir()
+        if directory is None:
+            return
+        path = os.path.join(directory, f'counts-{os.getpid()}.json')
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(counts, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.warning(f"Could not write prewarm counts: {e}")
+
+    def _is_leader(self):
+        """Takes the host-wide prewarm lock if no other worker holds it, and keeps it for life."""
+        if self._leader_fd is not None or fcntl is None:
+            return True
+        directory = self._counts_dir()
+        if directory is None:
+            return False
+        try:
+            fd = os.open(os.path.join(directory, 'leader.lock'), os.O_CREAT | os.O_RDWR, 0o600)
+        except OSError as e:
+            logger.warning(f"Prewarm lock unavailable: {e}")
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        logger.info(f"Worker {os.getpid()} is now the prewarm leader for this host")
+        return True
+
+    def hot_tickers(self):
+        """The PREWARM_TOP_N most requested tickers across all workers on this host."""
+        totals = Counter()
+        directory = self._counts_dir()
+        if directory is None:
+            return []
+        now = time.time()
+        try:
+            names = [name for name in os.listdir(directory) if name.startswith('counts-')]
+        except OSError:
+            return []
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.STALE_COUNTS_AFTER:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    totals.update(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return [ticker for ticker, _ in totals.most_common(config_value('PREWARM_TOP_N', 20))]
+
+    def stats(self):
+        with self._lock:
+            tracked = len(self._hits)
+        return {'leader': self._leader_fd is not None, 'tracked_tickers': tracked, 'last_run': self._last_run}
+
+background_refresher = BackgroundRefresher()
+prewarmer = Prewarmer()
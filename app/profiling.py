@@ -0,0 +1,256 @@
+"""Samples the stack of single requests and writes wall-clock and CPU profiles.
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>`, and at random
+for PROFILE_SAMPLE_RATE of all other requests. While it runs, a SIGALRM interval
+timer fires every PROFILE_INTERVAL_MS and records the request's current stack:
+
+- in the wall-clock profile each sample weighs the time since the previous one,
+  so waiting on upstreams (or parked in the gevent hub) shows up;
+- in the CPU profile it weighs the CPU time the request's thread used meanwhile,
+  and only samples where the request was actually running count.
+
+Under gevent every request is a greenlet on the main thread, where signal
+handlers run, so the request's stack is either the interrupted frame or the one
+its greenlet is parked in. In threaded servers the handler looks the request's
+thread up in sys._current_frames(). The timer is per process, so each worker
+profiles one request at a time and skips the others.
+
+Profiles go to PROFILE_DIR as speedscope files (https://www.speedscope.app, which
+also draws them as flame graphs) or, with PROFILE_FORMAT=collapsed, as folded
+stacks for flamegraph.pl.
+"""
+from collections import Counter
+from flask import current_app, g, request
+from app.appconfig import config_value
+import hmac
+import json
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+# Samples kept per profile; about 8 minutes of a request at the default interval
+MAX_SAMPLES = 100000
+
+def _current_greenlet():
+    """The running greenlet when gevent has patched threading, else None."""
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is None or not monkey.is_module_patched('threading'):
+        return None
+    import greenlet
+    return greenlet.getcurrent()
+
+def _thread_cpu_clock(ident):
+    try:
+        clock_id = time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        # No per-thread CPU clocks on this platform; fall back to the whole process
+        return time.process_time
+    return lambda: time.clock_gettime(clock_id)
+
+class _Run:
+    """The samples of one profiled request."""
+
+    def __init__(self, greenlet, thread, cpu_clock):
+        self.greenlet = greenlet
+        self.thread = thread
+        self.cpu_clock = cpu_clock
+        self.frames = {}  # (function, file, first line) -> index
+        self.samples = []  # (stack of frame indexes from the root, wall seconds, CPU seconds)
+        self.last_wall = time.perf_counter()
+        self.last_cpu = cpu_clock()
+
+    def record(self, frame, running):
+        now, cpu = time.perf_counter(), self.cpu_clock()
+        wall, cpu_used = now - self.last_wall, cpu - self.last_cpu
+        self.last_wall, self.last_cpu = now, cpu
+        if frame is None or len(self.samples) >= MAX_SAMPLES:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.frames.get(key)
+            if index is None:
+                index = self.frames[key] = len(self.frames)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        self.samples.append((tuple(stack), wall, cpu_used if running else 0.0))
+
+    def to_speedscope(self, name):
+        frames = [{'name': function, 'file': filename, 'line': line}
+                  for function, filename, line in sorted(self.frames, key=self.frames.get)]
+        profiles = []
+        for kind, column in (('wall', 1), ('cpu', 2)):
+            samples = [sample for sample in self.samples if sample[column] > 0]
+            weights = [round(sample[column] * 1000, 3) for sample in samples]
+            profiles.append({'type': 'sampled', 'name': f'{name} ({kind})', 'unit': 'milliseconds',
+                             'startValue': 0, 'endValue': round(sum(weights), 3),
+                             'samples': [list(sample[0]) for sample in samples], 'weights': weights})
+        return {'$schema': 'https://www.speedscope.app/file-format-schema.json',
+                'shared': {'frames': frames}, 'profiles': profiles, 'name': name, 'exporter': 'financebro'}
+
+    def to_collapsed(self, kind):
+        """Folded stacks ("root;...;leaf microseconds" per line) for the 'wall' or 'cpu' profile."""
+        column = 1 if kind == 'wall' else 2
+        names = [f'{function} ({os.path.basename(filename)}:{line})'
+                 for function, filename, line in sorted(self.frames, key=self.frames.get)]
+        totals = Counter()
+        for sample in self.samples:
+            totals[sample[0]] += sample[column]
+        return ''.join(f"{';'.join(names[i] for i in stack)} {round(seconds * 1e6)}\n"
+                       for stack, seconds in totals.items() if seconds > 0)
+
+class RequestProfiler:
+    """One request at a time per worker process, sampled on SIGALRM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._run = None
+        self._stats = {'profiled': 0, 'skipped_busy': 0}
+
+    def install(self):
+        """Installs the SIGALRM handler. Only possible from the main thread, on Unix."""
+        try:
+            signal.signal(signal.SIGALRM, self._on_tick)
+            # Restart interrupted system calls rather than failing them in C extensions
+            signal.siginterrupt(signal.SIGALRM, False)
+        except (AttributeError, ValueError, OSError) as e:
+            logger.warning(f"Request profiling unavailable: {e}")
+            return False
+        return True
+
+    def _on_tick(self, signum, frame):
+        run = self._run
+        if run is None:
+            return
+        if run.greenlet is not None:
+            running = run.greenlet is _current_greenlet()
+            run.record(frame if running else run.greenlet.gr_frame, running)
+        elif run.thread == threading.main_thread().ident:
+            run.record(frame, True)
+        else:
+            run.record(sys._current_frames().get(run.thread), True)
+
+    def start(self):
+        """Starts sampling the calling request. Returns False while another request is being profiled."""
+        greenlet = _current_greenlet()
+        if greenlet is not None:
+            # Every greenlet runs on the main thread, where the handler reads the clock
+            run = _Run(greenlet, None, time.thread_time)
+        else:
+            ident = threading.get_ident()
+            run = _Run(None, ident, _thread_cpu_clock(ident))
+        with self._lock:
+            if self._run is not None:
+                self._stats['skipped_busy'] += 1
+                return False
+            self._run = run
+        interval = config_value('PROFILE_INTERVAL_MS', 5) / 1000
+        signal.setitimer(signal.ITIMER_REAL, interval, interval)
+        return True
+
+    def stop(self, name):
+        """Stops sampling and writes the profile. Returns the file name, or None if nothing was written."""
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        with self._lock:
+            run, self._run = self._run, None
+            if run is None:
+                return None
+            self._stats['profiled'] += 1
+            number = self._stats['profiled']
+        if not run.samples:
+            return None
+        directory = config_value('PROFILE_DIR', os.path.join('instance', 'profiles'))
+        slug = re.sub(r'[^\w.-]+', '_', name)
+        base = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{number}-{slug}"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if config_value('PROFILE_FORMAT', 'speedscope') == 'collapsed':
+                filenames = [f'{base}.{kind}.folded' for kind in ('wall', 'cpu')]
+                for filename, kind in zip(filenames, ('wall', 'cpu')):
+                    with open(os.path.join(directory, filename), 'w') as f:
+                        f.write(run.to_collapsed(kind))
+            else:
+                filenames = [f'{base}.speedscope.json']
+                with open(os.path.join(directory, filenames[0]), 'w') as f:
+                    json.dump(run.to_speedscope(name), f, separators=(',', ':'))
+            self._prune(directory)
+        except OSError as e:
+            logger.warning(f"Could not write profile {base}: {e}")
+            return None
+        logger.info(f"Wrote {len(run.samples)}-sample profile {filenames[0]}")
+        return filenames[0]
+
+    def _prune(self, directory):
+        """Deletes the oldest profiles beyond PROFILE_MAX_FILES."""
+        max_files = config_value('PROFILE_MAX_FILES', 200)
+        with os.scandir(directory) as entries:
+            files = [entry for entry in entries if entry.is_file()]
+        if len(files) <= max_files:
+            return
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime)[:len(files) - max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:  # Pruned by another worker
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = self._run is not None
+        return stats
+
+def _requested_by_header():
+    token = current_app.config.get('PROFILE_TOKEN', '')
+    value = request.headers.get(PROFILE_HEADER)
+    return bool(token and value) and hmac.compare_digest(value.encode(), token.encode())
+
+def init_app(app):
+    """Profiles requests picked by the X-Profile header or PROFILE_SAMPLE_RATE, if either is configured."""
+    if not app.config.get('PROFILE_TOKEN') and not app.config.get('PROFILE_SAMPLE_RATE'):
+        return
+    if not profiler.install():
+        return
+
+    @app.before_request
+    def _start_profile():
+        if request.endpoint == 'static':
+            return
+        if _requested_by_header():
+            g.profile_trigger = 'header'
+        elif random.random() < current_app.config.get('PROFILE_SAMPLE_RATE', 0.0):
+            g.profile_trigger = 'sampled'
+        else:
+            return
+        if not profiler.start():
+            g.pop('profile_trigger')
+
+    def _finish_profile():
+        trigger = g.pop('profile_trigger', None)
+        if trigger is None:
+            return None
+        return profiler.stop(f'{request.method} {request.endpoint or "unmatched"}')
+
+    @app.after_request
+    def _stop_profile(response):
+        trigger = g.get('profile_trigger')
+        filename = _finish_profile()
+        if filename and trigger == 'header':
+            response.headers['X-Profile-File'] = filename
+        return response
+
+    @app.teardown_request
+    def _stop_profile_on_error(error=None):
+        # after_request is skipped when the view raised
+        _finish_profile()
+
+profiler = RequestProfiler()
@@ -1,50 +1,61 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response, stream_with_context, current_app, session
 from app.utils import FinanceAnalyzer
+from app.datacache import stock_data_cache, company_info_cache, ai_insights_cache, analysis_snapshots, unknown_symbols
+from app.singleflight import upstream_calls
+from app.httppool import http_pool
+from app.sharedcache import shared_cache
+from app.metrics import render_metrics
+from app.profiling import profiler
+from app.prewarm import prewarmer, background_refresher
 from app.forms import TickerForm, AIQuestionForm
 from app import cache
 from markdown import markdown # Import markdown
+import json
+import secrets
+import time
 
 bp = Blueprint('main', __name__)
 analyzer = FinanceAnalyzer()
 
+# A registered AI stream must be opened within this many seconds; a session holds at most this many
+AI_STREAM_TTL = 60
+AI_STREAM_MAX_PENDING = 3
+# Browsers silently drop cookies over 4096 bytes, name and attributes included
+SESSION_COOKIE_BUDGET = 3800
+
+def _session_cookie_size():
+    serializer = current_app.session_interface.get_signing_serializer(current_app)
+    return len(serializer.dumps(dict(session)))
+
+@bp.before_app_request
+def track_ticker_requests():
+    """Counts requested tickers for the prewarmer, and starts its loop on this worker's first request."""
+    prewarmer.ensure_started(current_app._get_current_object(), analyzer.prewarm_ticker)
+    ticker = (request.view_args or {}).get('ticker') or request.args.get('ticker') or request.form.get('ticker')
+    if ticker and request.endpoint != 'static':
+        prewarmer.record(ticker.strip())
+
 @bp.route('/', methods=['GET', 'POST'])
 @bp.route('/dashboard', methods=['GET', 'POST'])
 # @cache.cached(timeout=60) # REMOVE cache from the entire route
 def dashboard():
+    """Renders the page shell at once; main.js fills each panel from the /api endpoints."""
     form = TickerForm()
-    analysis = None
-    chart = None
-    ideas = []
-    sentiment_data = None
     ticker = request.args.get('ticker', None)  # Get ticker from URL param if available
     
     # Pre-fill form if ticker is provided
     if ticker and request.method == 'GET':
         form.ticker.data = ticker
+        # A bad symbol in the URL gets the form error instead of a page of failing panels
+        if not form.ticker.validate(form):
+            ticker = None
 
     if form.validate_on_submit():
         ticker = form.ticker.data.upper()
-        # Fetch data (These calls might hit cache from other pages now)
-        analysis = analyzer.get_technical_analysis(ticker)
-        sentiment_data = analyzer.get_sentiment_analysis(ticker)
-        chart = analyzer.generate_price_chart(ticker)
-        ideas = analyzer.generate_trade_ideas(ticker)
 
-        if not analysis:
-            flash(f'Could not fetch data for {ticker}. Please check the ticker symbol.', 'warning')
-        else:
-            analysis['ticker'] = ticker
-            if sentiment_data:
-                analysis['sentiment'] = sentiment_data.get('score')
-
-    # If it's a GET request or POST failed, render potentially empty
     return render_template('dashboard.html',
                          form=form,
-                         analysis=analysis,
-                         chart=chart,
-                         ideas=ideas,
-                         sentiment_data=sentiment_data,
-                         ticker=ticker) # Pass ticker to template if available
+                         ticker=ticker.upper() if ticker else None)
 
 @bp.route('/ai-insights', methods=['GET', 'POST'])
 def ai_insights():
@@ -68,6 +79,69 @@ def ai_insights():
                          insights_html=insights_html,
                          ticker=ticker)
 
+@bp.route('/ai-insights/stream', methods=['POST'])
+def ai_insights_stream_start():
+    """Registers a question for streaming and returns {"url"} to open the stream with.
+
+    The form is POSTed with its CSRF token, so other sites can't start a (paid)
+    generation, and the question is kept in the session, out of the stream URL
+    and the access log. Each stream id can be opened once, within AI_STREAM_TTL seconds.
+    """
+    ai_form = AIQuestionForm()
+    if not ai_form.validate_on_submit():
+        return jsonify({'errors': ai_form.errors}), 400
+    now = time.time()
+    pending = {stream_id: entry for stream_id, entry in session.get('ai_streams', {}).items()
+               if entry['expires'] > now}
+    while len(pending) >= AI_STREAM_MAX_PENDING:
+        pending.pop(min(pending, key=lambda stream_id: pending[stream_id]['expires']))
+    earlier = dict(pending)
+    stream_id = secrets.token_urlsafe(16)
+    pending[stream_id] = {'ticker': ai_form.ticker.data.upper(), 'question': ai_form.question.data,
+                          'expires': now + AI_STREAM_TTL}
+    session['ai_streams'] = pending
+    # Non-ASCII text grows several times when serialised, so older pending streams
+    # make room if needed; a question that can't fit alone is answered without streaming
+    while _session_cookie_size() > SESSION_COOKIE_BUDGET and len(pending) > 1:
+        pending.pop(min((other for other in pending if other != stream_id),
+                        key=lambda other: pending[other]['expires']))
+        session['ai_streams'] = pending
+    if _session_cookie_size() > SESSION_COOKIE_BUDGET:
+        session['ai_streams'] = earlier
+        return jsonify({'errors': {'question': ['This question is too long to stream.']}}), 400
+    return jsonify({'url': url_for('main.ai_insights_stream', stream_id=stream_id)})
+
+@bp.route('/ai-insights/stream/<stream_id>')
+def ai_insights_stream(stream_id):
+    """Relays the AI answer for a registered question over Server-Sent Events as it is generated.
+
+    Sends a `chunk` event ({"text"}) per generated piece, then a `done` event with
+    the whole answer rendered as HTML, the same way the non-streaming page renders it.
+    """
+    pending = session.get('ai_streams', {})
+    entry = pending.pop(stream_id, None)
+    if entry is not None:
+        session['ai_streams'] = pending
+    if entry is None or entry['expires'] < time.time():
+        return jsonify({'errors': {'stream': ['Unknown or expired stream.']}}), 404
+    ticker = entry['ticker']
+    question = entry['question']
+
+    def events():
+        # An initial comment flushes the headers, so the browser sees the stream open at once
+        yield ': stream open\n\n'
+        parts = []
+        for text in analyzer.stream_ai_insights(ticker, question):
+            parts.append(text)
+            yield _sse('chunk', {'text': text})
+        yield _sse('done', {'html': markdown(''.join(parts), extensions=['fenced_code', 'tables'])})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
 @bp.route('/analysis', methods=['GET', 'POST'])
 def analysis():
     form = TickerForm()
@@ -82,7 +156,8 @@ def analysis():
     if form.validate_on_submit():
         ticker = form.ticker.data.upper()
         company_info = analyzer.get_company_info(ticker)
-        technical_analysis = analyzer.get_technical_analysis(ticker) # Reuse existing method
+        ta = analyzer.get_technical_analysis(ticker) # Reuse existing method
+        technical_analysis = ta.to_dict() if ta else None
 
         if not company_info and not technical_analysis:
             flash(f'Could not fetch detailed analysis data for {ticker}. Please check the ticker symbol.', 'warning')
@@ -108,9 +183,12 @@ def trade_ideas():
     if ticker and request.method == 'GET':
         form.ticker.data = ticker
         # Auto-generate ideas if ticker is provided in URL
-        ideas = analyzer.generate_trade_ideas(ticker)
-        if not ideas:
-            flash(f'Could not generate trade ideas for {ticker}. This might be due to insufficient data.', 'warning')
+        if not form.ticker.validate(form):
+            ticker = None
+        else:
+            ideas = analyzer.generate_trade_ideas(ticker)
+            if not ideas:
+                flash(f'Could not generate trade ideas for {ticker}. This might be due to insufficient data.', 'warning')
 
     if form.validate_on_submit():
         ticker = form.ticker.data.upper()
@@ -122,4 +200,27 @@ def trade_ideas():
     return render_template('trade_ideas.html',
                            form=form,
                            ticker=ticker,
-                           ideas=ideas)
\ No newline at end of file
+                           ideas=ideas)
+
+@bp.route('/stats/cache')
+def cache_stats():
+    """Hit/miss counters for this worker's data caches."""
+    return jsonify({
+        'stock_data': stock_data_cache.stats(),
+        'company_info': company_info_cache.stats(),
+        'ai_insights': ai_insights_cache.stats(),
+        'analysis_snapshot': analysis_snapshots.stats(),
+        'unknown_symbols': unknown_symbols.stats(),
+        'shared_cache': shared_cache.stats(),
+        'upstream_calls': upstream_calls.stats(),
+        'background_refresh': background_refresher.stats(),
+        'prewarm': prewarmer.stats(),
+        'http_pool': http_pool.stats(),
+        'profiler': profiler.stats()
+    })
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """Stage, upstream and cache metrics in the Prometheus text format, summed over all workers."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
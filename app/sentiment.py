@@ -0,0 +1,155 @@
+"""Batched lexicon sentiment scoring.
+
+Scores many documents at once against a precompiled copy of the Pattern/TextBlob
+English sentiment lexicon, so no TextBlob objects or NLTK corpora are needed at
+runtime. Polarity is in [-1.0, 1.0] and follows TextBlob's PatternAnalyzer rules
+for the common cases: the mean polarity of the known words in a document, with
+adverb intensifiers ("very good"), negation ("not good", "not a good") and
+exclamation marks ("good!").
+
+Regenerate the lexicon after upgrading TextBlob with:
+    python -m app.sentiment
+"""
+from xml.etree import ElementTree
+import importlib.util
+import os
+import re
+import threading
+import numpy as np
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sentiment_lexicon.tsv')
+NEGATIONS = ('no', 'not', "n't", 'never')
+
+# Contractions are split the way Pattern's tokenizer does it ("don't" -> "do", "n't")
+_TOKEN_RE = re.compile(r"[a-z]+(?=n't)|n't|[a-z]+(?:-[a-z]+)*|!")
+
+class LexiconScorer:
+    """Vectorized sentiment scorer. The lexicon is loaded on first use."""
+
+    def __init__(self, path=LEXICON_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._vocab = None
+
+    def _load(self):
+        with self._lock:
+            if self._vocab is not None:
+                return
+            words, polarity, intensity, modifier = [], [], [], []
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('#'):
+                        continue
+                    word, p, i, m = line.rstrip('\n').split('\t')
+                    words.append(word)
+                    polarity.append(float(p))
+                    intensity.append(float(i))
+                    modifier.append(m == '1')
+            order = np.argsort(words)
+            self._polarity = np.array(polarity)[order]
+            self._intensity = np.array(intensity)[order]
+            self._modifier = np.array(modifier)[order]
+            self._vocab = np.array(words)[order]
+
+    def score(self, documents):
+        """Returns an array with the polarity of each document (0.0 when no known words occur)."""
+        if self._vocab is None:
+            self._load()
+        n_docs = len(documents)
+        token_lists = [_TOKEN_RE.findall(doc.lower()) if doc else [] for doc in documents]
+        lengths = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=n_docs)
+        if n_docs == 0 or lengths.sum() == 0:
+            return np.zeros(n_docs)
+
+        tokens = np.array([token for tokens in token_lists for token in tokens])
+        doc_ids = np.repeat(np.arange(n_docs), lengths)
+        # Whether each token continues the document of the token before it
+        same_doc = np.r_[False, doc_ids[1:] == doc_ids[:-1]]
+
+        idx = np.minimum(np.searchsorted(self._vocab, tokens), self._vocab.size - 1)
+        known = self._vocab[idx] == tokens
+        polarity = np.where(known, self._polarity[idx], 0.0)
+        intensity = np.where(known, self._intensity[idx], 1.0)
+        is_modifier = known & self._modifier[idx]
+        is_negation = np.isin(tokens, NEGATIONS)
+
+        def shifted(values, by, fill):
+            """values[i - by] (from the same document), else `fill`."""
+            out = np.full_like(values, fill)
+            out[by:] = values[:-by]
+            valid = same_doc.copy()
+            for step in range(1, by):
+                valid[step:] &= same_doc[:-step]
+            return np.where(valid, out, fill)
+
+        # "very good": the adverb scales the next known word and is merged into it
+        after_modifier = known & shifted(is_modifier, 1, False)
+        polarity = np.where(after_modifier, np.clip(polarity * shifted(intensity, 1, 1.0), -1.0, 1.0), polarity)
+        merged_into_next = is_modifier & np.r_[after_modifier[1:], False]
+        assessed = known & ~merged_into_next
+
+        # "good!" is boosted by a following exclamation mark
+        before_bang = np.r_[(tokens[1:] == '!') & same_doc[1:], False]
+        polarity = np.where(before_bang, np.clip(polarity * 1.25, -1.0, 1.0), polarity)
+
+        # "not good", "not a good" and "not very good" flip and halve the polarity
+        short_unknown = ~known & (np.char.str_len(tokens) <= 1)
+        negated = (shifted(is_negation, 1, False)
+                   | (shifted(is_negation, 2, False) & shifted(short_unknown, 1, False))
+                   | (after_modifier & shifted(is_negation, 2, False)))
+        polarity = np.where(negated, polarity * -0.5, polarity)
+
+        sums = np.bincount(doc_ids[assessed], weights=polarity[assessed], minlength=n_docs)
+        counts = np.bincount(doc_ids[assessed], minlength=n_docs)
+        return np.divide(sums, counts, out=np.zeros(n_docs), where=counts > 0)
+
+_scorer = LexiconScorer()
+
+def score_documents(documents):
+    """Scores a batch of documents. Returns a list of polarities in [-1.0, 1.0]."""
+    return _scorer.score(list(documents)).tolist()
+
+def compile_lexicon(xml_path, out_path=LEXICON_PATH):
+    """Flattens the Pattern sentiment XML into the TSV lexicon used by LexiconScorer.
+
+    Scores are averaged over senses per part of speech, then over parts of speech,
+    exactly as Pattern does for untagged text.
+    """
+    senses = {}
+    for node in ElementTree.parse(xml_path).getroot().findall('word'):
+        form = node.attrib.get('form')
+        if not form:
+            continue
+        psi = (float(node.attrib.get('polarity', 0.0)), float(node.attrib.get('intensity', 1.0)))
+        senses.setdefault(form, {}).setdefault(node.attrib.get('pos'), []).append(psi)
+
+    # form -> (polarity, intensity, is_modifier)
+    lexicon = {}
+    per_pos = {}
+    for form, by_pos in senses.items():
+        per_pos[form] = {pos: np.mean(values, axis=0) for pos, values in by_pos.items()}
+        polarity, intensity = np.mean(list(per_pos[form].values()), axis=0)
+        lexicon[form] = (polarity, intensity, 'RB' in by_pos)
+
+    # Like TextBlob, derive adverbs from adjectives ("terrible" -> "terribly")
+    for form, by_pos in per_pos.items():
+        if 'JJ' in by_pos:
+            stem = form[:-1] + 'i' if form.endswith('y') else form
+            stem = stem[:-2] if stem.endswith('le') else stem
+            polarity, intensity = by_pos['JJ']
+            lexicon[stem + 'ly'] = (polarity, intensity, True)
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write('# Compiled from the Pattern English sentiment lexicon (PDDL) by app/sentiment.py\n')
+        f.write('# word\tpolarity\tintensity\tmodifier\n')
+        for form in sorted(lexicon):
+            polarity, intensity, is_modifier = lexicon[form]
+            f.write(f'{form}\t{polarity:.6g}\t{intensity:.6g}\t{int(is_modifier)}\n')
+
+if __name__ == '__main__':
+    # Locate TextBlob's bundled lexicon without importing TextBlob (and NLTK)
+    spec = importlib.util.find_spec('textblob')
+    source = os.path.join(spec.submodule_search_locations[0], 'en', 'en-sentiment.xml')
+    compile_lexicon(source)
+    print(f'Wrote {LEXICON_PATH} from {source}')
@@ -0,0 +1,323 @@
+from contextlib import contextmanager
+from stat import S_ISDIR
+from app.appconfig import config_value
+from app.lazy import lazy_import
+import numpy as np
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; writer election is skipped there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+pd = lazy_import('pandas')
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Temp files this old were left behind by a worker that died mid-write
+STALE_TMP_SECONDS = 300
+
+def _default_directory():
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    # One per user, so another account can't create it first
+    return os.path.join(base, f'financebro-{os.getuid()}' if hasattr(os, 'getuid') else 'financebro')
+
+class SharedMemoryCache:
+    """Host-wide cache shared by every gunicorn worker through memory-mapped files.
+
+    OHLCV frames are stored as a single float64 .npy matrix (epoch seconds followed
+    by the OHLCV columns) and read back with np.memmap, so every worker's DataFrame
+    is a view over the same page-cache pages. Other values are pickled. Entries are
+    replaced atomically and expire based on the file's mtime. By default the files
+    live in /dev/shm/financebro-<uid>, so they never touch the disk; the directory
+    must be private to the app's user (see private_directory).
+
+    Since that is RAM (and only 64 MB in a default Docker container), set() sweeps
+    the directory every SHARED_CACHE_SWEEP_INTERVAL seconds: expired entries go,
+    then the oldest ones until the rest fit in SHARED_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self):
+        self._local_locks = {}
+        self._local_locks_guard = threading.Lock()
+        self._timeouts = {}  # file name prefix -> callable returning its entries' timeout
+        self._next_sweep = 0.0
+        self._stats = {'sweeps': 0, 'removed': 0}
+        self._refused = set()  # directories already reported as unsafe
+
+    @property
+    def enabled(self):
+        return config_value('SHARED_CACHE_ENABLED', False) and self.private_directory() is not None
+
+    @property
+    def directory(self):
+        return config_value('SHARED_CACHE_DIR', None) or _default_directory()
+
+    def private_directory(self):
+        """The cache directory, created with mode 0700, or None if it isn't private to this user.
+
+        Entries are unpickled, so a directory another local user owns or can write
+        to would let them run code in the app; such a directory is never used.
+        """
+        directory = self.directory
+        try:
+            try:
+                info = os.lstat(directory)
+            except FileNotFoundError:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+                info = os.lstat(directory)
+        except OSError as e:
+            problem = f'unusable ({e})'
+        else:
+            if not hasattr(os, 'getuid'):
+                return directory
+            if not S_ISDIR(info.st_mode):
+                problem = 'not a directory'
+            elif info.st_uid != os.getuid():
+                problem = f'owned by uid {info.st_uid}, not {os.getuid()}'
+            elif info.st_mode & 0o077:
+                problem = f'open to other users (mode {oct(info.st_mode & 0o777)})'
+            else:
+                return directory
+        if directory not in self._refused:
+            self._refused.add(directory)
+            logger.error(f"Shared cache disabled: {directory} is {problem}. "
+                         f"It must be a directory owned by this user with mode 0700.")
+        return None
+
+    @staticmethod
+    def _file_name(name):
+        return re.sub(r'[^A-Za-z0-9._-]', '_', name)
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, self._file_name(name) + suffix)
+
+    def register(self, prefix, timeout):
+        """Lets sweep() expire entries whose names start with `prefix` once older than `timeout()` seconds.
+
+        Entries matching no registered prefix expire after the longest registered timeout.
+        """
+        self._timeouts[self._file_name(prefix)] = timeout
+
+    @staticmethod
+    def _is_ohlcv_frame(value):
+        # Nothing can be a DataFrame before pandas is imported, so plain values never import it
+        return (pd.loaded and isinstance(value, pd.DataFrame) and isinstance(value.index, pd.DatetimeIndex)
+                and list(value.columns) == OHLCV_COLUMNS)
+
+    def get(self, name, timeout):
+        """Returns the value stored under `name` if it is younger than `timeout` seconds."""
+        return self.get_entry(name, timeout)[0]
+
+    def get_entry(self, name, timeout):
+        """Like get, but returns (value, age in seconds), or (None, None)."""
+        for suffix, reader in (('.npy', self._read_frame), ('.pkl', self._read_pickle)):
+            path = self._path(name, suffix)
+            try:
+                age = time.time() - os.stat(path).st_mtime
+                if age > timeout:
+                    continue
+                return reader(path), max(age, 0.0)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable shared cache entry {path}: {e}")
+        return None, None
+
+    @staticmethod
+    def _read_frame(path):
+        matrix = np.load(path, mmap_mode='r')
+        index = pd.to_datetime(np.asarray(matrix[:, 0]), unit='s')
+        index.name = 'Date'
+        return pd.DataFrame(matrix[:, 1:], index=index, columns=OHLCV_COLUMNS, copy=False)
+
+    @staticmethod
+    def _read_pickle(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def set(self, name, value):
+        """Publishes a value to every worker. Returns the shared (memory-mapped) copy when there is one."""
+        if self.private_directory() is None:
+            return value
+        try:
+            if self._is_ohlcv_frame(value):
+                path = self._path(name, '.npy')
+                matrix = np.empty((len(value), len(OHLCV_COLUMNS) + 1), dtype=np.float64)
+                index = value.index.tz_localize(None) if value.index.tz is not None else value.index
+                matrix[:, 0] = index.values.astype('datetime64[s]').astype(np.int64)
+                matrix[:, 1:] = value[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+                self._replace(path, lambda f: np.save(f, matrix))
+                return self._read_frame(path)
+            self._replace(self._path(name, '.pkl'), lambda f: pickle.dump(value, f, pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {name}: {e}")
+        finally:
+            self._maybe_sweep()
+        return value
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + config_value('SHARED_CACHE_SWEEP_INTERVAL', 60)
+        try:
+            self.sweep()
+        except OSError as e:
+            logger.warning(f"Shared cache sweep failed: {e}")
+
+    def sweep(self):
+        """Deletes expired entries, unused lock files and abandoned temp files, then the
+        oldest entries until the rest fit in SHARED_CACHE_MAX_BYTES. Returns the number of files deleted.
+
+        Any worker may sweep at any time; files another worker deleted first are skipped.
+        """
+        now = time.time()
+        timeouts = sorted(((prefix, timeout()) for prefix, timeout in list(self._timeouts.items())),
+                          key=lambda item: -len(item[0]))
+        default_timeout = max((timeout for _, timeout in timeouts), default=0)
+        try:
+            with os.scandir(self.directory) as entries:
+                files = [(entry.name, entry.path, entry.stat()) for entry in entries
+                         if entry.is_file(follow_symlinks=False)]
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        live = []  # (mtime, size, path, stem) of unexpired entries
+        locks = []
+        for name, path, stat in files:
+            stem, suffix = os.path.splitext(name)
+            age = now - stat.st_mtime
+            if suffix == '.lock':
+                locks.append((stem, path))
+            elif suffix == '.tmp':
+                if age > STALE_TMP_SECONDS:
+                    removed += self._remove(path)
+            elif suffix in ('.npy', '.pkl'):
+                timeout = next((t for prefix, t in timeouts if stem.startswith(prefix)), default_timeout)
+                if age > timeout:
+                    removed += self._remove(path)
+                else:
+                    live.append((stat.st_mtime, stat.st_size, path, stem))
+
+        total = sum(size for _, size, _, _ in live)
+        max_bytes = config_value('SHARED_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+        live.sort()
+        while live and total > max_bytes:
+            _, size, path, _ = live.pop(0)
+            removed += self._remove(path)
+            total -= size
+
+        live_stems = {stem for _, _, _, stem in live}
+        for stem, path in locks:
+            if stem not in live_stems:
+                removed += self._remove_lock(path)
+
+        self._stats['sweeps'] += 1
+        self._stats['removed'] += removed
+        if removed:
+            logger.info(f"Shared cache sweep removed {removed} files; {len(live)} entries, {total} bytes left")
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _remove_lock(path):
+        """Deletes a lock file, but only while nobody holds it. See writer() for the other half."""
+        if fcntl is None:
+            return SharedMemoryCache._remove(path)
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return 0
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return 0
+        try:
+            return SharedMemoryCache._remove(path)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def stats(self):
+        return dict(self._stats)
+
+    @staticmethod
+    def _replace(path, write):
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _still_linked(fd, path):
+        try:
+            return os.fstat(fd).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def writer(self, name, wait=10.0, poll_interval=0.05):
+        """Holds the host-wide writer lock for `name`, so only one worker refreshes it.
+
+        Waiting polls a non-blocking flock and sleeps in between, which yields to
+        other greenlets instead of blocking the whole gevent worker. If the lock
+        can't be had within `wait` seconds the caller proceeds without it.
+        """
+        if not self.enabled or fcntl is None:
+            yield
+            return
+        with self._local_locks_guard:
+            local_lock = self._local_locks.setdefault(name, threading.Lock())
+        fd = None
+        with local_lock:
+            try:
+                path = self._path(name, '.lock')
+                fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+                deadline = time.monotonic() + wait
+                while True:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        if time.monotonic() > deadline:
+                            logger.warning(f"Timed out waiting for shared cache writer lock on {name}")
+                            os.close(fd)
+                            fd = None
+                            break
+                        time.sleep(poll_interval)
+                        continue
+                    if self._still_linked(fd, path):
+                        break
+                    # A sweep deleted the lock file while we waited for it; lock the one at the path now
+                    os.close(fd)
+                    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            except OSError as e:
+                logger.warning(f"Shared cache writer lock unavailable for {name}: {e}")
+                if fd is not None:
+                    os.close(fd)
+                fd = None
+            try:
+                yield
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+
+shared_cache = SharedMemoryCache()
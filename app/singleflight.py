@@ -0,0 +1,59 @@
+from app.metrics import count_upstream_call
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key runs the function; callers arriving while it is
+    running wait for it and get the same result (or exception). Under gunicorn's
+    gevent workers threading is monkey-patched, so waiting only parks the greenlet.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['calls'] += 1
+            else:
+                self._stats['coalesced'] += 1
+        # Keys start with the kind of call, e.g. ('stock_data', ticker, period)
+        count_upstream_call(key[0] if isinstance(key, tuple) else key, leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+# One instance per worker process, shared by every upstream client
+upstream_calls = SingleFlight()
@@ -24,7 +24,7 @@ document.addEventListener('DOMContentLoaded', function() {
             // Add validation - ticker should be 1-5 chars, alphanumeric
             tickerInput.addEventListener('blur', function() {
                 const value = this.value.trim();
-                const isValid = /^[A-Z0-9.]{1,5}$/.test(value);
+                const isValid = /^[A-Z0-9.-]{1,5}$/.test(value);
                 
                 if (!isValid && value !== '') {
                     this.classList.add('is-invalid');
@@ -59,6 +59,15 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Suggest tickers from the server's local symbol index
+    setupTickerAutocomplete();
+    
+    // Fill the dashboard panels from the API
+    loadPanels();
+    
+    // Stream AI answers as they are generated
+    setupInsightStreaming();
+    
     // Add animation to cards
     animateCards();
     
@@ -158,4 +167,275 @@ function formatFinancialData() {
     document.querySelectorAll('[data-trend]').forEach(el => {
         el.classList.add(getTrendClass(el.dataset.trend));
     });
-} 
\ No newline at end of file
+} 
+
+const AUTOCOMPLETE_DELAY_MS = 150;
+
+/**
+ * Attach a <datalist> of matching symbols to every ticker input. Suggestions
+ * come from /api/symbols, which answers from a local index without touching
+ * any market data upstream; answers are remembered per prefix.
+ */
+function setupTickerAutocomplete() {
+    const src = document.body.dataset.symbolsSrc;
+    if (!src) return;
+    const answers = new Map();
+    
+    document.querySelectorAll('input[name="ticker"]').forEach((input, index) => {
+        const list = document.createElement('datalist');
+        list.id = `ticker-suggestions-${index}`;
+        input.after(list);
+        input.setAttribute('list', list.id);
+        input.setAttribute('autocomplete', 'off');
+        
+        let timer = null;
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = this.value.trim();
+            if (!query) {
+                list.innerHTML = '';
+                return;
+            }
+            timer = setTimeout(() => {
+                const answer = answers.get(query) || fetch(`${src}?${new URLSearchParams({ q: query, limit: 8 })}`)
+                    .then(response => response.ok ? response.json() : { matches: [] })
+                    .then(body => body.matches);
+                answers.set(query, answer);
+                answer.then(matches => {
+                    list.innerHTML = '';
+                    matches.forEach(match => {
+                        const option = document.createElement('option');
+                        option.value = match.symbol;
+                        option.label = match.name;
+                        list.appendChild(option);
+                    });
+                }).catch(() => answers.delete(query));
+            }, AUTOCOMPLETE_DELAY_MS);
+        });
+    });
+}
+
+// Longest a panel waits for its endpoint before showing a timeout message, outside the dashboard's deadline
+const PANEL_TIMEOUT_MS = 15000;
+
+/**
+ * Load every [data-panel] element from its data-src endpoint in parallel.
+ * Each panel is filled as soon as its own response arrives. The panels share
+ * one deadline (DASHBOARD_DEADLINE, from data-panels-deadline-ms); a panel that
+ * misses it shows the timeout message while the rest of the page is kept.
+ */
+function loadPanels() {
+    const holder = document.querySelector('[data-panels-deadline-ms]');
+    const timeout = holder ? Number(holder.dataset.panelsDeadlineMs) : PANEL_TIMEOUT_MS;
+    document.querySelectorAll('[data-panel][data-src]').forEach(panel => loadPanel(panel, panel.dataset.src, timeout));
+    setupChartPeriods();
+}
+
+/**
+ * Fetch one panel's endpoint and render the response, or an error message.
+ * @param {Element} panel - The panel element
+ * @param {string} src - URL of the panel's endpoint
+ * @param {number} [timeout=PANEL_TIMEOUT_MS] - Milliseconds to wait before giving up on it
+ */
+function loadPanel(panel, src, timeout = PANEL_TIMEOUT_MS) {
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), timeout);
+    
+    fetch(src, { signal: controller.signal, headers: { 'Accept': 'application/json' } })
+        .then(response => response.json().then(body => ({ ok: response.ok, body: body })))
+        .then(({ ok, body }) => {
+            if (!ok) throw new Error(body.error || 'Request failed');
+            renderPanel(panel, body);
+        })
+        .catch(error => {
+            const message = error.name === 'AbortError'
+                ? 'This is taking longer than usual. Refresh in a moment to try again.'
+                : error.message;
+            showPanelError(panel, message);
+        })
+        .finally(() => clearTimeout(timer));
+}
+
+/**
+ * Reload the chart panel for the period of the clicked [data-chart-period] button.
+ */
+function setupChartPeriods() {
+    const panel = document.querySelector('[data-panel="chart"][data-src]');
+    const buttons = document.querySelectorAll('[data-chart-period]');
+    buttons.forEach(button => {
+        button.addEventListener('click', function() {
+            buttons.forEach(other => other.classList.toggle('active', other === button));
+            const params = new URLSearchParams({ period: button.dataset.chartPeriod });
+            loadPanel(panel, `${panel.dataset.src}?${params}`);
+        });
+    });
+}
+
+/**
+ * Put a panel response into the page: HTML fragments into their
+ * [data-fragment] slots, and chart figures into [data-chart].
+ * @param {Element} panel - The panel element
+ * @param {Object} body - The {ticker, data, fragments} API response
+ */
+function renderPanel(panel, body) {
+    Object.entries(body.fragments || {}).forEach(([name, html]) => {
+        const slot = document.querySelector(`[data-fragment="${name}"]`);
+        if (slot) slot.innerHTML = html;
+    });
+    
+    const chart = panel.querySelector('[data-chart]');
+    if (chart && body.data) {
+        chart.className = '';
+        chart.innerHTML = '';
+        renderChart(chart, body.data);
+    }
+    
+    animateCards();
+}
+
+/**
+ * Decode a {dtype, bdata} array from the chart endpoint into a typed array.
+ * @param {Object} encoded - Base64 little-endian 'f4' (float32) or 'i4' (int32) values
+ * @returns {Float32Array|Int32Array} The decoded values
+ */
+function decodeArray(encoded) {
+    const binary = atob(encoded.bdata);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+    return encoded.dtype === 'i4' ? new Int32Array(bytes.buffer) : new Float32Array(bytes.buffer);
+}
+
+/**
+ * Draw a compact chart payload ({x, traces, layout}) with Plotly.
+ * Dates arrive as day numbers since 1970-01-01.
+ * @param {Element} element - The chart container
+ * @param {Object} payload - The chart endpoint's data
+ */
+function renderChart(element, payload) {
+    const x = Array.from(decodeArray(payload.x), day => new Date(day * 86400000).toISOString().slice(0, 10));
+    const traces = payload.traces.map(trace => ({
+        type: 'scatter',
+        mode: 'lines',
+        name: trace.name,
+        x: x,
+        y: decodeArray(trace.y),
+        line: trace.line
+    }));
+    Plotly.newPlot(element, traces, payload.layout, { responsive: true });
+}
+
+/**
+ * Replace a panel's loading placeholders with an error message. The message goes
+ * into the panel's chart or first fragment slot (data-fragments lists the slots
+ * the panel's endpoint fills); its other slots are cleared.
+ * @param {Element} panel - The panel element
+ * @param {string} message - Message to show
+ */
+function showPanelError(panel, message) {
+    // Optional panels (data-quiet) just stay empty
+    if ('quiet' in panel.dataset) return;
+    
+    const slots = (panel.dataset.fragments || '').split(' ').filter(Boolean)
+        .map(name => document.querySelector(`[data-fragment="${name}"]`));
+    const chart = panel.querySelector('[data-chart]');
+    if (chart) slots.unshift(chart);
+    
+    slots.filter(Boolean).forEach((slot, index) => {
+        slot.innerHTML = '';
+        if (index === 0) {
+            const alert = document.createElement('div');
+            alert.className = 'alert alert-warning mt-3';
+            alert.innerHTML = '<i class="fas fa-exclamation-triangle me-2"></i>';
+            alert.appendChild(document.createTextNode(message));
+            slot.appendChild(alert);
+        }
+    });
+}
+
+/**
+ * Submit forms marked with data-stream-src over Server-Sent Events instead of a
+ * full page POST, showing the AI answer as it is generated. The form (with its
+ * CSRF token) is POSTed to data-stream-src, which answers with the URL of the
+ * stream. Without EventSource, or if the form is rejected, it falls back to a
+ * normal submit.
+ */
+function setupInsightStreaming() {
+    if (!('EventSource' in window)) return;
+    
+    document.querySelectorAll('form[data-stream-src]').forEach(form => {
+        form.addEventListener('submit', function(e) {
+            const ticker = form.querySelector('[name="ticker"]').value.trim().toUpperCase();
+            const question = form.querySelector('[name="question"]').value.trim();
+            if (!ticker || !question) return;  // let the server report the missing fields
+            e.preventDefault();
+            
+            const target = document.querySelector(form.dataset.streamTarget);
+            target.innerHTML = `
+                <div class="card shadow-sm">
+                    <div class="card-header bg-primary text-white">
+                        <h5><i class="bi bi-robot me-2"></i>AI Analysis for <span data-ai-ticker></span></h5>
+                    </div>
+                    <div class="card-body">
+                        <div class="ai-response p-3 bg-light rounded border" style="white-space: pre-wrap;" data-ai-output>
+                            <span class="spinner-border spinner-border-sm me-2" role="status" aria-hidden="true"></span>Crunching the numbers...
+                        </div>
+                    </div>
+                </div>`;
+            target.querySelector('[data-ai-ticker]').textContent = ticker;
+            const output = target.querySelector('[data-ai-output]');
+            
+            const submit = form.querySelector('[type="submit"]');
+            const submitLabel = submit.value;
+            submit.disabled = true;
+            submit.value = 'Thinking...';
+            let source = null;
+            const finish = () => {
+                if (source) source.close();
+                submit.disabled = false;
+                submit.value = submitLabel;
+            };
+            
+            fetch(form.dataset.streamSrc, { method: 'POST', body: new FormData(form), credentials: 'same-origin' })
+                .then(response => response.ok ? response.json() : Promise.reject(response))
+                .then(({ url }) => {
+                    source = new EventSource(url);
+                    streamInto(source, output, finish);
+                })
+                .catch(() => {
+                    // Let the server render the validation errors (or the answer) the normal way
+                    finish();
+                    // form.submit is shadowed by the input named "submit"
+                    HTMLFormElement.prototype.submit.call(form);
+                });
+        });
+    });
+}
+
+/**
+ * Show a stream's `chunk` events in `output` as they arrive, then the rendered `done` answer.
+ */
+function streamInto(source, output, finish) {
+    let received = false;
+    
+    source.addEventListener('chunk', event => {
+        if (!received) {
+            output.textContent = '';
+            received = true;
+        }
+        output.textContent += JSON.parse(event.data).text;
+    });
+    
+    source.addEventListener('done', event => {
+        // Swap the raw text for the server-rendered markdown
+        output.style.whiteSpace = '';
+        output.innerHTML = JSON.parse(event.data).html;
+        finish();
+    });
+    
+    source.onerror = () => {
+        if (!received) {
+            output.textContent = 'Sorry, bro! The AI analysis could not be loaded. Please try again.';
+        }
+        finish();
+    };
+}
@@ -0,0 +1,172 @@
+"""Local symbol index and negative cache, so bad tickers are rejected before any upstream call.
+
+The index is a sorted array of symbols loaded from app/data/symbols.tsv, searched
+with bisect: membership tests and prefix autocomplete cost a few string compares,
+with no network involved. The bundled file is a partial list; refresh it with the
+full NASDAQ Trader symbol directory (NASDAQ, NYSE and other US exchanges) with:
+    python -m app.symbols
+
+Symbols the upstream returned no data for are remembered in a negative cache for
+NEGATIVE_CACHE_TIMEOUT seconds, so repeating a typo costs nothing.
+"""
+from bisect import bisect_left
+from urllib.request import urlopen
+from flask import current_app, has_app_context
+from app.datacache import unknown_symbols
+import os
+import re
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+SYMBOLS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symbols.tsv')
+SYMBOL_DIRECTORY_URL = 'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt'
+
+# Same rule the ticker inputs enforce client-side in main.js
+SYMBOL_RE = re.compile(r'^[A-Z0-9.-]{1,5}$')
+
+def normalize_symbol(text):
+    """Upper-cased, stripped symbol, or None if it can't be a ticker at all."""
+    symbol = (text or '').strip().upper()
+    return symbol if SYMBOL_RE.match(symbol) else None
+
+class SymbolIndex:
+    """Sorted symbol list with O(log n) lookups and prefix search. Loaded on first use."""
+
+    def __init__(self, path=SYMBOLS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._symbols = None
+        self._names = None
+        self._by_name = None
+        self.complete = False
+
+    def _load(self):
+        with self._lock:
+            if self._symbols is not None:
+                return
+            rows = {}
+            complete = False
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    for line in f:
+                        if line.startswith('#'):
+                            complete = complete or line.strip() == '# complete: 1'
+                            continue
+                        symbol, _, name = line.rstrip('\n').partition('\t')
+                        if symbol:
+                            rows[symbol] = name
+            except OSError as e:
+                logger.error(f"Could not load symbol index {self.path}: {e}")
+            self._symbols = sorted(rows)
+            self._names = [rows[symbol] for symbol in self._symbols]
+            # (lower-cased name, symbol) pairs, so "appl" also finds AAPL
+            self._by_name = sorted((name.lower(), symbol) for symbol, name in rows.items() if name)
+            self.complete = complete
+            logger.info(f"Loaded {len(self._symbols)} symbols ({'complete' if complete else 'partial'} index)")
+
+    def _ensure_loaded(self):
+        if self._symbols is None:
+            self._load()
+
+    def __contains__(self, symbol):
+        self._ensure_loaded()
+        i = bisect_left(self._symbols, symbol)
+        return i < len(self._symbols) and self._symbols[i] == symbol
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._symbols)
+
+    def name(self, symbol):
+        self._ensure_loaded()
+        i = bisect_left(self._symbols, symbol)
+        if i < len(self._symbols) and self._symbols[i] == symbol:
+            return self._names[i]
+        return None
+
+    def search(self, query, limit=10):
+        """Symbols starting with `query`, then companies whose name starts with it, as [{symbol, name}]."""
+        self._ensure_loaded()
+        query = (query or '').strip()
+        if not query:
+            return []
+        matches = []
+        prefix = query.upper()
+        i = bisect_left(self._symbols, prefix)
+        while i < len(self._symbols) and len(matches) < limit and self._symbols[i].startswith(prefix):
+            matches.append({'symbol': self._symbols[i], 'name': self._names[i]})
+            i += 1
+        seen = {match['symbol'] for match in matches}
+        prefix = query.lower()
+        i = bisect_left(self._by_name, (prefix,))
+        while i < len(self._by_name) and len(matches) < limit and self._by_name[i][0].startswith(prefix):
+            symbol = self._by_name[i][1]
+            if symbol not in seen:
+                matches.append({'symbol': symbol, 'name': self.name(symbol)})
+            i += 1
+        return matches
+
+symbol_index = SymbolIndex()
+
+def _strict():
+    """Whether symbols missing from the index are rejected ('auto': only when the index is complete)."""
+    setting = str(current_app.config.get('SYMBOL_INDEX_STRICT', 'auto') if has_app_context() else 'auto').lower()
+    if setting == 'auto':
+        return symbol_index.complete
+    return setting == 'true'
+
+def check_symbol(ticker):
+    """Returns None if `ticker` is worth looking up upstream, else the reason it is rejected."""
+    symbol = normalize_symbol(ticker)
+    if symbol is None:
+        return 'Please enter a valid ticker symbol (1-5 letters, digits, dots or dashes).'
+    if symbol in symbol_index:
+        return None
+    if _strict():
+        return f'Unknown ticker symbol {symbol}.'
+    if unknown_symbols.get(symbol):
+        return f'No market data found for {symbol}. Please check the ticker symbol.'
+    return None
+
+def record_unknown(ticker):
+    """Remembers that the upstream has no data for `ticker`.
+
+    Indexed symbols are never recorded: an empty answer for a listed symbol is far
+    more likely a throttled or failed upstream call than a bad ticker.
+    """
+    symbol = normalize_symbol(ticker)
+    if symbol and symbol not in symbol_index:
+        logger.info(f"Caching {symbol} as an unknown symbol")
+        unknown_symbols.set(symbol, True)
+
+def refresh_symbols(out_path=SYMBOLS_PATH, url=SYMBOL_DIRECTORY_URL):
+    """Rebuilds the symbol file from the NASDAQ Trader directory of all US-traded symbols."""
+    with urlopen(url, timeout=30) as response:
+        lines = response.read().decode('utf-8', errors='replace').splitlines()
+    header = lines[0].split('|')
+    symbol_col, name_col, test_col = header.index('Symbol'), header.index('Security Name'), header.index('Test Issue')
+    rows = {}
+    for line in lines[1:]:
+        fields = line.split('|')
+        # The last line is "File Creation Time: ..."
+        if len(fields) != len(header) or fields[test_col] == 'Y':
+            continue
+        # The directory writes class shares as BRK.B; Yahoo knows them as BRK-B
+        symbol = normalize_symbol(fields[symbol_col].replace('.', '-'))
+        if symbol:
+            rows[symbol] = fields[name_col].replace('\t', ' ').strip()
+
+    with open(out_path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(f'# All US-traded symbols from {url}\n')
+        f.write('# complete: 1\n')
+        f.write('# symbol\tname\n')
+        for symbol in sorted(rows):
+            f.write(f'{symbol}\t{rows[symbol]}\n')
+    os.replace(out_path + '.tmp', out_path)
+    return len(rows)
+
+if __name__ == '__main__':
+    count = refresh_symbols()
+    print(f'Wrote {count} symbols to {SYMBOLS_PATH}')
@@ -1,18 +1,96 @@
-import yfinance as yf
-import pandas as pd
-from textblob import TextBlob
-import plotly.graph_objects as go
-from flask import current_app, g
-import newspaper
+from flask import current_app, g, has_app_context
 from datetime import datetime, timedelta
-import google.generativeai as genai
 import random
+import hashlib
+import json
+import time
 import logging
+from app.appconfig import config_value
+from app.datacache import stock_data_cache, company_info_cache, ai_insights_cache, analysis_snapshots, chart_payloads
+from app.history import history_store
+from app.periods import ORDERED_PERIODS, slice_period
+from app.singleflight import upstream_calls
+from app.indicators import compute_technical_analysis
+from app.charts import build_chart_payload, PAYLOAD_VERSION
+from app.news import fetch_article_texts, article_cache
+from app.httppool import http_pool
+from app.metrics import stage, timed_stage, STAGE_SECONDS
+from app.sentiment import score_documents
+from app.fakemodel import FakeStreamingModel
+from app.prewarm import background_refresher
+from app.lazy import lazy_import
+from app.symbols import check_symbol, record_unknown
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Imported on first use, so starting the app (or a page that never needs them) doesn't pay for them
+yf = lazy_import('yfinance')
+yf_shared = lazy_import('yfinance.shared')
+pd = lazy_import('pandas')
+genai = lazy_import('google.generativeai')
+
+# Sentinel so a memoized None (e.g. an unknown ticker) still counts as a hit
+_MISSING = object()
+
+def _request_memo():
+    """Returns the memo dict for the current request, or None outside an app context."""
+    if not has_app_context():
+        return None
+    if '_financebro_memo' not in g:
+        g._financebro_memo = {}
+    return g._financebro_memo
+
+# Period used for technical analysis, long enough to warm up the 200-day SMA
+TA_PERIOD = '1y'
+
+# How long each AnalysisSnapshot section is reused: (config key, default seconds)
+SNAPSHOT_MAX_AGE = {
+    'technical': ('STOCK_DATA_CACHE_TIMEOUT', 60),
+    'sentiment': ('SENTIMENT_CACHE_TIMEOUT', 900),
+    'company_info': ('COMPANY_INFO_CACHE_TIMEOUT', 86400)
+}
+
+AI_DISCLAIMER = "\n\n*(Disclaimer: This AI analysis is for informational purposes only and not financial advice. Always DYOR - Do Your Own Research!)*"
+AI_UNAVAILABLE_MESSAGE = "Sorry, bro! The AI analysis service isn't available right now. Check the API key configuration or try again later."
+
+# yfinance's messages for a symbol it has no data for at all, as opposed to a failed call
+_NO_SUCH_SYMBOL_MESSAGES = ('delisted', 'no data found', 'no price data found', 'no timezone found')
+
+def _upstream_reports_no_symbol(ticker):
+    """Whether yfinance's last download error for `ticker` says the symbol has no data.
+
+    yf.download returns an empty frame for throttling, timeouts and network errors
+    too, recording those in yf.shared._ERRORS as well; only its no-data and
+    delisted messages say anything about the symbol itself.
+    """
+    errors = getattr(yf_shared, '_ERRORS', None) or {}
+    error = str(errors.get(ticker.upper()) or errors.get(ticker) or '').lower()
+    if not error or 'rate limit' in error or 'too many requests' in error:
+        return False
+    return any(message in error for message in _NO_SUCH_SYMBOL_MESSAGES)
+
+def _section_max_age(section):
+    max_age_key, default_max_age = SNAPSHOT_MAX_AGE[section]
+    return config_value(max_age_key, default_max_age)
+
+DEFAULT_AI_QUESTION = "Provide a brief overall analysis and potential outlook."
+
+def ai_error_message(ticker, error):
+    return f"Sorry, bro! The AI service encountered an unexpected issue while analyzing {ticker}. Maybe try rephrasing your question? (Error: {str(error)})"
+
+def normalize_question(question):
+    """Folds case, whitespace and trailing punctuation, so trivially different phrasings share an answer."""
+    question = ' '.join((question or DEFAULT_AI_QUESTION).lower().split())
+    return question.rstrip('?!. ')
+
+def ai_cache_key(ticker, question, snapshot):
+    """(ticker, question, snapshot hash). Any change to the numbers in the prompt gives a new key."""
+    digest = hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode()).hexdigest()[:16]
+    question_digest = hashlib.sha256(normalize_question(question).encode()).hexdigest()[:16]
+    return (ticker, question_digest, digest)
+
 class FinanceAnalyzer:
     def __init__(self):
         # Don't initialize Gemini here
@@ -34,9 +112,13 @@ class FinanceAnalyzer:
         if not self._gemini_initialized:
             self._gemini_initialized = True # Mark as attempted initialization
             api_key = current_app.config.get('GEMINI_API_KEY')
-            if api_key:
+            if current_app.config.get('AI_FAKE_MODEL'):
+                self.gemini = FakeStreamingModel(delay=current_app.config.get('AI_FAKE_MODEL_DELAY', 0.2))
+                logger.warning("Using the fake AI model. Answers are canned.")
+            elif api_key:
                 try:
-                    genai.configure(api_key=api_key)
+                    genai.configure(api_key=api_key,
+                                    transport=current_app.config.get('GEMINI_TRANSPORT') or None)
                     self.gemini = genai.GenerativeModel('gemini-2.0-flash-lite')
                     logger.info("Gemini AI client initialized successfully.")
                 except Exception as e:
@@ -50,15 +132,72 @@ class FinanceAnalyzer:
         return random.choice(self.bro_phrases)
     
     def get_stock_data(self, ticker, period='1mo'):
+        """Returns OHLCV data for a ticker, downloading each (ticker, period) once per request."""
+        if check_symbol(ticker):
+            # Malformed, unlisted or known-empty symbols never reach the network
+            return None
+        memo = _request_memo()
+        key = ('stock_data', ticker, period)
+        if memo is not None:
+            data = memo.get(key, _MISSING)
+            if data is not _MISSING:
+                return data
+        data = stock_data_cache.get_frame(ticker, period)
+        if data is None:
+            # Periods shorter than TA_PERIOD are loaded as TA_PERIOD and sliced, so the chart
+            # and technical analysis stages of one page share a single download
+            load_period = period
+            if period in ORDERED_PERIODS and ORDERED_PERIODS.index(period) < ORDERED_PERIODS.index(TA_PERIOD):
+                load_period = TA_PERIOD
+            data = stock_data_cache.get_frame(ticker, period, allow_stale=True)
+            if data is not None:
+                # Stale-while-revalidate: answer with the expired bars and refresh behind the request
+                background_refresher.submit(('stock_data', ticker, load_period), upstream_calls.do,
+                                            ('stock_data', ticker, load_period), self._refresh_stock_data,
+                                            ticker, load_period)
+            else:
+                # Concurrent misses for the same key share one upstream call
+                data = upstream_calls.do(('stock_data', ticker, load_period), self._refresh_stock_data, ticker, load_period)
+                if load_period != period:
+                    data = slice_period(data, period)
+        if memo is not None:
+            memo[key] = data
+        return data
+
+    def _refresh_stock_data(self, ticker, period, force=False):
+        with stock_data_cache.writer((ticker, period)):
+            # Another worker may have refreshed it while we waited for the writer lock
+            data = None if force else stock_data_cache.get_frame(ticker, period)
+            if data is None:
+                data = self._load_stock_data(ticker, period, force=force)
+                stock_data_cache.set((ticker, period), data)
+        return data
+
+    def _load_stock_data(self, ticker, period, force=False):
+        """Serves daily bars from the local history store when enabled, else downloads them."""
+        if history_store.enabled and history_store.supports(period):
+            return history_store.get(ticker, period, force=force,
+                                     fetch=lambda **kwargs: self._download_stock_data(ticker, **kwargs))
+        return self._download_stock_data(ticker, period=period)
+
+    @timed_stage('yf_download')
+    def _download_stock_data(self, ticker, period=None, start=None):
+        """Downloads daily bars for a whole period, or for every day since `start`."""
         try:
-            logger.info(f"Downloading data for {ticker} (period: {period})...")
+            range_kwargs = {'start': start} if start else {'period': period}
+            logger.info(f"Downloading data for {ticker} ({range_kwargs})...")
             # Explicitly set auto_adjust=True (or False if you prefer unadjusted data)
             # Keep actions=False unless you need dividend/split data separately
             # group_by='ticker' can sometimes cause MultiIndex issues, let's remove it for single ticker downloads
-            data = yf.download(ticker, period=period, auto_adjust=True, actions=False) # Removed group_by
+            data = yf.download(ticker, auto_adjust=True, actions=False, session=http_pool.yfinance_session(),
+                               **range_kwargs) # Removed group_by
 
             if data.empty:
-                logger.warning(f"No data found for ticker: {ticker} with period: {period}")
+                logger.warning(f"No data found for ticker: {ticker} with {range_kwargs}")
+                # No new bars since `start` is normal; no bars at all for a whole period means no such
+                # symbol, but only when yfinance says so rather than having failed to ask
+                if not start and _upstream_reports_no_symbol(ticker):
+                    record_unknown(ticker)
                 return None
 
             # --- Simplify MultiIndex Columns if present ---
@@ -89,107 +228,133 @@ class FinanceAnalyzer:
             return None
     
     def get_technical_analysis(self, ticker):
-        """Calculate technical indicators for a stock."""
+        """Calculate technical indicators for a stock, once per request."""
+        memo = _request_memo()
+        key = ('technical_analysis', ticker)
+        if memo is not None:
+            ta = memo.get(key, _MISSING)
+            if ta is _MISSING:
+                ta = memo[key] = self._snapshot_section(ticker, 'technical', self._calculate_technical_analysis,
+                                                        revalidate=self._refresh_technical_analysis)
+            return ta
+        return self._snapshot_section(ticker, 'technical', self._calculate_technical_analysis,
+                                      revalidate=self._refresh_technical_analysis)
+
+    def _snapshot_section(self, ticker, section, compute, revalidate=None):
+        """Serves a section of the ticker's AnalysisSnapshot while it is fresh, else computes and stores it.
+
+        A section that expired less than STALE_WHILE_REVALIDATE seconds ago is served
+        as is while `revalidate` (default `compute`) replaces it in the background.
+        """
+        if check_symbol(ticker):
+            # Nothing is computed, or stored, for symbols rejected locally
+            return None
+        value, age = analysis_snapshots.get_section(ticker, section)
+        if age is not None:
+            max_age = _section_max_age(section)
+            if age <= max_age:
+                return value
+            if age <= max_age + config_value('STALE_WHILE_REVALIDATE', 0):
+                background_refresher.submit(('snapshot', ticker, section), self._update_section,
+                                            ticker, section, revalidate or compute)
+                return value
+        return self._update_section(ticker, section, compute)
+
+    def _update_section(self, ticker, section, compute):
+        value = compute(ticker)
+        analysis_snapshots.update(ticker, section, value)
+        return value
+
+    def prewarm_ticker(self, ticker):
+        """Refreshes the snapshot sections of a hot ticker that are close to expiring.
+
+        Only tickers that already have technical data are refreshed, so mistyped
+        symbols never reach the upstreams from here. Returns True if anything was refreshed.
+        """
+        snapshot = analysis_snapshots.get_snapshot(ticker)
+        if snapshot is None or snapshot.technical is None:
+            return False
+        refresh_ahead = config_value('PREWARM_REFRESH_AHEAD', 0.8)
+        refreshers = {
+            'technical': lambda t: self._refresh_technical_analysis(t, force=True),
+            'sentiment': self._calculate_sentiment_analysis,
+            'company_info': lambda t: self._refresh_company_info(t, force=True)
+        }
+        refreshed = False
+        for section, compute in refreshers.items():
+            age = snapshot.age(section)
+            if age is None or age >= _section_max_age(section) * refresh_ahead:
+                self._update_section(ticker, section, compute)
+                refreshed = True
+        return refreshed
+
+    def _refresh_technical_analysis(self, ticker, force=False):
+        """Recomputes TA on current bars. Unlike get_stock_data this never settles for stale bars;
+        `force` reloads them even if they haven't expired yet."""
+        upstream_calls.do(('stock_data', ticker, TA_PERIOD), self._refresh_stock_data, ticker, TA_PERIOD, force=force)
+        return self._calculate_technical_analysis(ticker)
+
+    @timed_stage('technical_analysis')
+    def _calculate_technical_analysis(self, ticker):
+        """Returns a populated TechnicalAnalysis, or None if no price data is available."""
         try:
-            data = self.get_stock_data(ticker, period='3mo')
+            # A year of bars so the 200-day SMA and the EMAs have enough history
+            data = self.get_stock_data(ticker, period=TA_PERIOD)
 
             logger.info(f"--- Technical Analysis Start for {ticker} ---")
             if data is None or data.empty:
                 logger.warning(f"No valid data obtained for {ticker}. Cannot calculate TA.")
                 return None
-                
+
             if not isinstance(data, pd.DataFrame):
                 logger.error(f"get_stock_data returned non-DataFrame for {ticker}. Type: {type(data)}")
                 return None
 
-            # Create a default result in case calculations fail
-            default_result = {
-                'current_price': None,
-                'sma_20': None,
-                'sma_50': None,
-                'rsi': None,
-                'trend': 'N/A'
-            }
-
-            # Get the latest close price
             if 'Close' not in data.columns:
                 logger.error(f"'Close' column not found in data for {ticker}. Columns: {data.columns}")
-                return default_result
-                
-            # Get the latest price
-            try:
-                latest_close = data['Close'].iloc[-1]
-                default_result['current_price'] = round(latest_close, 2)
-            except (IndexError, KeyError) as e:
-                logger.error(f"Error getting latest close price: {e}")
-                # Continue with default_result
+                return None
+
+            # The history store keeps running indicator state next to the bars; if it is
+            # up to date with the latest bar, read TA from it instead of rescanning
+            if history_store.enabled:
+                state = history_store.load_state(ticker)
+                if state is not None and state.pending_date == data.index[-1].strftime('%Y-%m-%d'):
+                    return state.snapshot(ticker)
+
+            close = pd.to_numeric(data['Close'], errors='coerce').to_numpy(dtype='float64')
+            with stage('indicators'):
+                ta = compute_technical_analysis(ticker, close)
+            if ta is None:
+                logger.warning(f"Close series is empty after dropping non-numeric values for {ticker}.")
+            return ta
 
-            # Calculate indicators
-            try:
-                # Ensure Close is numeric
-                close_series = pd.to_numeric(data['Close'], errors='coerce')
-                close_series.dropna(inplace=True)
-
-                if close_series.empty:
-                    logger.warning(f"Close series became empty after to_numeric/dropna for {ticker}.")
-                    return default_result
-
-                # Calculate SMAs
-                data['SMA_20'] = close_series.rolling(window=20).mean()
-                data['SMA_50'] = close_series.rolling(window=50).mean()
-
-                # Calculate RSI
-                delta = close_series.diff()
-                gain = delta.where(delta > 0, 0)
-                loss = -delta.where(delta < 0, 0)
-                avg_gain = gain.rolling(window=14).mean()
-                avg_loss = loss.rolling(window=14).mean()
-                rs = avg_gain / avg_loss.replace(0, 0.001)  # Avoid division by zero
-                rsi = 100 - (100 / (1 + rs))
-
-                # Get latest values
-                latest = data.iloc[-1]
-                sma_20 = round(latest['SMA_20'], 2) if pd.notna(latest['SMA_20']) else None
-                sma_50 = round(latest['SMA_50'], 2) if pd.notna(latest['SMA_50']) else None
-                latest_rsi = round(rsi.iloc[-1], 2) if not rsi.empty else None
-
-                # Determine trend
-                trend = 'Neutral'
-                current_price = default_result['current_price']
-                if current_price and sma_20 and sma_50:
-                    if current_price > sma_20 > sma_50:
-                        trend = 'Bullish'
-                    elif current_price < sma_20 < sma_50:
-                        trend = 'Bearish'
-
-                return {
-                    'current_price': current_price,
-                    'sma_20': sma_20,
-                    'sma_50': sma_50,
-                    'rsi': latest_rsi,
-                    'trend': trend
-                }
-            except Exception as e:
-                logger.error(f"Error calculating technical indicators: {e}", exc_info=True)
-                return default_result
-                
         except Exception as e:
             logger.error(f"Technical analysis failed: {e}", exc_info=True)
-            return {
-                'current_price': None,
-                'sma_20': None, 
-                'sma_50': None, 
-                'rsi': None, 
-                'trend': 'Error'
-            }
-    
+            return None
+
     def get_sentiment_analysis(self, ticker):
+        """News sentiment for a ticker, shared through its AnalysisSnapshot."""
+        memo = _request_memo()
+        key = ('sentiment_analysis', ticker)
+        if memo is not None:
+            sentiment = memo.get(key, _MISSING)
+            if sentiment is _MISSING:
+                sentiment = memo[key] = self._snapshot_section(ticker, 'sentiment', self._calculate_sentiment_analysis)
+            return sentiment
+        return self._snapshot_section(ticker, 'sentiment', self._calculate_sentiment_analysis)
+
+    @timed_stage('news_fetch')
+    def _fetch_news(self, ticker):
+        return yf.Ticker(ticker, session=http_pool.yfinance_session()).news
+
+    @timed_stage('sentiment_analysis')
+    def _calculate_sentiment_analysis(self, ticker):
         try:
-            stock = yf.Ticker(ticker)
             news = None # Initialize news to None
             try:
-                # Attempt to fetch news, catching potential request/decode errors
-                news = stock.news
+                # Attempt to fetch news, catching potential request/decode errors.
+                # Concurrent requests for the same ticker share one fetch.
+                news = upstream_calls.do(('news', ticker), self._fetch_news, ticker)
             except Exception as news_err:
                  logger.error(f"Error fetching news for {ticker} from yfinance: {news_err}")
                  # Proceed without news if fetching fails
@@ -202,43 +367,65 @@ class FinanceAnalyzer:
 
             sentiments = []
             summaries = []
+            items = []
             processed_links = set() # Avoid processing duplicate links if any
-            
+
             for item in news[:5]:  # Analyze top 5 news items
                 link = item.get('link')
-                title = item.get('title', 'No Title')
-                
                 if not link or link in processed_links:
                     continue
                 processed_links.add(link)
-                
-                try:
-                    # Use newspaper3k to extract better content
-                    article = newspaper.Article(link)
-                    article.download()
-                    article.parse()
-                    # Use article text if available and long enough, otherwise fallback to title
-                    text_to_analyze = article.text if article.text and len(article.text) > 50 else title
-                    
-                    if not text_to_analyze: # Skip if no text could be extracted
-                         continue
-                    
-                    analysis = TextBlob(text_to_analyze)
-                    sentiments.append(analysis.sentiment.polarity)
-                    # Create a summary snippet
-                    summary_text = text_to_analyze[:250] + ('...' if len(text_to_analyze) > 250 else '')
-                    summaries.append(f"📰 <strong>{title}</strong><br><small>{summary_text}</small>")
-                    
-                except newspaper.article.ArticleException as article_err:
-                     logger.warning(f"Could not process article {link} for {ticker}: {article_err}. Falling back to title.")
-                     # Fallback to title only if article parsing fails
-                     analysis = TextBlob(title)
-                     sentiments.append(analysis.sentiment.polarity)
-                     summaries.append(f"📰 <strong>{title}</strong>")
-                except Exception as e:
-                    logger.error(f"Unexpected error processing news item {link} for {ticker}: {e}")
-                    continue # Skip this item
-            
+                items.append((link, item.get('title', 'No Title')))
+
+            # Articles seen before (for any ticker) come straight from the article cache
+            cached = article_cache.get_many([link for link, _ in items])
+
+            # Download the rest at once; anything slow or broken is scored on its title
+            config = current_app.config
+            with stage('article_scrape'):
+                texts = fetch_article_texts([link for link, _ in items if link not in cached],
+                                            budget=config.get('NEWS_FETCH_BUDGET', 6.0),
+                                            timeout=config.get('NEWS_ARTICLE_TIMEOUT', 4.0),
+                                            workers=config.get('NEWS_FETCH_WORKERS', 8))
+
+            # First decide what to score for each article, then score them all in one batch
+            results = []  # (link, title, cache entry or None, text to score, summary snippet or None)
+            for link, title in items:
+                entry = cached.get(link)
+                if entry is not None:
+                    results.append((link, title, entry, None, None))
+                    continue
+                text = texts.get(link)
+                if text is None:
+                    results.append((link, title, None, title, None))
+                    continue
+
+                # Use article text if available and long enough, otherwise fallback to title
+                text_to_analyze = text if len(text) > 50 else title
+                if not text_to_analyze: # Skip if no text could be extracted
+                    continue
+
+                # Create a summary snippet
+                summary_text = text_to_analyze[:250] + ('...' if len(text_to_analyze) > 250 else '')
+                results.append((link, title, None, text_to_analyze, summary_text))
+
+            with stage('sentiment_score'):
+                polarities = iter(score_documents([doc for _, _, entry, doc, _ in results if entry is None]))
+            scored = {}
+            for link, title, entry, doc, summary_text in results:
+                if entry is None:
+                    polarity = next(polarities)
+                    if summary_text is None:
+                        sentiments.append(polarity)
+                        summaries.append(f"📰 <strong>{title}</strong>")
+                        continue
+                    entry = scored[link] = {'text': texts[link], 'summary': summary_text, 'polarity': polarity}
+
+                sentiments.append(entry['polarity'])
+                summaries.append(f"📰 <strong>{title}</strong><br><small>{entry['summary']}</small>")
+
+            article_cache.put_many(scored)
+
             if not sentiments:
                  logger.info(f"No processable news items found for sentiment analysis for {ticker}")
                  return None
@@ -253,48 +440,31 @@ class FinanceAnalyzer:
             logger.error(f"General sentiment analysis error for {ticker}: {str(e)}")
             return None
     
-    def generate_price_chart(self, ticker):
-        data = self.get_stock_data(ticker, period='3mo')
-        if data is None:
+    def get_chart_payload(self, ticker, period='3mo'):
+        """Compact price chart payload (see app/charts.py), or None without price data.
+
+        Built from the same bars as the technical analysis (or longer ones), capped at
+        CHART_MAX_POINTS per trace, and cached per (ticker, period, last bar), so it
+        is only re-encoded when a new bar arrives.
+        """
+        load_period = period
+        if ORDERED_PERIODS.index(period) < ORDERED_PERIODS.index(TA_PERIOD):
+            load_period = TA_PERIOD
+        history = self.get_stock_data(ticker, period=load_period)
+        if history is None or history.empty:
             return None
-        
-        fig = go.Figure()
-        
-        # Price line
-        fig.add_trace(go.Scatter(
-            x=data.index,
-            y=data['Close'],
-            name='Price',
-            line=dict(color='#1f77b4')
-        ))
-        
-        # SMAs
-        fig.add_trace(go.Scatter(
-            x=data.index,
-            y=data['Close'].rolling(window=20).mean(),
-            name='20-day SMA',
-            line=dict(color='orange', dash='dot')
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=data.index,
-            y=data['Close'].rolling(window=50).mean(),
-            name='50-day SMA',
-            line=dict(color='red', dash='dot')
-        ))
-        
-        fig.update_layout(
-            title=f'{ticker} Price Analysis (3 Months)',
-            xaxis_title='Date',
-            yaxis_title='Price ($)',
-            template='plotly_white',
-            hovermode='x unified',
-            legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01),
-            margin=dict(l=40, r=20, t=50, b=40)
-        )
-        
-        return fig.to_html(full_html=False, include_plotlyjs=False)
+        max_points = config_value('CHART_MAX_POINTS', 500)
+        # The last close is part of the key too, since today's bar changes until the close
+        key = (ticker, period, max_points, PAYLOAD_VERSION,
+               history.index[-1].strftime('%Y-%m-%d'), float(history['Close'].iloc[-1]))
+        payload = chart_payloads.get(key)
+        if payload is None:
+            with stage('chart_payload'):
+                payload = build_chart_payload(ticker, history, period, max_points)
+            chart_payloads.set(key, payload)
+        return payload
     
+    @timed_stage('trade_ideas')
     def generate_trade_ideas(self, ticker):
         """Generate trade ideas based on technical analysis."""
         try:
@@ -302,16 +472,16 @@ class FinanceAnalyzer:
             ta = self.get_technical_analysis(ticker)
             
             # Return empty if no technical analysis
-            if not ta or ta.get('current_price') is None:
+            if not ta or ta.current_price is None:
                 logger.warning(f"Cannot generate trade ideas without technical analysis for {ticker}")
                 return []
                 
             ideas = []
             
             # Generate basic ideas based on trend
-            current_price = ta.get('current_price')
-            trend = ta.get('trend', 'Neutral')
-            rsi = ta.get('rsi')
+            current_price = ta.current_price
+            trend = ta.trend
+            rsi = ta.rsi
             
             # Add trend-based ideas
             if trend == 'Bullish':
@@ -398,47 +568,135 @@ class FinanceAnalyzer:
         if not self.gemini:
             logger.error(f"Gemini client not available for {ticker} request.")
             # Return a user-friendly error message
-            return "Sorry, bro! The AI analysis service isn't available right now. Check the API key configuration or try again later."
+            return AI_UNAVAILABLE_MESSAGE
 
         try:
-            # Fetch necessary data - reuse existing methods
-            ta = self.get_technical_analysis(ticker)
-            sentiment_data = self.get_sentiment_analysis(ticker)
-            company_info = self.get_company_info(ticker) # Fetch company info too
-
-            # --- Prepare context strings, handling None cases ---
-            price_str = f"${ta['current_price']:.2f}" if ta and ta.get('current_price') is not None else "N/A"
-            trend_str = ta.get('trend', 'N/A') if ta else "N/A"
-            rsi_str = f"{ta['rsi']:.2f}" if ta and ta.get('rsi') is not None else "N/A"
-
-            sentiment_score_str = "N/A"
-            sentiment_summary_str = "No recent news summaries available."
-            if sentiment_data and sentiment_data.get('score') is not None:
-                sentiment_score_str = f"{sentiment_data['score']:.3f}"
-                # Extract titles cleanly
-                titles = [s.split('<strong>')[1].split('</strong>')[0] for s in sentiment_data.get('summaries', []) if '<strong>' in s]
-                if titles:
-                    sentiment_summary_str = "; ".join(titles[:3]) # Top 3 titles
-
-            company_sector_str = company_info.get('Sector', 'N/A') if company_info else "N/A"
-            company_industry_str = company_info.get('Industry', 'N/A') if company_info else "N/A"
-
-            # --- Build the prompt ---
-            prompt = f"""
+            snapshot = self._ai_snapshot(ticker)
+            key = ai_cache_key(ticker, question, snapshot)
+            cached = ai_insights_cache.get(key)
+            if cached is not None:
+                logger.info(f"Serving cached AI insight for {ticker}.")
+                return cached
+            # Identical questions asked at the same time share one generation
+            return upstream_calls.do(('ai_insights',) + key, self._generate_ai_insights,
+                                     ticker, question, snapshot, key)
+
+        except Exception as e:
+            logger.error(f"AI insight generation error for {ticker}: {str(e)}", exc_info=True)
+            # Provide a more specific user-friendly error message
+            return ai_error_message(ticker, e)
+
+    @timed_stage('ai_generate')
+    def _generate_ai_insights(self, ticker, question, snapshot, key):
+        prompt = self._build_ai_prompt(ticker, snapshot, question)
+
+        logger.info(f"Generating AI insight for {ticker} with prompt.")
+        # Consider adding a timeout to the API call if needed, though the default might be sufficient
+        response = self.gemini.generate_content(prompt)
+
+        # Add the disclaimer automatically
+        # Ensure response.text exists and handle potential generation errors/empty responses
+        text = getattr(response, 'text', None)
+        if not text:
+            return "Sorry, the AI couldn't generate a response for this request." + AI_DISCLAIMER
+        ai_response_text = text + AI_DISCLAIMER
+        ai_insights_cache.set(key, ai_response_text)
+        return ai_response_text
+
+    def stream_ai_insights(self, ticker, question=None):
+        """Like get_ai_insights, but yields the answer in chunks as Gemini generates it.
+
+        The disclaimer is always the last chunk. Errors are yielded as text, so a
+        stream that has already started still ends with a readable message. A cached
+        answer is yielded whole.
+        """
+        self._initialize_gemini()
+
+        if not self.gemini:
+            logger.error(f"Gemini client not available for {ticker} request.")
+            yield AI_UNAVAILABLE_MESSAGE
+            return
+
+        parts = []
+        try:
+            snapshot = self._ai_snapshot(ticker)
+            key = ai_cache_key(ticker, question, snapshot)
+            cached = ai_insights_cache.get(key)
+            if cached is not None:
+                logger.info(f"Serving cached AI insight for {ticker}.")
+                yield cached
+                return
+
+            prompt = self._build_ai_prompt(ticker, snapshot, question)
+            logger.info(f"Streaming AI insight for {ticker} with prompt.")
+            started = time.perf_counter()
+            with stage('ai_stream'):
+                for chunk in self.gemini.generate_content(prompt, stream=True):
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # A chunk without text, e.g. one that only carries a safety block
+                        continue
+                    if text:
+                        if not parts:
+                            STAGE_SECONDS.labels('ai_first_chunk').observe(time.perf_counter() - started)
+                        parts.append(text)
+                        yield text
+        except Exception as e:
+            logger.error(f"AI insight streaming error for {ticker}: {str(e)}", exc_info=True)
+            yield ("\n\n" if parts else "") + ai_error_message(ticker, e)
+            return
+        if not parts:
+            yield "Sorry, the AI couldn't generate a response for this request." + AI_DISCLAIMER
+            return
+        # Only complete answers are cached
+        ai_insights_cache.set(key, ''.join(parts) + AI_DISCLAIMER)
+        yield AI_DISCLAIMER
+
+    def _ai_snapshot(self, ticker):
+        """The data points that go into the AI prompt, already formatted as strings."""
+        # Fetch necessary data - reuse existing methods
+        ta = self.get_technical_analysis(ticker)
+        sentiment_data = self.get_sentiment_analysis(ticker)
+        company_info = self.get_company_info(ticker) # Fetch company info too
+
+        # --- Prepare context strings, handling None cases ---
+        sentiment_score_str = "N/A"
+        sentiment_summary_str = "No recent news summaries available."
+        if sentiment_data and sentiment_data.get('score') is not None:
+            sentiment_score_str = f"{sentiment_data['score']:.3f}"
+            # Extract titles cleanly
+            titles = [s.split('<strong>')[1].split('</strong>')[0] for s in sentiment_data.get('summaries', []) if '<strong>' in s]
+            if titles:
+                sentiment_summary_str = "; ".join(titles[:3]) # Top 3 titles
+
+        return {
+            'sector': company_info.get('Sector', 'N/A') if company_info else "N/A",
+            'industry': company_info.get('Industry', 'N/A') if company_info else "N/A",
+            'price': f"${ta.current_price:.2f}" if ta and ta.current_price is not None else "N/A",
+            'trend': ta.trend if ta else "N/A",
+            'rsi': f"{ta.rsi:.2f}" if ta and ta.rsi is not None else "N/A",
+            'sentiment_score': sentiment_score_str,
+            'headlines': sentiment_summary_str
+        }
+
+    def _build_ai_prompt(self, ticker, snapshot, question=None):
+        """Builds the Gemini prompt from the ticker's data snapshot."""
+        return f"""
             You are FinanceBro, an AI assistant providing stock market analysis. Your tone is confident, knowledgeable, and uses occasional, appropriate "finance bro" slang (like 'listen up', 'the play here', 'keep an eye on', 'solid move', 'DYOR') but remains professional overall. Avoid excessive emojis.
 
             Analyze the stock: {ticker}
 
             Here's the current data snapshot:
-            - Company Sector: {company_sector_str}
-            - Company Industry: {company_industry_str}
-            - Current Price: {price_str}
-            - Recent Trend (SMA-based): {trend_str}
-            - RSI (14-day): {rsi_str}
-            - Recent News Sentiment Score: {sentiment_score_str}
-            - Recent News Headlines: {sentiment_summary_str}
+            - Company Sector: {snapshot['sector']}
+            - Company Industry: {snapshot['industry']}
+            - Current Price: {snapshot['price']}
+            - Recent Trend (SMA-based): {snapshot['trend']}
+            - RSI (14-day): {snapshot['rsi']}
+            - Recent News Sentiment Score: {snapshot['sentiment_score']}
+            - Recent News Headlines: {snapshot['headlines']}
 
-            User Question: "{question if question else "Provide a brief overall analysis and potential outlook."}"
+            User Question: "{question if question else DEFAULT_AI_QUESTION}"
 
             Instructions:
             1.  Provide a concise analysis (1-3 paragraphs) directly addressing the user's question (or the default analysis if no question was provided).
@@ -449,27 +707,29 @@ class FinanceAnalyzer:
 
             Analysis:
             """
-
-            logger.info(f"Generating AI insight for {ticker} with prompt.")
-            # Consider adding a timeout to the API call if needed, though the default might be sufficient
-            response = self.gemini.generate_content(prompt)
-
-            # Add the disclaimer automatically
-            # Ensure response.text exists and handle potential generation errors/empty responses
-            ai_response_text = getattr(response, 'text', "Sorry, the AI couldn't generate a response for this request.")
-            ai_response_text += "\n\n*(Disclaimer: This AI analysis is for informational purposes only and not financial advice. Always DYOR - Do Your Own Research!)*"
-
-            return ai_response_text
-
-        except Exception as e:
-            logger.error(f"AI insight generation error for {ticker}: {str(e)}", exc_info=True)
-            # Provide a more specific user-friendly error message
-            return f"Sorry, bro! The AI service encountered an unexpected issue while analyzing {ticker}. Maybe try rephrasing your question? (Error: {str(e)})"
     
     def get_company_info(self, ticker):
-        """Fetches basic company information from Yahoo Finance."""
+        """Fetches basic company information from Yahoo Finance, via the ticker's AnalysisSnapshot."""
+        return self._snapshot_section(ticker, 'company_info', self._load_company_info)
+
+    def _load_company_info(self, ticker):
+        info = company_info_cache.get(ticker)
+        if info is None:
+            info = upstream_calls.do(('company_info', ticker), self._refresh_company_info, ticker)
+        return info
+
+    def _refresh_company_info(self, ticker, force=False):
+        with company_info_cache.writer(ticker):
+            info = None if force else company_info_cache.get(ticker)
+            if info is None:
+                info = self._fetch_company_info(ticker)
+                company_info_cache.set(ticker, info)
+        return info
+
+    @timed_stage('company_info')
+    def _fetch_company_info(self, ticker):
         try:
-            stock = yf.Ticker(ticker)
+            stock = yf.Ticker(ticker, session=http_pool.yfinance_session())
             info = stock.info
             # Select a subset of useful info to display
             relevant_info = {
@@ -0,0 +1,182 @@
+"""Offline microbenchmarks for the FinanceAnalyzer hot paths.
+
+yfinance downloads, news and article pages are replayed from benchmarks/fixtures/replay
+(see record_fixtures.py), so the suite needs no network. Results are written as JSON,
+keyed by commit, so two commits can be compared:
+
+    python -m benchmarks.bench_analyzer                          # writes benchmarks/results/<commit>.json
+    python -m benchmarks.bench_analyzer --compare benchmarks/results/<older commit>.json
+
+With --compare, the script exits with status 1 when any median is more than
+--threshold (default 25%) slower than the baseline.
+"""
+from benchmarks.common import time_samples
+from benchmarks.record_fixtures import TICKER, load_frame, news_path, articles_index_path
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+class Replay:
+    """Answers yf.download, yf.Ticker(...).news and article downloads from the recorded fixtures."""
+
+    def __init__(self, ticker):
+        self.frame = load_frame(ticker)
+        with open(news_path(ticker), encoding='utf-8') as f:
+            self.news = json.load(f)
+        directory = os.path.dirname(articles_index_path())
+        with open(articles_index_path(), encoding='utf-8') as f:
+            index = json.load(f)
+        self.pages = {}
+        for url, name in index.items():
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                self.pages[url] = f.read()
+
+    def download(self, ticker, period=None, start=None, **kwargs):
+        from app.periods import slice_period
+        if start is not None:
+            return self.frame.loc[self.frame.index >= start].copy()
+        return slice_period(self.frame, period).copy()
+
+    def ticker(self, symbol, **kwargs):
+        return SimpleNamespace(news=self.news, info={})
+
+    def html(self, url, config=None, session=None):
+        return self.pages[url]
+
+    def install(self):
+        import app.news
+        import yfinance
+        yfinance.download = self.download
+        yfinance.Ticker = self.ticker
+        app.news.fetch_article_html = self.html
+
+def build_cases(app, analyzer):
+    """{name: (zero-argument callable, calls per sample)}. Every call runs in a fresh app context."""
+    from app.charts import build_chart_payload
+    from app.fakemodel import CANNED_CHUNKS
+    from app.utils import AI_DISCLAIMER
+    from markdown import markdown
+
+    def in_app(fn):
+        def run():
+            with app.app_context():
+                return fn()
+        return run
+
+    with app.app_context():
+        # Warm the caches the way a first page view would, so each case times only its own step
+        history_1y = analyzer.get_stock_data(TICKER, period='1y')
+        history_5y = analyzer.get_stock_data(TICKER, period='5y')
+        analyzer.get_technical_analysis(TICKER)
+        analyzer.get_chart_payload(TICKER)
+    max_points = app.config['CHART_MAX_POINTS']
+    answer = ''.join(CANNED_CHUNKS) + AI_DISCLAIMER
+
+    return {
+        # yf.download result -> flat columns and DatetimeIndex
+        'get_stock_data.postprocess_1y': (in_app(lambda: analyzer._download_stock_data(TICKER, period='1y')), 20),
+        'get_stock_data.postprocess_5y': (in_app(lambda: analyzer._download_stock_data(TICKER, period='5y')), 20),
+        # Indicators on cached bars (the snapshot is bypassed)
+        'get_technical_analysis': (in_app(lambda: analyzer._calculate_technical_analysis(TICKER)), 20),
+        # News, article download and parsing (replayed) and scoring
+        'get_sentiment_analysis': (in_app(lambda: analyzer._calculate_sentiment_analysis(TICKER)), 3),
+        # generate_price_chart became the compact chart payload
+        'chart_payload.build_3mo': (lambda: build_chart_payload(TICKER, history_1y, '3mo', max_points), 20),
+        'chart_payload.build_5y': (lambda: build_chart_payload(TICKER, history_5y, '5y', max_points), 10),
+        'chart_payload.cached': (in_app(lambda: analyzer.get_chart_payload(TICKER)), 50),
+        'generate_trade_ideas': (in_app(lambda: analyzer.generate_trade_ideas(TICKER)), 50),
+        'markdown.ai_answer': (lambda: markdown(answer, extensions=['fenced_code', 'tables']), 50),
+    }
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(repeat):
+    import numpy
+    import pandas
+    from app import create_app
+    from app.routes import analyzer
+    from config import TestingConfig
+
+    Replay(TICKER).install()
+    app = create_app(TestingConfig)
+    results = {}
+    for name, (fn, number) in build_cases(app, analyzer).items():
+        samples = time_samples(fn, repeat=repeat, number=number)
+        results[name] = {'median_ms': round(statistics.median(samples), 4), 'best_ms': round(min(samples), 4),
+                         'samples_ms': [round(s, 4) for s in samples], 'number': number}
+        print(f"{name:<34}{results[name]['median_ms']:>10.3f} ms median{results[name]['best_ms']:>10.3f} ms best")
+    return {
+        'meta': {
+            'commit': _git('rev-parse', 'HEAD'),
+            'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy.__version__,
+            'pandas': pandas.__version__,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+def compare(report, baseline, threshold):
+    """Prints median changes against `baseline` and returns the names that regressed."""
+    print(f"\nvs. {baseline['meta'].get('commit', '?')[:12]}:\n")
+    print(f"{'benchmark':<34}{'baseline':>12}{'current':>12}{'change':>10}")
+    regressed = []
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:<34}{'-':>12}{result['median_ms']:>12.3f}{'new':>10}")
+            continue
+        change = result['median_ms'] / before['median_ms'] - 1
+        flag = ''
+        if change > threshold:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<34}{before['median_ms']:>12.3f}{result['median_ms']:>12.3f}{change:>+10.0%}{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline FinanceAnalyzer microbenchmarks.')
+    parser.add_argument('--output', help='where to write the JSON report (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON report of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='slowdown that counts as a regression')
+    parser.add_argument('--repeat', type=int, default=7, help='samples per benchmark')
+    args = parser.parse_args()
+
+    # Timings should measure the work, not the log handlers
+    logging.disable(logging.WARNING)
+    report = run_suite(args.repeat)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{(report['meta']['commit'] or 'unknown')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressed = compare(report, baseline, args.threshold)
+        if regressed:
+            print(f"\nFAIL: {len(regressed)} benchmark(s) more than {args.threshold:.0%} slower: {', '.join(regressed)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Compares the compact chart payload against the Plotly figure HTML/JSON it replaced.
+
+Usage: python -m benchmarks.bench_chart
+"""
+from benchmarks.common import time_call, synthetic_ohlcv
+from app.charts import build_chart_payload, lttb_indices
+from app.periods import slice_period
+import json
+import plotly
+import plotly.graph_objects as go
+
+MAX_POINTS = 500
+# Long-range views: daily bars in each period
+LONG_PERIODS = {'1y': 252, '5y': 1260, 'max': 10000}
+
+def plotly_figure(ticker, data):
+    """The server-side figure this payload replaced (3 months, SMAs over the shown bars only)."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], name='Price', line=dict(color='#1f77b4')))
+    fig.add_trace(go.Scatter(x=data.index, y=data['Close'].rolling(window=20).mean(), name='20-day SMA',
+                             line=dict(color='orange', dash='dot')))
+    fig.add_trace(go.Scatter(x=data.index, y=data['Close'].rolling(window=50).mean(), name='50-day SMA',
+                             line=dict(color='red', dash='dot')))
+    fig.update_layout(title=f'{ticker} Price Analysis (3 Months)', xaxis_title='Date', yaxis_title='Price ($)',
+                      template='plotly_white', hovermode='x unified',
+                      legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01),
+                      margin=dict(l=40, r=20, t=50, b=40))
+    return fig
+
+def main():
+    history = synthetic_ohlcv(252)
+    shown = slice_period(history, '3mo')
+
+    html = plotly_figure('BENCH', shown).to_html(full_html=False, include_plotlyjs=False)
+    figure_json = plotly_figure('BENCH', shown).to_json()
+    payload = json.dumps(build_chart_payload('BENCH', history, '3mo', MAX_POINTS))
+
+    # Plotly 6+ already writes numpy arrays as base64 in figure JSON; 5.x spells out every float64
+    print(f"plotly {plotly.__version__}, 3 months of daily bars\n")
+    print(f"{'format':<24}{'bytes':>10}{'ms/render':>12}")
+    print(f"{'fig.to_html':<24}{len(html):>10}"
+          f"{time_call(lambda: plotly_figure('BENCH', shown).to_html(full_html=False, include_plotlyjs=False), number=5):>12.2f}")
+    print(f"{'fig.to_json':<24}{len(figure_json):>10}"
+          f"{time_call(lambda: plotly_figure('BENCH', shown).to_json(), number=5):>12.2f}")
+    print(f"{'compact payload':<24}{len(payload):>10}"
+          f"{time_call(lambda: json.dumps(build_chart_payload('BENCH', history, '3mo', MAX_POINTS))):>12.2f}")
+    print(f"\n{len(html) / len(payload):.1f}x smaller than the HTML, {len(figure_json) / len(payload):.1f}x smaller than the figure JSON")
+
+    print(f"\n{'period':<8}{'bars':>8}{'full bytes':>12}{'lttb bytes':>12}{'lttb ms':>10}{'range kept':>12}")
+    for period, bars in LONG_PERIODS.items():
+        history = synthetic_ohlcv(bars)
+        full = json.dumps(build_chart_payload('BENCH', history, period, bars))
+        reduced = json.dumps(build_chart_payload('BENCH', history, period, MAX_POINTS))
+        close = history['Close'].to_numpy()
+        kept = close[lttb_indices(range(bars), close, MAX_POINTS)]
+        range_kept = kept.min() == close.min() and kept.max() == close.max()
+        lttb_ms = time_call(lambda: lttb_indices(range(bars), close, MAX_POINTS))
+        print(f"{period:<8}{bars:>8}{len(full):>12}{len(reduced):>12}{lttb_ms:>10.2f}{str(range_kept):>12}")
+
+if __name__ == '__main__':
+    main()
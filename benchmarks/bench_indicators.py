@@ -0,0 +1,63 @@
+"""Compares the NumPy indicator engine against the previous pandas rolling-window path.
+
+Usage: python -m benchmarks.bench_indicators
+"""
+from benchmarks.common import time_call, synthetic_ohlcv
+from app.indicators import compute_technical_analysis
+import pandas as pd
+
+SERIES = {'1y': 252, '5y': 1260}
+
+def pandas_technical_analysis(data):
+    """The pandas implementation this engine replaced (SMA20/50 and simple-mean RSI only)."""
+    data = data.copy()
+    close_series = pd.to_numeric(data['Close'], errors='coerce').dropna()
+    data['SMA_20'] = close_series.rolling(window=20).mean()
+    data['SMA_50'] = close_series.rolling(window=50).mean()
+    delta = close_series.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    rs = gain.rolling(window=14).mean() / loss.rolling(window=14).mean().replace(0, 0.001)
+    rsi = 100 - (100 / (1 + rs))
+    latest = data.iloc[-1]
+    return latest['SMA_20'], latest['SMA_50'], rsi.iloc[-1]
+
+def pandas_full_indicators(data):
+    """Every TechnicalAnalysis field computed the idiomatic pandas way, as a like-for-like baseline."""
+    close = pd.to_numeric(data['Close'], errors='coerce').dropna()
+    frame = pd.DataFrame({'close': close})
+    for n in (20, 50, 200):
+        frame[f'sma_{n}'] = close.rolling(n).mean()
+    frame['ema_12'] = close.ewm(span=12, adjust=False).mean()
+    frame['ema_26'] = close.ewm(span=26, adjust=False).mean()
+    frame['macd'] = frame['ema_12'] - frame['ema_26']
+    frame['macd_signal'] = frame['macd'].ewm(span=9, adjust=False).mean()
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    avg_loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    frame['rsi'] = 100 - 100 / (1 + avg_gain / avg_loss)
+    std = close.rolling(20).std(ddof=0)
+    frame['bb_upper'] = frame['sma_20'] + 2 * std
+    frame['bb_lower'] = frame['sma_20'] - 2 * std
+    return frame.iloc[-1]
+
+def check_against_pandas(data):
+    """The engine must agree with the pandas baseline before its timings mean anything."""
+    ta = compute_technical_analysis('BENCH', data['Close'].to_numpy())
+    expected = pandas_full_indicators(data)
+    for field in ('ema_12', 'ema_26', 'macd', 'macd_signal', 'sma_20', 'sma_50', 'sma_200', 'rsi'):
+        assert abs(getattr(ta, field) - expected[field]) < 1e-2, field
+
+def main():
+    print(f"{'series':<8}{'pandas (old)':>16}{'pandas (full)':>16}{'numpy engine':>16}{'speedup':>10}")
+    for name, bars in SERIES.items():
+        data = synthetic_ohlcv(bars)
+        check_against_pandas(data)
+        close = data['Close'].to_numpy()
+        old_ms = time_call(lambda: pandas_technical_analysis(data))
+        full_ms = time_call(lambda: pandas_full_indicators(data))
+        engine_ms = time_call(lambda: compute_technical_analysis('BENCH', close))
+        print(f"{name:<8}{old_ms:>14.3f}ms{full_ms:>14.3f}ms{engine_ms:>14.3f}ms{old_ms / engine_ms:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
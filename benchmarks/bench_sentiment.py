@@ -0,0 +1,45 @@
+"""Compares batched lexicon sentiment scoring against one TextBlob per document.
+
+Usage: python -m benchmarks.bench_sentiment
+"""
+from benchmarks.common import time_call
+from app.sentiment import score_documents
+from textblob import TextBlob
+import json
+import os
+import numpy as np
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'news_corpus.json')
+
+# Batch sizes to time: one dashboard view (5 articles) up to a prewarm sweep
+BATCH_SIZES = (5, 40, 400)
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+def textblob_scores(documents):
+    """The per-article path this engine replaced."""
+    return [TextBlob(doc).sentiment.polarity for doc in documents]
+
+def main():
+    corpus = load_corpus()
+    # Scores must stay in TextBlob's range and close to its values before timings mean anything
+    expected = np.array(textblob_scores(corpus))
+    actual = np.array(score_documents(corpus))
+    assert np.all(np.abs(actual) <= 1.0)
+    diff = np.abs(actual - expected)
+    print(f"{len(corpus)} documents: mean |diff| {diff.mean():.4f}, max |diff| {diff.max():.4f}, "
+          f"{np.mean(diff < 1e-6):.0%} identical\n")
+
+    print(f"{'batch':<8}{'textblob':>16}{'lexicon':>16}{'speedup':>10}")
+    for size in BATCH_SIZES:
+        documents = (corpus * (size // len(corpus) + 1))[:size]
+        number = max(1, 200 // size)
+        textblob_ms = time_call(lambda: textblob_scores(documents), number=number)
+        lexicon_ms = time_call(lambda: score_documents(documents), number=number)
+        print(f"{size:<8}{size / textblob_ms * 1000:>11.0f} doc/s{size / lexicon_ms * 1000:>11.0f} doc/s"
+              f"{textblob_ms / lexicon_ms:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measures create_app() cold start in fresh interpreters and fails over budget.
+
+Each run imports the app and builds it in a new `python -X importtime` process.
+The script reports the median time, and the packages that cost the most import
+time in the slowest run. It exits with status 1 in two cases: the median is over
+the budget, or one of the deferred heavy dependencies was imported at startup.
+
+Usage: python -m benchmarks.bench_startup [--budget-ms 1000] [--runs 5]
+"""
+from collections import Counter
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded lazily through app.lazy; importing any of them at startup is a regression
+DEFERRED_MODULES = ('pandas', 'yfinance', 'google.generativeai', 'newspaper', 'plotly', 'textblob')
+
+COLD_START = """
+import time
+started = time.perf_counter()
+from app import create_app
+from config import TestingConfig
+create_app(TestingConfig)
+elapsed = time.perf_counter() - started
+import json, sys
+print(json.dumps({'ms': elapsed * 1000, 'modules': sorted(sys.modules)}))
+"""
+
+def cold_start():
+    """Returns (milliseconds, imported module names, {top-level package: self import microseconds})."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', COLD_START], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    by_package = Counter()
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        by_package[name.split('.')[0]] += int(self_us)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report['ms'], set(report['modules']), by_package
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', 1000)))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [cold_start() for _ in range(args.runs)]
+    times = [ms for ms, _, _ in runs]
+    median = statistics.median(times)
+    _, modules, by_package = max(runs, key=lambda run: run[0])
+
+    print(f"create_app() cold start over {args.runs} runs: median {median:.0f} ms, "
+          f"min {min(times):.0f} ms, max {max(times):.0f} ms (budget {args.budget_ms:.0f} ms)\n")
+    print(f"{'package':<28}{'import ms':>10}")
+    for package, us in by_package.most_common(10):
+        print(f"{package:<28}{us / 1000:>10.1f}")
+
+    failures = []
+    eager = [name for name in DEFERRED_MODULES if name in modules]
+    if eager:
+        failures.append(f"imported at startup but should be lazy: {', '.join(eager)}")
+    if median > args.budget_ms:
+        failures.append(f"median cold start {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Benchmarks are run from the repo root as `python -m benchmarks.<name>`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def time_samples(fn, repeat=5, number=20):
+    """Returns the per-call time in milliseconds of each of `repeat` runs of `number` calls."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    return samples
+
+def time_call(fn, repeat=5, number=20):
+    """Returns the best per-call time in milliseconds over `repeat` runs of `number` calls."""
+    return min(time_samples(fn, repeat=repeat, number=number))
+
+def synthetic_ohlcv(bars, seed=42):
+    """Random-walk daily bars ending today, shaped like a yf.download result."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, bars)))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=bars, name='Date')
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.003, bars)),
+        'High': close * (1 + np.abs(rng.normal(0, 0.01, bars))),
+        'Low': close * (1 - np.abs(rng.normal(0, 0.01, bars))),
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 50_000_000, bars).astype(float),
+    }, index=index)
@@ -0,0 +1 @@
+"""End-to-end load tests: the app under gunicorn, against local stand-ins for its upstreams."""
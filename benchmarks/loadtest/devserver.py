@@ -0,0 +1,26 @@
+"""The app on the threaded Werkzeug server, with outbound HTTP sent to the upstream stubs.
+
+Stands in for gunicorn where it is not installed: `harness --server flask`.
+
+    LOADTEST_STUB_URL=http://127.0.0.1:9100 python -m benchmarks.loadtest.devserver --port 5000
+"""
+from benchmarks.loadtest.redirect import install
+import argparse
+import logging
+import os
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    install(os.environ['LOADTEST_STUB_URL'])
+
+    from app import create_app
+    from config import DefaultConfig
+    app = create_app(DefaultConfig)
+    # Like gunicorn's access log, request lines would only slow the server down
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app.run(host='127.0.0.1', port=args.port, threaded=True, debug=False, use_reloader=False)
+
+if __name__ == '__main__':
+    main()
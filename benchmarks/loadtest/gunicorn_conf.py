@@ -0,0 +1,20 @@
+"""Gunicorn settings for load tests.
+
+These are the production settings from gunicorn_config.py, which read GUNICORN_*
+from the environment. The only addition: each worker sends its outbound HTTP to
+the upstream stubs at LOADTEST_STUB_URL.
+
+    LOADTEST_STUB_URL=http://127.0.0.1:9100 gunicorn -c benchmarks/loadtest/gunicorn_conf.py run:app
+"""
+import os
+import sys
+
+# gunicorn loads this file by path, so make the repo root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from gunicorn_config import *  # noqa: E402,F401,F403
+
+def post_worker_init(worker):
+    # Runs after the gevent worker has monkey-patched the process
+    from benchmarks.loadtest.redirect import install
+    install(os.environ['LOADTEST_STUB_URL'])
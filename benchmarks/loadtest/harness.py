@@ -0,0 +1,397 @@
+"""Load test: the app under gunicorn, with mixed page traffic and stubbed upstreams.
+
+    python -m benchmarks.loadtest.harness --workers 4 --worker-class gevent --timeout 30 --users 50 --duration 60
+
+The run goes in four steps:
+1. Start the upstream stubs (benchmarks.loadtest.stubs) in this process.
+2. Start gunicorn with benchmarks/loadtest/gunicorn_conf.py. That is
+   gunicorn_config.py plus the outbound redirect, with GUNICORN_* taken from the
+   options.
+3. Run --users virtual users. Each one loops: it picks a page by --mix weight and
+   a ticker (popular ones far more often, Zipf-like), loads the page the way a
+   browser would, then pauses for --think-ms on average.
+4. Print throughput, errors and p50/p95/p99 latency per page and per request,
+   plus how many upstream requests the traffic caused.
+
+The pages:
+
+    dashboard    GET /dashboard?ticker=T, then its /api panels, six at a time like a browser
+    analysis     GET /analysis for a CSRF token, then POST /analysis
+    trade-ideas  GET /trade-ideas?ticker=T
+    ai-insights  GET /ai-insights?ticker=T, POST the question to /ai-insights/stream, then read
+                 the stream it names to its end
+
+Every run starts with empty caches, in a fresh instance directory. The first
+--warmup seconds of traffic are left out of the report. --server flask runs the
+app on the Werkzeug dev server instead, for machines without gunicorn; its
+numbers say nothing about gunicorn settings. Repeat --env KEY=VALUE to override
+app config (for example --env NEWS_FETCH_WORKERS=4).
+"""
+from benchmarks.loadtest import stubs
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import argparse
+import json
+import os
+import random
+import re
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GUNICORN_CONF = os.path.join(ROOT, 'benchmarks', 'loadtest', 'gunicorn_conf.py')
+SYMBOLS_PATH = os.path.join(ROOT, 'app', 'data', 'symbols.tsv')
+
+PAGES = ('dashboard', 'analysis', 'trade-ideas', 'ai-insights')
+DEFAULT_MIX = 'dashboard=50,analysis=20,trade-ideas=20,ai-insights=10'
+# Browsers open up to six connections per host
+PANEL_CONNECTIONS = 6
+QUESTIONS = (
+    'Is this a good entry point?',
+    'What are the main risks right now?',
+    'Summarize the technical picture.',
+    'How does the news flow look?',
+)
+PERCENTILES = (50, 95, 99)
+
+DATA_SRC = re.compile(r'data-src="([^"]+)"')
+CSRF_TOKEN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+class Recorder:
+    """Collects (name, started, seconds, ok) samples from every virtual user."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+
+    def add(self, name, started, seconds, ok):
+        with self._lock:
+            self.samples.append((name, started, seconds, ok))
+
+def summarize(samples, since, window):
+    """{name: {count, errors, per_s, p50_ms, p95_ms, p99_ms}} over the samples started after `since`."""
+    by_name = {}
+    for name, started, seconds, ok in samples:
+        if started >= since:
+            by_name.setdefault(name, []).append((seconds, ok))
+    summary = {}
+    for name, rows in by_name.items():
+        latencies = np.array([seconds for seconds, _ in rows]) * 1000
+        summary[name] = {
+            'count': len(rows),
+            'errors': sum(not ok for _, ok in rows),
+            'per_s': round(len(rows) / window, 2),
+            **{f'p{p}_ms': round(float(v), 1) for p, v in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))},
+        }
+    return summary
+
+class VirtualUser:
+    """One browser: a cookie jar and keep-alive connections, loading one page after another."""
+
+    def __init__(self, base_url, recorder, panels, tickers, weights, mix, think, timeout, rng):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.panels = panels
+        self.tickers = tickers
+        self.weights = weights
+        self.mix = mix
+        self.think = think
+        self.timeout = timeout
+        self.rng = rng
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=PANEL_CONNECTIONS))
+
+    def run(self, stop_at):
+        pages, weights = zip(*self.mix.items())
+        while time.monotonic() < stop_at:
+            page = self.rng.choices(pages, weights)[0]
+            ticker = self.rng.choices(self.tickers, cum_weights=self.weights)[0]
+            started = time.monotonic()
+            try:
+                ok = getattr(self, 'load_' + page.replace('-', '_'))(ticker)
+            except requests.RequestException:
+                ok = False
+            self.recorder.add(f'page {page}', started, time.monotonic() - started, ok)
+            if self.think:
+                time.sleep(self.rng.expovariate(1 / self.think))
+
+    def request(self, method, path, name, **kwargs):
+        """One timed request; returns the response, or None when it failed to complete."""
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(name, started, time.monotonic() - started, False)
+            return None
+        self.recorder.add(name, started, time.monotonic() - started, response.ok)
+        # Production cookies are Secure; send them over the plain-HTTP test connection anyway
+        for cookie in self.session.cookies:
+            cookie.secure = False
+        return response
+
+    def load_dashboard(self, ticker):
+        shell = self.request('GET', f'/dashboard?ticker={ticker}', 'GET /dashboard')
+        if shell is None or not shell.ok:
+            return False
+        sources = [src.replace('&amp;', '&') for src in DATA_SRC.findall(shell.text)]
+        names = ['GET ' + src.replace(ticker, '{ticker}') for src in sources]
+        results = self.panels.map(lambda args: self.request('GET', *args), zip(sources, names))
+        return all(response is not None and response.ok for response in results)
+
+    def load_analysis(self, ticker):
+        form = self.request('GET', '/analysis', 'GET /analysis')
+        token = form is not None and CSRF_TOKEN.search(form.text)
+        if not token:
+            return False
+        response = self.request('POST', '/analysis', 'POST /analysis',
+                                data={'csrf_token': token.group(1), 'ticker': ticker})
+        return response is not None and response.ok
+
+    def load_trade_ideas(self, ticker):
+        response = self.request('GET', f'/trade-ideas?ticker={ticker}', 'GET /trade-ideas')
+        return response is not None and response.ok
+
+    def load_ai_insights(self, ticker):
+        page = self.request('GET', f'/ai-insights?ticker={ticker}', 'GET /ai-insights')
+        token = page is not None and page.ok and CSRF_TOKEN.search(page.text)
+        if not token:
+            return False
+        started = time.monotonic()
+        registered = self.request('POST', '/ai-insights/stream', 'POST /ai-insights/stream',
+                                  data={'csrf_token': token.group(1), 'ticker': ticker,
+                                        'question': self.rng.choice(QUESTIONS)})
+        if registered is None or not registered.ok:
+            return False
+        first_chunk = done = False
+        try:
+            with self.session.get(self.base_url + registered.json()['url'], stream=True,
+                                  timeout=self.timeout) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line == 'event: chunk' and not first_chunk:
+                        first_chunk = True
+                        self.recorder.add('SSE /ai-insights/stream first chunk', started, time.monotonic() - started, True)
+                    elif line == 'event: done':
+                        done = True
+                ok = response.ok and done
+        except requests.RequestException:
+            ok = False
+        self.recorder.add('SSE /ai-insights/stream', started, time.monotonic() - started, ok)
+        return ok
+
+def load_tickers(count):
+    """`count` listed symbols in a fixed shuffled order, so the most popular ones are not all 'A...'."""
+    with open(SYMBOLS_PATH, encoding='utf-8') as f:
+        symbols = [line.split('\t')[0] for line in f if line.strip() and not line.startswith('#')]
+    random.Random(0).shuffle(symbols)
+    return symbols[:count]
+
+def zipf_cum_weights(count, exponent):
+    cumulative, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += rank ** -exponent
+        cumulative.append(total)
+    return cumulative
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        page, _, weight = part.partition('=')
+        if page not in PAGES:
+            raise argparse.ArgumentTypeError(f"unknown page {page!r} (one of {', '.join(PAGES)})")
+        mix[page] = float(weight)
+    return mix
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(args, port, stub_url, instance_dir, log):
+    env = {
+        **os.environ,
+        'FLASK_ENV': 'production',
+        'SECRET_KEY': secrets.token_hex(24),
+        'WTF_CSRF_SECRET_KEY': secrets.token_hex(24),
+        'GEMINI_API_KEY': 'loadtest',
+        # The REST transport goes through requests, which the redirect covers
+        'GEMINI_TRANSPORT': 'rest',
+        'AI_FAKE_MODEL': 'false',
+        'HISTORY_STORE_DIR': os.path.join(instance_dir, 'history'),
+        'ARTICLE_CACHE_PATH': os.path.join(instance_dir, 'articles.sqlite'),
+        'SHARED_CACHE_DIR': os.path.join(instance_dir, 'shared'),
+        'LOADTEST_STUB_URL': stub_url,
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_WORKER_CLASS': args.worker_class,
+        'GUNICORN_TIMEOUT': str(args.timeout),
+        'GUNICORN_ACCESS_LOG': os.devnull,
+        'GUNICORN_LOG_LEVEL': 'warning',
+        'PYTHONPATH': ROOT,
+    }
+    for pair in args.env or ():
+        key, _, value = pair.partition('=')
+        env[key] = value
+    if args.server == 'gunicorn':
+        # Keep this run's worker metrics apart from any other gunicorn on the host
+        env.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(instance_dir, 'metrics'))
+        command = [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONF, 'run:app']
+    else:
+        command = [sys.executable, '-m', 'benchmarks.loadtest.devserver', '--port', str(port)]
+    # The app writes logs/ into its working directory
+    return subprocess.Popen(command, cwd=instance_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+def wait_until_up(process, base_url, deadline=60):
+    stop_at = time.monotonic() + deadline
+    while time.monotonic() < stop_at:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(base_url + '/dashboard', timeout=5).ok:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    return False
+
+def stop_server(process):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+def print_table(title, summary):
+    print(f"\n{title:<44}{'count':>7}{'errors':>8}{'per s':>8}" + ''.join(f"{f'p{p} ms':>9}" for p in PERCENTILES))
+    for name, row in sorted(summary.items()):
+        print(f"{name:<44}{row['count']:>7}{row['errors']:>8}{row['per_s']:>8.2f}"
+              + ''.join(f"{row[f'p{p}_ms']:>9.0f}" for p in PERCENTILES))
+
+def run(args):
+    profiles = stubs.build_profiles(args.latency, args.error_rate, args.stall_rate)
+    stub_server, stub_stats = stubs.serve(0, profiles, args.stall_seconds)
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+
+    with tempfile.TemporaryDirectory(prefix='loadtest-') as instance_dir:
+        log_path = os.path.join(instance_dir, 'server.log')
+        with open(log_path, 'w') as log:
+            process = start_server(args, port, stub_server.url, instance_dir, log)
+        try:
+            if not wait_until_up(process, base_url):
+                with open(log_path) as log:
+                    print(f'{args.server} did not come up:\n' + log.read()[-4000:])
+                return None
+
+            tickers = load_tickers(args.tickers)
+            cum_weights = zipf_cum_weights(len(tickers), args.zipf)
+            recorder = Recorder()
+            started = time.monotonic()
+            measure_from = started + args.warmup
+            stop_at = measure_from + args.duration
+            upstream_before = None
+            with ThreadPoolExecutor(max_workers=args.users * PANEL_CONNECTIONS, thread_name_prefix='panel') as panels:
+                users = [VirtualUser(base_url, recorder, panels, tickers, cum_weights, args.mix, args.think_ms / 1000,
+                                     args.request_timeout, random.Random(args.seed + i))
+                         for i in range(args.users)]
+                threads = [threading.Thread(target=user.run, args=(stop_at,), daemon=True) for user in users]
+                for thread in threads:
+                    thread.start()
+                    # Users arrive over the first second rather than all at once
+                    time.sleep(1 / args.users)
+                time.sleep(max(0.0, measure_from - time.monotonic()))
+                upstream_before = stub_stats.snapshot()
+                for thread in threads:
+                    thread.join()
+            upstream_after = stub_stats.snapshot()
+        finally:
+            stop_server(process)
+            stub_server.shutdown()
+
+    window = args.duration
+    summary = summarize(recorder.samples, measure_from, window)
+    pages = {name[len('page '):]: row for name, row in summary.items() if name.startswith('page ')}
+    page_samples = [s for s in recorder.samples if s[0].startswith('page ') and s[1] >= measure_from]
+    if page_samples:
+        pages['all'] = summarize([('all',) + s[1:] for s in page_samples], measure_from, window)['all']
+    upstreams = {kind: {key: upstream_after[kind][key] - upstream_before[kind][key] for key in counts}
+                 for kind, counts in upstream_after.items()}
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'server': args.server,
+            'workers': args.workers,
+            'worker_class': args.worker_class,
+            'timeout': args.timeout,
+            'users': args.users,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'think_ms': args.think_ms,
+            'mix': args.mix,
+            'tickers': args.tickers,
+            'env': args.env or [],
+            'upstream_profiles': {kind: vars(profile) for kind, profile in profiles.items()},
+        },
+        'pages': pages,
+        'requests': {name: row for name, row in summary.items() if not name.startswith('page ')},
+        'upstreams': upstreams,
+    }
+
+def print_report(report):
+    meta = report['meta']
+    if meta['server'] == 'gunicorn':
+        server = f"gunicorn {meta['workers']} x {meta['worker_class']}, timeout {meta['timeout']}s"
+    else:
+        server = 'Werkzeug dev server (threaded)'
+    print(f"\n{server}; {meta['users']} users, {meta['duration_s']}s measured after {meta['warmup_s']}s warmup, "
+          f"think {meta['think_ms']:.0f} ms")
+    print_table('page', report['pages'])
+    print_table('request', report['requests'])
+    print(f"\n{'upstream':<12}{'requests':>10}{'errors':>8}{'stalls':>8}")
+    for kind, counts in report['upstreams'].items():
+        print(f"{kind:<12}{counts['requests']:>10}{counts['errors']:>8}{counts['stalls']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    server = parser.add_argument_group('server')
+    server.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn')
+    server.add_argument('--workers', type=int, default=int(os.getenv('GUNICORN_WORKERS', 4)))
+    server.add_argument('--worker-class', default=os.getenv('GUNICORN_WORKER_CLASS', 'gevent'))
+    server.add_argument('--timeout', type=int, default=int(os.getenv('GUNICORN_TIMEOUT', 30)))
+    server.add_argument('--env', action='append', metavar='KEY=VALUE', help='app config override (repeatable)')
+    traffic = parser.add_argument_group('traffic')
+    traffic.add_argument('--users', type=int, default=20)
+    traffic.add_argument('--duration', type=float, default=60, help='measured seconds')
+    traffic.add_argument('--warmup', type=float, default=10, help='seconds of unreported traffic first')
+    traffic.add_argument('--think-ms', type=float, default=500, help='mean pause between a user\'s pages')
+    traffic.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help='page=weight,...')
+    traffic.add_argument('--tickers', type=int, default=100, help='distinct tickers in play')
+    traffic.add_argument('--zipf', type=float, default=1.1, help='ticker popularity skew')
+    traffic.add_argument('--request-timeout', type=float, default=60)
+    traffic.add_argument('--seed', type=int, default=1)
+    stubs.add_profile_arguments(parser)
+    parser.add_argument('--output', help='also write the report as JSON here')
+    args = parser.parse_args()
+
+    report = run(args)
+    if report is None:
+        return 1
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print(f"\nWrote {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Sends the app's outbound HTTP to the local upstream stubs.
+
+install(stub_url) patches Session.request in two libraries:
+- requests, which covers newspaper, the Gemini REST transport and yfinance 0.2.x;
+- curl_cffi, which covers yfinance 1.x.
+
+After that, every request to a non-local host goes to the stub server instead.
+The path and query are kept, and an X-Stub-Host header carries the original host.
+The app itself is unchanged. Under gunicorn, benchmarks/loadtest/gunicorn_conf.py
+installs the patch in each worker.
+"""
+from urllib.parse import urlsplit, urlunsplit
+import importlib
+
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+def rewrite(url, stub_url):
+    """Returns (URL on the stub server, original host), or (url, None) when the URL is local."""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or (parts.hostname or '') in LOCAL_HOSTS:
+        return url, None
+    stub = urlsplit(stub_url)
+    return urlunsplit((stub.scheme, stub.netloc, parts.path or '/', parts.query, '')), parts.netloc
+
+def _patch(session_class, stub_url):
+    original = getattr(session_class.request, '_unpatched', session_class.request)
+
+    def request(self, method, url, *args, **kwargs):
+        url, host = rewrite(str(url), stub_url)
+        if host:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), 'X-Stub-Host': host}
+        return original(self, method, url, *args, **kwargs)
+
+    request._unpatched = original
+    session_class.request = request
+
+def install(stub_url):
+    """Redirects requests and curl_cffi sessions to `stub_url`. Installing again moves the redirect."""
+    import requests
+    _patch(requests.Session, stub_url)
+    try:
+        curl_requests = importlib.import_module('curl_cffi.requests')
+    except ImportError:
+        # yfinance 0.2.x uses plain requests
+        return
+    _patch(curl_requests.Session, stub_url)
@@ -0,0 +1,422 @@
+"""Local stand-ins for the app's upstreams, with configurable latency and errors.
+
+A single HTTP server answers for every host the app talks to. Outbound requests
+reach it through benchmarks.loadtest.redirect, which keeps the path and names the
+original host in an X-Stub-Host header. Each request belongs to one kind:
+
+    chart    Yahoo /v8/finance/chart (yf.download and history top-ups)
+    quote    Yahoo quoteSummary, v7 quote and fundamentals, plus the cookie/crumb handshake (Ticker.info)
+    news     Yahoo /v1/finance/search (yfinance 0.2.x) and /xhr/ncp (1.x) (Ticker.news)
+    article  any other host: a news article page (newspaper)
+    gemini   generativelanguage.googleapis.com generateContent / streamGenerateContent
+
+Each kind has these knobs:
+- a lognormal latency, given as its median and sigma;
+- an error rate, answered with a 503;
+- a stall rate: the request is held for --stall-seconds, so client and worker
+  timeouts get exercised.
+
+Prices are seeded random walks per symbol, so every range of one symbol agrees
+with every other range.
+
+To run it standalone, next to a server started by hand:
+
+    python -m benchmarks.loadtest.stubs --port 9100 --latency chart=300:0.5 --error-rate news=0.05
+"""
+from app.fakemodel import CANNED_CHUNKS
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import functools
+import html
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+import numpy as np
+
+KINDS = ('chart', 'quote', 'news', 'article', 'gemini')
+
+@dataclass
+class UpstreamProfile:
+    """Latency and failure model for one kind of upstream request."""
+    median_ms: float
+    sigma: float = 0.5
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+
+    def latency(self, rng):
+        """One sampled latency, in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        return rng.lognormvariate(0, self.sigma) * self.median_ms / 1000
+
+# Roughly what the real services answer in from a cloud region
+DEFAULT_PROFILES = {
+    'chart': UpstreamProfile(150, 0.4),
+    'quote': UpstreamProfile(200, 0.4),
+    'news': UpstreamProfile(250, 0.5),
+    'article': UpstreamProfile(400, 0.6),
+    'gemini': UpstreamProfile(700, 0.4),  # time to the first streamed chunk
+}
+
+# Seconds between streamed Gemini chunks
+GEMINI_CHUNK_DELAY = 0.08
+
+SECTORS = ('Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical', 'Industrials', 'Energy')
+NEWS_ITEMS = 8
+
+# First bar of every synthetic series
+EPOCH = date(1995, 1, 2)
+# Daily bars are stamped at the 09:30 New York open, as Yahoo does (13:30 UTC in summer time)
+BAR_OFFSET = 13 * 3600 + 30 * 60
+RANGE_DAYS = {'1d': 1, '5d': 7, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366, '2y': 731, '5y': 1827, '10y': 3653}
+
+CHART_PATH = re.compile(r'^/v8/finance/chart/([^/?]+)')
+QUOTE_SUMMARY_PATH = re.compile(r'^/v10/finance/quoteSummary/([^/?]+)')
+GEMINI_PATH = re.compile(r':(generateContent|streamGenerateContent)$')
+
+def _seed(symbol, salt=0):
+    return zlib.crc32(symbol.encode()) + salt
+
+@functools.lru_cache(maxsize=2048)
+def price_series(symbol):
+    """(bar timestamps, open, high, low, close, volume) from EPOCH to today, the same on every call."""
+    days = np.arange(np.datetime64(EPOCH), np.datetime64(date.today()) + 1)
+    days = days[np.is_busday(days)]
+    rng = np.random.default_rng(_seed(symbol))
+    bars = len(days)
+    close = np.exp(np.cumsum(rng.normal(0.0003, 0.018, bars)))
+    close *= rng.uniform(20, 400) / close[-1]
+    open_ = close * (1 + rng.normal(0, 0.004, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, bars)))
+    volume = rng.integers(500_000, 60_000_000, bars)
+    timestamps = days.astype('datetime64[s]').astype(np.int64) + BAR_OFFSET
+    return timestamps, open_, high, low, close, volume
+
+def _range_start(params, now):
+    if 'period1' in params:
+        return int(float(params['period1'][0]))
+    name = params.get('range', ['1mo'])[0]
+    if name == 'max':
+        return 0
+    if name == 'ytd':
+        return int(datetime(datetime.now(timezone.utc).year, 1, 1, tzinfo=timezone.utc).timestamp())
+    return now - RANGE_DAYS.get(name, 31) * 86400
+
+def chart_response(symbol, params):
+    """A /v8/finance/chart body with daily bars for the requested range or period1/period2."""
+    timestamps, open_, high, low, close, volume = price_series(symbol)
+    now = int(time.time())
+    start = _range_start(params, now)
+    end = int(float(params.get('period2', [now])[0]))
+    lo, hi = np.searchsorted(timestamps, [start, end])
+    if hi == lo and 'period1' not in params:
+        # A range always reaches back to the last session, even over a weekend
+        lo = max(hi - 1, 0)
+    rounded = lambda values: np.round(values[lo:hi], 4).tolist()
+    meta = {
+        'currency': 'USD', 'symbol': symbol, 'exchangeName': 'NMS', 'fullExchangeName': 'NasdaqGS',
+        'instrumentType': 'EQUITY', 'firstTradeDate': int(timestamps[0]), 'regularMarketTime': int(timestamps[-1]),
+        'hasPrePostMarketData': False, 'gmtoffset': -14400, 'timezone': 'EDT',
+        'exchangeTimezoneName': 'America/New_York', 'regularMarketPrice': round(float(close[-1]), 4),
+        'chartPreviousClose': round(float(close[max(lo - 1, 0)]), 4), 'priceHint': 2,
+        'currentTradingPeriod': {
+            part: {'timezone': 'EDT', 'start': int(timestamps[-1]), 'end': int(timestamps[-1]) + 23400, 'gmtoffset': -14400}
+            for part in ('pre', 'regular', 'post')
+        },
+        'dataGranularity': '1d', 'range': params.get('range', [''])[0],
+        'validRanges': ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'],
+    }
+    return {'chart': {'result': [{
+        'meta': meta,
+        'timestamp': timestamps[lo:hi].tolist(),
+        'indicators': {
+            'quote': [{'open': rounded(open_), 'high': rounded(high), 'low': rounded(low),
+                       'close': rounded(close), 'volume': volume[lo:hi].tolist()}],
+            'adjclose': [{'adjclose': rounded(close)}],
+        },
+    }], 'error': None}}
+
+def quote_fields(symbol):
+    """The flat fields Ticker.info is built from."""
+    rng = random.Random(_seed(symbol, 1))
+    _, _, high, low, close, volume = price_series(symbol)
+    price = float(close[-1])
+    return {
+        'symbol': symbol, 'quoteType': 'EQUITY', 'currency': 'USD',
+        'longName': f'{symbol} Holdings Inc.', 'shortName': f'{symbol} Holdings',
+        'sector': rng.choice(SECTORS), 'industry': 'Diversified', 'website': f'https://www.{symbol.lower()}.example.com',
+        'marketCap': int(price * rng.randint(100_000_000, 15_000_000_000)),
+        'trailingPE': round(rng.uniform(8, 60), 2), 'forwardPE': round(rng.uniform(8, 45), 2),
+        'dividendYield': round(rng.uniform(0, 0.04), 4),
+        'fiftyTwoWeekHigh': round(float(high[-252:].max()), 2), 'fiftyTwoWeekLow': round(float(low[-252:].min()), 2),
+        'averageVolume': int(volume[-63:].mean()), 'regularMarketPrice': round(price, 4),
+        'longBusinessSummary': f'{symbol} Holdings designs, makes and sells things to people who want them.',
+    }
+
+def quote_summary_response(symbol):
+    fields = quote_fields(symbol)
+    profile = {key: fields[key] for key in ('sector', 'industry', 'website', 'longBusinessSummary')}
+    return {'quoteSummary': {'result': [{
+        'assetProfile': profile,
+        'summaryDetail': {key: fields[key] for key in ('marketCap', 'trailingPE', 'forwardPE', 'dividendYield',
+                                                       'fiftyTwoWeekHigh', 'fiftyTwoWeekLow', 'averageVolume')},
+        'quoteType': {'symbol': symbol, 'quoteType': 'EQUITY', 'longName': fields['longName'],
+                      'shortName': fields['shortName']},
+        'financialData': {'currentPrice': fields['regularMarketPrice'], 'financialCurrency': 'USD'},
+        'defaultKeyStatistics': {'forwardPE': fields['forwardPE']},
+    }], 'error': None}}
+
+def quote_response(symbols):
+    return {'quoteResponse': {'result': [quote_fields(symbol) for symbol in symbols if symbol], 'error': None}}
+
+def news_items(symbol):
+    """News for a symbol: the flat 0.2.x fields, plus the 1.x `content` block around the same story."""
+    now = int(time.time())
+    items = []
+    for i in range(NEWS_ITEMS):
+        link = f'https://news.example.com/markets/{symbol.lower()}-story-{i}'
+        title = f'{symbol} shares move as traders weigh story number {i}'
+        published = now - i * 3600
+        items.append({
+            'uuid': f'{symbol}-{i}', 'title': title, 'publisher': 'Market Wire', 'link': link,
+            'providerPublishTime': published, 'type': 'STORY', 'relatedTickers': [symbol],
+            'id': f'{symbol}-{i}',
+            'content': {'id': f'{symbol}-{i}', 'contentType': 'STORY', 'title': title,
+                        'pubDate': datetime.fromtimestamp(published, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                        'provider': {'displayName': 'Market Wire'},
+                        'canonicalUrl': {'url': link}, 'clickThroughUrl': {'url': link}},
+        })
+    return items
+
+def article_page(host, path):
+    """An article page with the navigation and footer boilerplate newspaper has to strip."""
+    rng = random.Random(zlib.crc32(f'{host}{path}'.encode()))
+    words = ('shares', 'rallied', 'after', 'strong', 'earnings', 'beat', 'while', 'analysts', 'warned', 'about',
+             'weak', 'guidance', 'and', 'slowing', 'demand', 'growth', 'outlook', 'investors', 'cheered', 'margins')
+    paragraphs = [' '.join(rng.choice(words) for _ in range(40)).capitalize() + '.' for _ in range(8)]
+    title = html.escape(path.strip('/').replace('-', ' ').replace('/', ' ') or host)
+    body = '\n'.join(f'      <p>{p}</p>' for p in paragraphs)
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>{title} | Market Wire</title><meta property="og:title" content="{title}"></head>
+<body>
+  <header><nav><a href="/">Home</a> <a href="/markets">Markets</a> <a href="/subscribe">Subscribe</a></nav></header>
+  <main>
+    <article>
+      <h1>{title}</h1>
+{body}
+    </article>
+  </main>
+  <footer><p>Copyright Market Wire. All rights reserved.</p></footer>
+</body>
+</html>
+"""
+
+def gemini_chunk(text, finished=False):
+    candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+    if finished:
+        candidate['finishReason'] = 'STOP'
+    return {'candidates': [candidate],
+            'usageMetadata': {'promptTokenCount': 400, 'candidatesTokenCount': 60, 'totalTokenCount': 460}}
+
+class StubStats:
+    """Per-kind request, error and stall counts, shared by the handler threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {kind: {'requests': 0, 'errors': 0, 'stalls': 0} for kind in KINDS}
+
+    def count(self, kind, outcome):
+        with self._lock:
+            self._counts[kind]['requests'] += 1
+            if outcome:
+                self._counts[kind][outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {kind: dict(counts) for kind, counts in self._counts.items()}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Set on the per-server subclass by serve()
+    profiles = DEFAULT_PROFILES
+    stall_seconds = 35.0
+    stats = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        url = urlsplit(self.path)
+        host = self.headers.get('X-Stub-Host') or self.headers.get('Host', '')
+        params = parse_qs(url.query)
+        kind = self._kind(host, url.path)
+
+        rng = random.Random()
+        profile = self.profiles[kind]
+        roll = rng.random()
+        outcome = 'errors' if roll < profile.error_rate else \
+            'stalls' if roll < profile.error_rate + profile.stall_rate else None
+        self.stats.count(kind, outcome)
+        time.sleep(self.stall_seconds if outcome == 'stalls' else profile.latency(rng))
+        if outcome == 'errors':
+            return self._send(503, b'Service Unavailable', 'text/plain')
+
+        if kind == 'gemini':
+            return self._gemini(url.path)
+        if kind == 'article':
+            return self._send(200, article_page(host, url.path).encode(), 'text/html; charset=utf-8')
+        if kind == 'chart':
+            return self._json(chart_response(CHART_PATH.match(url.path).group(1).upper(), params))
+        if kind == 'news':
+            if url.path.startswith('/xhr/ncp'):
+                symbols = json.loads(body or b'{}').get('serviceConfig', {}).get('s') or ['']
+                return self._json({'data': {'tickerStream': {'stream': news_items(symbols[0].upper())}}})
+            return self._json({'news': news_items(params.get('q', [''])[0].upper()), 'quotes': []})
+        # quote: the cookie/crumb handshake, quoteSummary, or v7 quote
+        if url.path.startswith('/v1/test/getcrumb'):
+            return self._send(200, b'stubCrumb0', 'text/plain')
+        match = QUOTE_SUMMARY_PATH.match(url.path)
+        if match:
+            return self._json(quote_summary_response(match.group(1).upper()))
+        if url.path.startswith('/v7/finance/quote'):
+            return self._json(quote_response(params.get('symbols', [''])[0].upper().split(',')))
+        if url.path.startswith('/ws/fundamentals-timeseries/'):
+            # Ticker.info asks for a few trailing ratios it can do without
+            return self._json({'timeseries': {'result': [], 'error': None}})
+        return self._send(200, b'', 'text/html', {'Set-Cookie': 'A3=stub; Path=/; Max-Age=31536000'})
+
+    @staticmethod
+    def _kind(host, path):
+        if 'generativelanguage' in host or GEMINI_PATH.search(path):
+            return 'gemini'
+        if path.startswith('/v8/finance/chart/'):
+            return 'chart'
+        if path.startswith(('/v1/finance/search', '/xhr/ncp')):
+            return 'news'
+        if 'yahoo.com' in host:
+            return 'quote'
+        return 'article'
+
+    def _gemini(self, path):
+        if not path.endswith(':streamGenerateContent'):
+            time.sleep(GEMINI_CHUNK_DELAY * (len(CANNED_CHUNKS) - 1))
+            return self._json(gemini_chunk(''.join(CANNED_CHUNKS), finished=True))
+        # The REST transport reads a JSON array of responses as it arrives
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        last = len(CANNED_CHUNKS) - 1
+        for i, text in enumerate(CANNED_CHUNKS):
+            if i:
+                time.sleep(GEMINI_CHUNK_DELAY)
+            piece = ('[' if i == 0 else ',\r\n') + json.dumps(gemini_chunk(text, finished=i == last))
+            self._write_chunk(piece.encode() + (b']' if i == last else b''))
+        self._write_chunk(b'')
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def _json(self, payload):
+        self._send(200, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The app opens many connections at once under load
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        # A client that gave up on a slow answer closed its connection; that is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def serve(port=0, profiles=None, stall_seconds=35.0):
+    """Starts the stubs on a background thread. Returns (server, stats); the server's URL is server.url."""
+    stats = StubStats()
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'profiles': {**DEFAULT_PROFILES, **(profiles or {})},
+        'stall_seconds': stall_seconds,
+        'stats': stats,
+    })
+    server = StubServer(('127.0.0.1', port), handler)
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, name='upstream-stubs', daemon=True).start()
+    return server, stats
+
+def _kind_values(specs, option):
+    """Parses repeated KIND=VALUE options ('all' sets every kind) into {kind: value}."""
+    values = {}
+    for spec in specs or ():
+        kind, _, value = spec.partition('=')
+        if kind != 'all' and kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"{option}: unknown upstream kind {kind!r} (one of {', '.join(KINDS)}, all)")
+        for name in (KINDS if kind == 'all' else (kind,)):
+            values[name] = value
+    return values
+
+def build_profiles(latency=None, error_rate=None, stall_rate=None):
+    """UpstreamProfiles from --latency KIND=MEDIAN_MS[:SIGMA], --error-rate KIND=P and --stall-rate KIND=P."""
+    latencies = _kind_values(latency, '--latency')
+    errors = _kind_values(error_rate, '--error-rate')
+    stalls = _kind_values(stall_rate, '--stall-rate')
+    profiles = {}
+    for kind, default in DEFAULT_PROFILES.items():
+        median_ms, sigma = default.median_ms, default.sigma
+        if kind in latencies:
+            median, _, spread = latencies[kind].partition(':')
+            median_ms, sigma = float(median), float(spread) if spread else sigma
+        profiles[kind] = UpstreamProfile(median_ms, sigma, float(errors.get(kind, default.error_rate)),
+                                         float(stalls.get(kind, default.stall_rate)))
+    return profiles
+
+def add_profile_arguments(parser):
+    group = parser.add_argument_group('upstream stubs')
+    group.add_argument('--latency', action='append', metavar='KIND=MEDIAN_MS[:SIGMA]',
+                       help=f"lognormal latency per upstream kind ({', '.join(KINDS)}, or all)")
+    group.add_argument('--error-rate', action='append', metavar='KIND=P', help='share of requests answered 503')
+    group.add_argument('--stall-rate', action='append', metavar='KIND=P',
+                       help='share of requests held for --stall-seconds')
+    group.add_argument('--stall-seconds', type=float, default=35.0)
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-ins for Yahoo, article hosts and Gemini.')
+    parser.add_argument('--port', type=int, default=9100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    server, stats = serve(args.port, build_profiles(args.latency, args.error_rate, args.stall_rate), args.stall_seconds)
+    print(f'Upstream stubs on {server.url}; point the app at them with LOADTEST_STUB_URL={server.url}')
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(stats.snapshot()))
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Records the upstream responses bench_analyzer replays, into benchmarks/fixtures/replay/.
+
+Usage:
+    python -m benchmarks.record_fixtures              # live yfinance frames, news and article HTML
+    python -m benchmarks.record_fixtures --synthetic  # deterministic stand-ins, no network needed
+
+The committed fixtures are the synthetic set. They have the same shapes as the live
+responses: MultiIndex yf.download columns, yfinance news items, and full article pages
+with navigation and footer boilerplate around the story.
+"""
+from benchmarks.common import synthetic_ohlcv
+import argparse
+import html
+import json
+import os
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+REPLAY_DIR = os.path.join(FIXTURES_DIR, 'replay')
+TICKER = 'AAPL'
+# Longest period recorded; shorter ones are sliced from it on replay
+PERIOD = '5y'
+ARTICLES = 5
+
+def frame_path(ticker):
+    return os.path.join(REPLAY_DIR, f'{ticker}_{PERIOD}.csv')
+
+def news_path(ticker):
+    return os.path.join(REPLAY_DIR, f'{ticker}_news.json')
+
+def articles_index_path():
+    return os.path.join(REPLAY_DIR, 'articles', 'index.json')
+
+def save_frame(ticker, data):
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    data.to_csv(frame_path(ticker))
+
+def load_frame(ticker):
+    """The recorded yf.download result, with its (Price, Ticker) column MultiIndex."""
+    data = pd.read_csv(frame_path(ticker), header=[0, 1], index_col=0, parse_dates=True)
+    data.index.name = 'Date'
+    return data
+
+def save_replay(ticker, frame, news, pages):
+    """Writes one ticker's frame, news items and {url: html} article pages."""
+    save_frame(ticker, frame)
+    with open(news_path(ticker), 'w', encoding='utf-8') as f:
+        json.dump(news, f, indent=1)
+    directory = os.path.dirname(articles_index_path())
+    os.makedirs(directory, exist_ok=True)
+    index = {}
+    for i, (url, page) in enumerate(pages.items()):
+        name = f'{ticker}_{i}.html'
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(page)
+        index[url] = name
+    with open(articles_index_path(), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+
+def record_live(ticker):
+    import requests
+    import yfinance as yf
+    frame = yf.download(ticker, period=PERIOD, auto_adjust=True, actions=False)
+    news = yf.Ticker(ticker).news[:ARTICLES]
+    pages = {}
+    for item in news:
+        link = item.get('link')
+        if link:
+            pages[link] = requests.get(link, timeout=10, headers={'User-Agent': 'Mozilla/5.0'}).text
+    save_replay(ticker, frame, news, pages)
+
+def _article_page(title, paragraphs):
+    body = '\n'.join(f'      <p>{html.escape(p)}</p>' for p in paragraphs)
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>{html.escape(title)} | Market Wire</title>
+  <meta property="og:title" content="{html.escape(title)}">
+  <meta name="description" content="{html.escape(paragraphs[0])}">
+</head>
+<body>
+  <header><nav><a href="/">Home</a> <a href="/markets">Markets</a> <a href="/tech">Tech</a> <a href="/subscribe">Subscribe</a></nav></header>
+  <main>
+    <article>
+      <h1>{html.escape(title)}</h1>
+      <div class="byline">By Staff Writer</div>
+{body}
+    </article>
+    <aside><h3>Trending</h3><ul><li><a href="/a">Markets wrap</a></li><li><a href="/b">Fed watch</a></li></ul></aside>
+  </main>
+  <footer><p>Copyright Market Wire. All rights reserved.</p><a href="/privacy">Privacy</a></footer>
+</body>
+</html>
+"""
+
+def record_synthetic(ticker):
+    """Deterministic fixtures built from the sentiment benchmark's news corpus."""
+    bars = synthetic_ohlcv(1260, seed=7)
+    bars.index = pd.bdate_range(end='2025-06-30', periods=len(bars), name='Date')
+    # yfinance returns (Price, Ticker) MultiIndex columns even for a single ticker
+    bars.columns = pd.MultiIndex.from_product([bars.columns, [ticker]], names=['Price', 'Ticker'])
+
+    with open(os.path.join(FIXTURES_DIR, 'news_corpus.json'), encoding='utf-8') as f:
+        corpus = json.load(f)
+    rng = np.random.default_rng(7)
+    news, pages = [], {}
+    for i in range(ARTICLES):
+        link = f'https://news.example.com/markets/{ticker.lower()}-story-{i}?utm_source=yahoo'
+        title = corpus[i].split(',')[0].rstrip('.')
+        paragraphs = [corpus[j] for j in rng.choice(len(corpus), size=8, replace=False)]
+        news.append({'uuid': f'{ticker}-{i}', 'title': title, 'publisher': 'Market Wire', 'link': link,
+                     'providerPublishTime': 1751270400 - i * 3600, 'type': 'STORY'})
+        pages[link] = _article_page(title, paragraphs)
+    save_replay(ticker, bars, news, pages)
+
+def main():
+    parser = argparse.ArgumentParser(description='Record upstream responses for bench_analyzer.')
+    parser.add_argument('--synthetic', action='store_true', help='write deterministic stand-ins instead')
+    args = parser.parse_args()
+    (record_synthetic if args.synthetic else record_live)(TICKER)
+    print(f'Wrote {TICKER} fixtures to {REPLAY_DIR}')
+
+if __name__ == '__main__':
+    main()
@@ -12,8 +12,16 @@ class Config:
     
     # API Keys
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+    # google.generativeai transport: 'grpc', 'rest', or empty for the library's default
+    GEMINI_TRANSPORT = os.getenv('GEMINI_TRANSPORT', '')
     ALPACA_API_KEY = os.getenv('ALPACA_API_KEY', '')
     ALPACA_SECRET_KEY = os.getenv('ALPACA_SECRET_KEY', '')
+    # Canned, locally streamed answers instead of Gemini (for development and load tests)
+    AI_FAKE_MODEL = os.getenv('AI_FAKE_MODEL', 'false').lower() == 'true'
+    AI_FAKE_MODEL_DELAY = float(os.getenv('AI_FAKE_MODEL_DELAY', 0.2))  # seconds per chunk
+    # Generated answers, keyed by ticker, question and the data snapshot in the prompt
+    AI_CACHE_TIMEOUT = int(os.getenv('AI_CACHE_TIMEOUT', 3600))  # 1 hour
+    AI_CACHE_LRU_SIZE = int(os.getenv('AI_CACHE_LRU_SIZE', 256))
     
     # Cache configuration
     CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
@@ -24,6 +32,85 @@ class Config:
     APP_NAME = 'FinanceBro Pro'
     STOCK_DATA_CACHE_TIMEOUT = int(os.getenv('STOCK_DATA_CACHE_TIMEOUT', 60))  # 1 minute
     COMPANY_INFO_CACHE_TIMEOUT = int(os.getenv('COMPANY_INFO_CACHE_TIMEOUT', 86400))  # 24 hours
+    SENTIMENT_CACHE_TIMEOUT = int(os.getenv('SENTIMENT_CACHE_TIMEOUT', 900))  # 15 minutes
+    # Per-ticker analysis snapshots (TA, sentiment, company info) shared by every page.
+    # Each section is reused for its own timeout above; this bounds the whole entry.
+    SNAPSHOT_CACHE_TIMEOUT = int(os.getenv('SNAPSHOT_CACHE_TIMEOUT', 86400))
+    SNAPSHOT_LRU_SIZE = int(os.getenv('SNAPSHOT_LRU_SIZE', 256))
+    # Other workers add sections to a snapshot, so a worker's in-process copy is re-read from
+    # the shared cache once it is this many seconds old
+    SNAPSHOT_RECHECK_INTERVAL = float(os.getenv('SNAPSHOT_RECHECK_INTERVAL', 5))
+    # Longer chart periods are downsampled (LTTB) to at most this many points per trace
+    CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', 500))
+    # Encoded chart payloads, keyed by the last bar they were drawn from
+    CHART_CACHE_TIMEOUT = int(os.getenv('CHART_CACHE_TIMEOUT', 86400))
+    CHART_LRU_SIZE = int(os.getenv('CHART_LRU_SIZE', 256))
+    # Entries kept in each worker's in-process LRU, in front of the shared cache
+    STOCK_DATA_LRU_SIZE = int(os.getenv('STOCK_DATA_LRU_SIZE', 128))
+    COMPANY_INFO_LRU_SIZE = int(os.getenv('COMPANY_INFO_LRU_SIZE', 512))
+    # Host-wide memory-mapped cache shared by all gunicorn workers (defaults to /dev/shm/financebro-<uid>;
+    # it must be owned by the app's user with mode 0700, or the shared tier stays off)
+    SHARED_CACHE_ENABLED = os.getenv('SHARED_CACHE_ENABLED', 'true').lower() == 'true'
+    SHARED_CACHE_DIR = os.getenv('SHARED_CACHE_DIR', '')
+    # Every SHARED_CACHE_SWEEP_INTERVAL seconds a worker deletes its expired files, then the oldest
+    # entries until the rest fit in SHARED_CACHE_MAX_BYTES (keep it well under the size of /dev/shm)
+    SHARED_CACHE_MAX_BYTES = int(os.getenv('SHARED_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    SHARED_CACHE_SWEEP_INTERVAL = float(os.getenv('SHARED_CACHE_SWEEP_INTERVAL', 60))
+    # Local Parquet store of daily bars, topped up with only the newest bars on refresh
+    HISTORY_STORE_ENABLED = os.getenv('HISTORY_STORE_ENABLED', 'true').lower() == 'true'
+    HISTORY_STORE_DIR = os.getenv('HISTORY_STORE_DIR', os.path.join('instance', 'history'))
+    # Stored adjusted bars are downloaded again when the last committed close moved by more than this
+    # fraction on a top-up (a split or dividend rescaled the past), and at least every few days regardless
+    HISTORY_RESCALE_TOLERANCE = float(os.getenv('HISTORY_RESCALE_TOLERANCE', 0.0005))
+    HISTORY_FULL_REFRESH_DAYS = float(os.getenv('HISTORY_FULL_REFRESH_DAYS', 7))
+    
+    # News article scraping: pool size, overall budget and per-article timeout (seconds)
+    NEWS_FETCH_WORKERS = int(os.getenv('NEWS_FETCH_WORKERS', 8))
+    NEWS_FETCH_BUDGET = float(os.getenv('NEWS_FETCH_BUDGET', 6.0))
+    NEWS_ARTICLE_TIMEOUT = float(os.getenv('NEWS_ARTICLE_TIMEOUT', 4.0))
+    # Persistent cache of scraped article text and sentiment, keyed by normalized URL
+    ARTICLE_CACHE_ENABLED = os.getenv('ARTICLE_CACHE_ENABLED', 'true').lower() == 'true'
+    ARTICLE_CACHE_PATH = os.getenv('ARTICLE_CACHE_PATH', os.path.join('instance', 'articles.sqlite'))
+    ARTICLE_CACHE_TTL = int(os.getenv('ARTICLE_CACHE_TTL', 7 * 86400))  # 1 week
+    ARTICLE_CACHE_MAX_ENTRIES = int(os.getenv('ARTICLE_CACHE_MAX_ENTRIES', 5000))
+    # Keep-alive HTTP sessions for yfinance and article downloads, per worker: idle connections kept
+    # per host, and how many hosts keep a pool. HTTP_POOL_YF_BACKEND: 'auto', 'requests' or 'curl'
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))
+    HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 64))
+    HTTP_POOL_YF_BACKEND = os.getenv('HTTP_POOL_YF_BACKEND', 'auto').lower()
+    
+    # Local symbol index (app/data/symbols.tsv). 'auto' rejects unlisted symbols only once the
+    # index holds the full symbol directory (python -m app.symbols); 'true'/'false' force it
+    SYMBOL_INDEX_STRICT = os.getenv('SYMBOL_INDEX_STRICT', 'auto').lower()
+    # Unlisted symbols the upstream returned no data for are rejected locally for this long
+    NEGATIVE_CACHE_TIMEOUT = int(os.getenv('NEGATIVE_CACHE_TIMEOUT', 3600))  # 1 hour
+    NEGATIVE_CACHE_LRU_SIZE = int(os.getenv('NEGATIVE_CACHE_LRU_SIZE', 4096))
+    
+    # Expired entries are still served for this many seconds while they refresh in the background
+    STALE_WHILE_REVALIDATE = int(os.getenv('STALE_WHILE_REVALIDATE', 300))
+    # One worker per host refreshes the PREWARM_TOP_N most requested tickers every PREWARM_INTERVAL
+    # seconds, once their data is PREWARM_REFRESH_AHEAD of the way to expiring
+    PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', 'true').lower() == 'true'
+    PREWARM_INTERVAL = float(os.getenv('PREWARM_INTERVAL', 15))
+    PREWARM_TOP_N = int(os.getenv('PREWARM_TOP_N', 20))
+    PREWARM_REFRESH_AHEAD = float(os.getenv('PREWARM_REFRESH_AHEAD', 0.8))
+    PREWARM_WORKERS = int(os.getenv('PREWARM_WORKERS', 4))
+    
+    # Dashboard data is loaded concurrently under one deadline, in seconds. The dashboard page fetches its
+    # panels in parallel and shows a timeout message in any panel still loading after it; GET /api/<ticker>
+    # runs its stages on DASHBOARD_WORKERS threads and leaves out any stage still running after it
+    DASHBOARD_DEADLINE = float(os.getenv('DASHBOARD_DEADLINE', 8.0))
+    DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS', 32))
+    
+    # Request profiling (app/profiling.py): requests sent with `X-Profile: <PROFILE_TOKEN>`, plus
+    # PROFILE_SAMPLE_RATE of all others, are sampled every PROFILE_INTERVAL_MS. Their wall-clock and CPU
+    # profiles go to PROFILE_DIR as 'speedscope' JSON or 'collapsed' stacks, keeping PROFILE_MAX_FILES
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('instance', 'profiles'))
+    PROFILE_FORMAT = os.getenv('PROFILE_FORMAT', 'speedscope').lower()
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 200))
     
     # Rate limiting
     RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '200 per day, 50 per hour')
@@ -44,6 +131,11 @@ class TestingConfig(Config):
     TESTING = True
     WTF_CSRF_ENABLED = False
     CACHE_TYPE = 'NullCache'
+    HISTORY_STORE_ENABLED = False
+    SHARED_CACHE_ENABLED = False
+    ARTICLE_CACHE_ENABLED = False
+    PREWARM_ENABLED = False
+    STALE_WHILE_REVALIDATE = 0
     
 class ProductionConfig(Config):
     """Production configuration"""
@@ -1,11 +1,18 @@
+import glob
 import multiprocessing
 import os
+import tempfile
 
 # Gunicorn configuration for production deployment
 
 # Set environment variables
 os.environ.setdefault('FLASK_ENV', 'production')
 
+# Workers write their Prometheus metrics here, so /metrics can sum them up.
+# Set before the app is loaded; prometheus_client reads it at import.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'financebro-metrics'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
 # Bind to host and port
 bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
 
@@ -57,6 +64,14 @@ def pre_fork(server, worker):
 
 def on_starting(server):
     server.log.info("Server is starting")
+    # Metrics from a previous run would be added to this one's
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+def child_exit(server, worker):
+    # Drop the exited worker's in-flight gauges; its counters stay in the totals
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
 
 def on_exit(server):
     server.log.info("Server is shutting down") 
\ No newline at end of file